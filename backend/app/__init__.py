@@ -11,20 +11,67 @@ def create_app(config_name="development"):
     # 启用 CORS
     CORS(app, resources={r"/api/*": {"origins": "*"}, r"/admin/*": {"origins": "*"}})
 
-    # 初始化数据库
-    from app.models import init_db
+    # 初始化数据库（连接池参数需在首次建立连接前设置）
+    from app.database import configure_database
+    from app.migrations import apply_migrations
+    from app.models import init_active_collection, init_db
+
+    configure_database(
+        pool_size=app.config.get("SQLITE_POOL_SIZE"),
+        busy_timeout_ms=app.config.get("SQLITE_BUSY_TIMEOUT_MS"),
+        mmap_size=app.config.get("SQLITE_MMAP_SIZE"),
+        cache_size_kb=app.config.get("SQLITE_CACHE_SIZE_KB"),
+    )
 
     init_db(app.config["DATABASE_PATH"])
+    apply_migrations(app.config["DATABASE_PATH"])
+
+    # 登记当前向量集合（重建索引后由 flask reindex 切换）
+    init_active_collection(
+        app.config["DATABASE_PATH"],
+        app.config["CHROMADB_COLLECTION"],
+        {
+            "model": app.config["EMBEDDING_MODEL"],
+            "dimension": app.config["EMBEDDING_DIMENSION"],
+        },
+    )
 
     # 注册路由
-    from app.routes import api_bp, admin_bp
+    from app.routes import api_bp, admin_bp, metrics_bp
 
     app.register_blueprint(api_bp, url_prefix="/api/v1")
     app.register_blueprint(admin_bp, url_prefix="/admin")
+    if app.config.get("METRICS_ENABLED", True):
+        app.register_blueprint(metrics_bp)
+
+    # 记录各路由的请求耗时（先于其他钩子注册，计入完整的处理时间）
+    from app.utils.metrics import init_request_metrics
+
+    init_request_metrics(app)
 
     # 注册访客日志中间件
     from app.utils.visitor_logger import log_visitor
 
     app.before_request(log_visitor)
 
+    # 注册命令行命令
+    from app.cli import register_commands
+
+    register_commands(app)
+
+    # 启动后台索引队列
+    from app.services.index_queue import index_queue
+
+    index_queue.init_app(app)
+
+    # 启动访客记录后台写入线程
+    from app.services.visit_buffer import visit_buffer
+
+    visit_buffer.init_app(app)
+
+    # 启动索引一致性定期修复线程
+    from app.services.index_reconciler import index_reconciler
+
+    index_reconciler.init_app(app)
+
     return app
@@ -0,0 +1,118 @@
+from flask import current_app
+from flask.cli import with_appcontext
+import click
+
+
+def register_commands(app):
+    """注册 flask 命令行命令（flask --app run <command>）"""
+    app.cli.add_command(import_posts_command)
+    app.cli.add_command(reindex_command)
+    app.cli.add_command(reconcile_index_command)
+
+
+@click.command("import-posts")
+@click.argument("source", type=click.Path(exists=True))
+@click.option(
+    "--skip-existing/--no-skip-existing",
+    default=True,
+    help="是否跳过标题已存在的文章",
+)
+@with_appcontext
+def import_posts_command(source, skip_existing):
+    """从目录、zip 压缩包或 Markdown 文件批量导入文章"""
+    from app.services.import_service import import_service, read_sources
+
+    files = read_sources(
+        source, current_app.config.get("IMPORT_MAX_BYTES", 50 * 1024 * 1024)
+    )
+    click.echo(f"找到 {len(files)} 个 Markdown 文件")
+
+    def progress(job):
+        if job.stage == "index":
+            click.echo(f"[index] {job.chunks_indexed}/{job.chunks_total} chunks")
+        elif job.stage != "finished":
+            click.echo(
+                f"[{job.stage}] 导入 {job.imported}，跳过 {job.skipped}，"
+                f"错误 {len(job.errors)}，chunks {job.chunks_total}"
+            )
+
+    job = import_service.run(files, skip_existing, progress=progress)
+    result = job.to_dict()
+
+    for error in result["errors"]:
+        click.echo(f"  ✗ {error['name'] or '-'}: {error['error']}", err=True)
+    click.echo(
+        f"完成（{result['status']}）：导入 {result['imported']} 篇，跳过 {result['skipped']} 篇，"
+        f"索引 {result['chunks_indexed']}/{result['chunks_total']} 个 chunk，"
+        f"转入后台队列 {result['deferred_posts']} 篇，用时 {result['elapsed_seconds']}s"
+    )
+
+
+@click.command("reindex")
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=None,
+    help="同时发出的 Embedding 请求数上限（默认 REINDEX_MAX_CONCURRENCY）",
+)
+@click.option("--restart", is_flag=True, help="放弃未完成的重建，从头开始")
+@click.option(
+    "--switch/--no-switch",
+    default=True,
+    help="完成后是否切换到新集合（--no-switch 时下次执行再切换）",
+)
+@with_appcontext
+def reindex_command(concurrency, restart, switch):
+    """在新的向量集合中重建全部已发布文章的索引，完成后原子切换"""
+    from app.services.reindex_service import reindex_service
+
+    state = reindex_service.get_state(current_app.config["DATABASE_PATH"])
+    if state is not None and not restart:
+        click.echo(f"继续 {state['started_at']} 开始的重建：{state['target']}")
+
+    def progress(result):
+        click.echo(
+            f"[index] {result['done']}/{result['total']} 篇，"
+            f"本次写入 {result['chunks']} 个 chunk"
+        )
+
+    result = reindex_service.run(concurrency, restart, switch, progress=progress)
+
+    if not result["switched"]:
+        click.echo(
+            f"已构建向量集合 {result['target']}（{result['total']} 篇），"
+            f"当前仍使用 {result['source']}；再次执行 flask reindex 完成切换"
+        )
+        return
+    click.echo(
+        f"完成：当前向量集合 {result['target']}（{result['total']} 篇，"
+        f"本次索引 {result['indexed']} 篇，移除 {result['removed']} 篇），"
+        f"已删除旧集合 {result['source']}，转入后台队列 {result['requeued']} 篇"
+    )
+
+
+@click.command("reconcile-index")
+@click.option("--repair", is_flag=True, help="修复发现的问题（默认只检查）")
+@with_appcontext
+def reconcile_index_command(repair):
+    """检查 chunks 表与向量存储的一致性"""
+    from app.services.index_reconciler import index_reconciler, summarize_report
+
+    report = index_reconciler.check(repair=repair)
+    click.echo(summarize_report(report))
+
+    for key in (
+        "orphan_chunks",
+        "unpublished_chunks",
+        "orphan_vectors",
+        "missing_vectors",
+        "stale_vectors",
+        "unindexed_posts",
+    ):
+        ids = report[key]
+        if ids:
+            more = f" 等 {len(ids)} 个" if len(ids) > 10 else ""
+            click.echo(f"  {key}: {', '.join(map(str, ids[:10]))}{more}")
+
+    if report["repaired"]:
+        click.echo(f"已修复，用时 {report['elapsed_seconds']}s")
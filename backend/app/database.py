@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+import sqlite3, threading
+
+
+# 连接参数，可在 create_app 中通过 configure_database 覆盖
+DB_SETTINGS = {
+    "pool_size": 8,
+    "busy_timeout_ms": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size_kb": 16 * 1024,
+    "cached_statements": 256,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+
+class Connection(sqlite3.Connection):
+    """在 transaction() 内推迟提交的连接，使多个模型函数可以组合成一个事务"""
+
+    transaction_depth = 0
+
+    def commit(self):
+        if self.transaction_depth == 0:
+            super().commit()
+
+
+class ConnectionPool:
+    """单个数据库文件的连接池，连接只在创建时设置一次 PRAGMA"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            factory=Connection,
+            check_same_thread=False,
+            timeout=DB_SETTINGS["busy_timeout_ms"] / 1000,
+            cached_statements=DB_SETTINGS["cached_statements"],
+        )
+        conn.row_factory = sqlite3.Row
+
+        # WAL 让读者与写者互不阻塞；NORMAL 在 WAL 模式下仍能保证一致性
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA busy_timeout = {int(DB_SETTINGS['busy_timeout_ms'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(DB_SETTINGS['mmap_size'])}")
+        conn.execute(f"PRAGMA cache_size = -{int(DB_SETTINGS['cache_size_kb'])}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn):
+        # 归还前丢弃未提交的修改，避免长期占用写锁
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            if len(self._idle) < DB_SETTINGS["pool_size"]:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def configure_database(**settings):
+    """覆盖连接参数（仅影响之后新建的连接）"""
+    DB_SETTINGS.update({k: v for k, v in settings.items() if v is not None})
+
+
+def _get_pool(db_path):
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(db_path, ConnectionPool(db_path))
+    return pool
+
+
+@contextmanager
+def get_db_connection(db_path):
+    """
+    获取数据库连接上下文管理器
+
+    连接从连接池借出，同一线程内嵌套使用时复用同一连接；
+    最外层退出时归还连接池。出现异常时回滚未提交的修改。
+    """
+    borrowed = _local.__dict__.setdefault("borrowed", {})
+    entry = borrowed.get(db_path)
+
+    if entry is None:
+        entry = borrowed[db_path] = [_get_pool(db_path).acquire(), 0]
+    entry[1] += 1
+    conn = entry[0]
+
+    try:
+        yield conn
+    except BaseException:
+        if conn.transaction_depth == 0 and conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del borrowed[db_path]
+            _get_pool(db_path).release(conn)
+
+
+@contextmanager
+def transaction(db_path):
+    """
+    事务上下文：块内的所有写入（包括调用的模型函数）在退出时一次提交，
+    出现异常时整体回滚
+    """
+    with get_db_connection(db_path) as conn:
+        conn.transaction_depth += 1
+        try:
+            yield conn
+        except BaseException:
+            conn.transaction_depth -= 1
+            if conn.transaction_depth == 0:
+                conn.rollback()
+            raise
+        else:
+            conn.transaction_depth -= 1
+            if conn.transaction_depth == 0:
+                conn.commit()
+
+
+def close_all():
+    """关闭所有空闲连接"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
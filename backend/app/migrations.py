@@ -0,0 +1,230 @@
+from app.database import get_db_connection
+from app.models import EXCERPT_LENGTH
+from app.rendering import render_markdown
+
+
+def _add_post_excerpt(cursor):
+    """posts 表增加 excerpt 列并回填已有文章的摘要"""
+    columns = [row["name"] for row in cursor.execute("PRAGMA table_info(posts)")]
+    if "excerpt" not in columns:
+        cursor.execute("ALTER TABLE posts ADD COLUMN excerpt TEXT")
+
+    # 与 make_excerpt 规则一致：超出长度时截断并追加省略号
+    cursor.execute(
+        """
+        UPDATE posts SET excerpt = CASE
+            WHEN length(content) > ? THEN substr(content, 1, ?) || '...'
+            ELSE content
+        END
+    """,
+        (EXCERPT_LENGTH, EXCERPT_LENGTH),
+    )
+
+
+def _add_post_html(cursor):
+    """posts 表增加预渲染的 HTML 与目录列，并渲染已有文章"""
+    columns = [row["name"] for row in cursor.execute("PRAGMA table_info(posts)")]
+    if "content_html" not in columns:
+        cursor.execute("ALTER TABLE posts ADD COLUMN content_html TEXT")
+    if "toc" not in columns:
+        cursor.execute("ALTER TABLE posts ADD COLUMN toc TEXT")
+
+    rows = cursor.execute("SELECT id, content FROM posts").fetchall()
+    cursor.executemany(
+        "UPDATE posts SET content_html = ?, toc = ? WHERE id = ?",
+        [(*render_markdown(row["content"]), row["id"]) for row in rows],
+    )
+
+
+# 访问汇总的时间桶：(粒度, 桶起点表达式, 桶终点表达式)，{t} 为访问时间
+ROLLUP_BUCKETS = [
+    ("hour", "strftime('%Y-%m-%d %H:00:00', {t})", "datetime(strftime('%Y-%m-%d %H:00:00', {t}), '+1 hour')"),
+    ("day", "date({t})", "date({t}, '+1 day')"),
+]
+
+
+def _create_visit_rollups(cursor):
+    """创建按小时/按天的访问汇总表，由 visits 的插入触发器增量维护，并回填历史数据"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS visit_rollups (
+            granularity TEXT NOT NULL CHECK(granularity IN ('hour', 'day')),
+            bucket TEXT NOT NULL,
+            path TEXT NOT NULL,
+            views INTEGER NOT NULL DEFAULT 0,
+            unique_ips INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket, path)
+        )
+    """
+    )
+
+    # 每条访问更新 4 行汇总：(小时, 天) x (该路径, 全站 '*')
+    # 同一桶内该 IP 此前没有访问记录时独立 IP 数加一（借助 visits(ip, visited_at) 索引）
+    statements = []
+    for granularity, bucket, end in ROLLUP_BUCKETS:
+        bucket_new = bucket.format(t="new.visited_at")
+        end_new = end.format(t="new.visited_at")
+        for path, path_filter in (("new.path", "AND path = new.path"), ("'*'", "")):
+            statements.append(
+                f"""
+                INSERT INTO visit_rollups (granularity, bucket, path, views, unique_ips)
+                VALUES ('{granularity}', {bucket_new}, {path}, 1, NOT EXISTS (
+                    SELECT 1 FROM visits
+                    WHERE ip = new.ip AND visited_at >= {bucket_new} AND visited_at < {end_new}
+                      AND id <> new.id {path_filter}
+                ))
+                ON CONFLICT (granularity, bucket, path) DO UPDATE SET
+                    views = views + 1, unique_ips = unique_ips + excluded.unique_ips;"""
+            )
+
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS visits_rollup_insert AFTER INSERT ON visits
+        BEGIN{"".join(statements)}
+        END
+    """
+    )
+
+    # 回填已有访问记录
+    for granularity, bucket, _ in ROLLUP_BUCKETS:
+        bucket_col = bucket.format(t="visited_at")
+        cursor.execute(
+            f"""
+            INSERT INTO visit_rollups (granularity, bucket, path, views, unique_ips)
+            SELECT '{granularity}', {bucket_col}, path, COUNT(*), COUNT(DISTINCT ip)
+            FROM visits GROUP BY 2, 3
+        """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO visit_rollups (granularity, bucket, path, views, unique_ips)
+            SELECT '{granularity}', {bucket_col}, '*', COUNT(*), COUNT(DISTINCT ip)
+            FROM visits GROUP BY 2
+        """
+        )
+
+
+# 版本化迁移列表：(版本号, 说明, SQL 语句列表或接收 cursor 的函数)
+# 只能追加，不能修改已发布的迁移
+MIGRATIONS = [
+    (
+        1,
+        "visits 表索引：半小时去重查询与按时间倒序列表",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_visits_ip_visited_at ON visits(ip, visited_at)",
+            "CREATE INDEX IF NOT EXISTS idx_visits_visited_at ON visits(visited_at)",
+        ],
+    ),
+    (
+        2,
+        "posts 表索引：按状态过滤并按创建时间排序",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_posts_status_created_at ON posts(status, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts(created_at)",
+        ],
+    ),
+    (
+        3,
+        "chunks 表索引：按文章读取与删除文本块",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_chunks_post_id_chunk_index ON chunks(post_id, chunk_index)",
+        ],
+    ),
+    (4, "posts 表增加 excerpt 摘要列，列表页不再读取全文", _add_post_excerpt),
+    (5, "访问记录按小时/按天汇总表及增量维护触发器", _create_visit_rollups),
+    (6, "posts 表增加预渲染的 HTML 与目录", _add_post_html),
+    (
+        7,
+        "chunks 表按向量集合区分，重建索引检查点表",
+        [
+            "ALTER TABLE chunks ADD COLUMN collection TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_chunks_collection_post_id ON chunks(collection, post_id)",
+            """
+            CREATE TABLE IF NOT EXISTS reindex_checkpoints (
+                collection TEXT NOT NULL,
+                post_id INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                indexed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (collection, post_id)
+            )
+            """,
+        ],
+    ),
+    (
+        8,
+        "posts.updated_at 统一为 UTC（此前更新文章时写入的是本地时间）",
+        [
+            # datetime(..., 'utc') 把本地时间换算为 UTC；只有更新时写入的 ISO 格式带 T
+            "UPDATE posts SET updated_at = datetime(updated_at, 'utc') "
+            "WHERE updated_at LIKE '____-__-__T%'",
+        ],
+    ),
+]
+
+
+def get_schema_version(db_path):
+    """获取当前数据库结构版本，未执行过迁移时为 0"""
+    with get_db_connection(db_path) as conn:
+        _ensure_version_table(conn)
+        row = conn.execute("SELECT MAX(version) AS version FROM schema_version").fetchone()
+        return row["version"] or 0
+
+
+def _ensure_version_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+
+def apply_migrations(db_path, migrations=None):
+    """
+    依次执行尚未应用的迁移
+
+    每个迁移在独立的写事务（BEGIN IMMEDIATE）中执行并记录版本号，
+    多个 worker 同时启动时只有一个会真正执行
+
+    Returns:
+        list: 本次应用的版本号
+    """
+    applied = []
+
+    with get_db_connection(db_path) as conn:
+        _ensure_version_table(conn)
+
+        for version, description, steps in migrations or MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                exists = conn.execute(
+                    "SELECT 1 FROM schema_version WHERE version = ?", (version,)
+                ).fetchone()
+                if exists:
+                    conn.rollback()
+                    continue
+
+                cursor = conn.cursor()
+                if callable(steps):
+                    steps(cursor)
+                else:
+                    for statement in steps:
+                        cursor.execute(statement)
+
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            applied.append(version)
+            print(f"数据库迁移 {version} 已应用：{description}")
+
+    return applied
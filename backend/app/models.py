@@ -1,80 +1,183 @@
-from datetime import datetime, timedelta
-from contextlib import contextmanager
-import sqlite3
-
-
-@contextmanager
-def get_db_connection(db_path):
-    """获取数据库连接上下文管理器"""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+from datetime import datetime, timedelta, timezone
+from app.database import get_db_connection, transaction
+from app.rendering import render_markdown
+import hashlib, json, re, sqlite3, time, unicodedata
 
 
 def init_db(db_path):
     """初始化数据库，创建所有表"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    with transaction(db_path) as conn:
+        cursor = conn.cursor()
 
-    # 创建 posts 表
-    cursor.execute(
+        # 创建 posts 表
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                status TEXT CHECK(status IN ('published', 'draft')) DEFAULT 'published'
+            )
         """
-        CREATE TABLE IF NOT EXISTS posts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            status TEXT CHECK(status IN ('published', 'draft')) DEFAULT 'published'
         )
-    """
-    )
 
-    # 创建 chunks 表
-    cursor.execute(
+        # 创建 chunks 表
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id INTEGER NOT NULL,
+                chunk_text TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                content_hash TEXT,
+                FOREIGN KEY(post_id) REFERENCES posts(id) ON DELETE CASCADE
+            )
         """
-        CREATE TABLE IF NOT EXISTS chunks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            post_id INTEGER NOT NULL,
-            chunk_text TEXT NOT NULL,
-            chunk_index INTEGER NOT NULL,
-            FOREIGN KEY(post_id) REFERENCES posts(id) ON DELETE CASCADE
         )
-    """
-    )
 
-    # 创建 visits 表
-    cursor.execute(
+        # 兼容旧库：为 chunks 表补充 content_hash 列
+        cursor.execute("PRAGMA table_info(chunks)")
+        if "content_hash" not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE chunks ADD COLUMN content_hash TEXT")
+
+        # 创建 visits 表
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS visits (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ip TEXT NOT NULL,
+                visited_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                path TEXT NOT NULL
+            )
         """
-        CREATE TABLE IF NOT EXISTS visits (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ip TEXT NOT NULL,
-            visited_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            path TEXT NOT NULL
         )
-    """
-    )
 
-    conn.commit()
-    conn.close()
+        # 创建 index_jobs 表（后台索引任务队列）
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS index_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id INTEGER NOT NULL,
+                status TEXT CHECK(status IN ('pending', 'running', 'done', 'failed', 'superseded'))
+                    DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                run_after REAL NOT NULL,
+                locked_until REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+        # 每篇文章最多一个待执行任务，重复提交时合并
+        cursor.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_index_jobs_pending_post
+            ON index_jobs(post_id) WHERE status = 'pending'
+        """
+        )
+
+        # 创建 chunks_fts 全文索引（rowid 即 chunk ID，内容为预分词的检索词）
+        cursor.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                terms, tokenize = "unicode61 remove_diacritics 0 tokenchars '._-'"
+            )
+        """
+        )
+        # 删除 chunk（含级联删除）时同步删除全文索引
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks
+            BEGIN
+                DELETE FROM chunks_fts WHERE rowid = old.id;
+            END
+        """
+        )
+        # 兼容旧库：全文索引为空时从 chunks 表回填
+        if cursor.execute("SELECT 1 FROM chunks_fts LIMIT 1").fetchone() is None:
+            rows = cursor.execute("SELECT id, chunk_text FROM chunks").fetchall()
+            cursor.executemany(
+                "INSERT INTO chunks_fts (rowid, terms) VALUES (?, ?)",
+                [(chunk_id, " ".join(tokenize_for_search(text))) for chunk_id, text in rows],
+            )
+
+        # 创建 meta 表（键值对，如 corpus_version）
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """
+        )
 
 
 # ==================== Post 相关操作 ====================
 
 
-def create_post(db_path, title, content, status="published"):
-    """创建新文章"""
+def _utc_now_str():
+    """当前 UTC 时间，格式与 SQLite CURRENT_TIMESTAMP 一致"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# 列表页摘要长度（字符数）
+EXCERPT_LENGTH = 200
+
+# 列表接口只读取这些列，避免加载文章全文
+POST_LIST_COLUMNS = "id, title, excerpt, status, created_at, updated_at"
+
+
+def make_excerpt(content):
+    """生成列表页摘要"""
+    if len(content) > EXCERPT_LENGTH:
+        return content[:EXCERPT_LENGTH] + "..."
+    return content
+
+
+def create_post(
+    db_path,
+    title,
+    content,
+    status="published",
+    created_at=None,
+    updated_at=None,
+    rendered=None,
+):
+    """
+    创建新文章（同时生成摘要和预渲染的 HTML、目录）
+
+    created_at / updated_at 默认为当前时间，导入历史文章时可指定；
+    rendered 为已渲染的 (HTML, 目录)，批量导入时在写事务之外预先渲染，
+    避免持有写锁期间执行 Markdown 渲染与代码高亮
+    """
+    content_html, toc = rendered or render_markdown(content)
+
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "INSERT INTO posts (title, content, status) VALUES (?, ?, ?)",
-            (title, content, status),
+            "INSERT INTO posts (title, content, excerpt, content_html, toc, status, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, "
+            "COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, ?, CURRENT_TIMESTAMP))",
+            (
+                title,
+                content,
+                make_excerpt(content),
+                content_html,
+                toc,
+                status,
+                created_at,
+                updated_at,
+                created_at,
+            ),
         )
+        # 递增版本号可能插入 meta 行，需先取出文章 ID
+        post_id = cursor.lastrowid
+        _bump_corpus_version(cursor)
         conn.commit()
-        return cursor.lastrowid
+        return post_id
 
 
 def get_post(db_path, post_id):
@@ -99,8 +202,61 @@ def get_all_posts(db_path, status=None):
         return cursor.fetchall()
 
 
+def get_post_titles(db_path):
+    """获取所有文章标题（用于导入时跳过已存在的文章）"""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT title FROM posts")
+        return {row["title"] for row in cursor.fetchall()}
+
+
+def get_posts_page(db_path, status=None, after=None, limit=20):
+    """
+    按创建时间倒序分页获取文章列表（keyset 分页）
+
+    Args:
+        db_path: 数据库路径
+        status: 文章状态过滤，None 表示全部
+        after: 上一页最后一条的 (created_at, id)，None 表示第一页
+        limit: 每页数量
+
+    Returns:
+        tuple: (文章列表, 下一页游标 (created_at, id)，没有下一页时为 None)
+    """
+    conditions = []
+    params = []
+
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if after:
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend(after)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        # 多取一条用于判断是否还有下一页
+        cursor.execute(
+            f"SELECT {POST_LIST_COLUMNS} FROM posts {where} "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            params + [limit + 1],
+        )
+        rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+    return rows, next_cursor
+
+
 def update_post(db_path, post_id, title=None, content=None, status=None):
-    """更新文章"""
+    """更新文章（内容变化时重新生成摘要和预渲染的 HTML、目录）"""
+    content_html, toc = render_markdown(content) if content is not None else (None, None)
+
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
 
@@ -108,6 +264,9 @@ def update_post(db_path, post_id, title=None, content=None, status=None):
         allowed_fields = {
             "title": title,
             "content": content,
+            "excerpt": make_excerpt(content) if content is not None else None,
+            "content_html": content_html,
+            "toc": toc,
             "status": status,
         }
 
@@ -121,11 +280,12 @@ def update_post(db_path, post_id, title=None, content=None, status=None):
 
         if updates:
             updates.append("updated_at = ?")
-            params.append(datetime.now().isoformat())
+            params.append(_utc_now_str())
             params.append(post_id)
 
             query = f"UPDATE posts SET {', '.join(updates)} WHERE id = ?"
             cursor.execute(query, params)
+            _bump_corpus_version(cursor)
             conn.commit()
 
 
@@ -134,39 +294,324 @@ def delete_post(db_path, post_id):
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+        _bump_corpus_version(cursor)
+        conn.commit()
+
+
+# ==================== 语料版本 ====================
+
+
+def _bump_corpus_version(cursor):
+    """在当前事务中递增语料版本号"""
+    cursor.execute(
+        """
+        INSERT INTO meta (key, value) VALUES ('corpus_version', 1)
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """
+    )
+
+
+def get_corpus_version(db_path):
+    """获取语料版本号，文章或索引任何变动都会使其递增"""
+    with get_db_connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'corpus_version'"
+        ).fetchone()
+        return int(row["value"]) if row else 0
+
+
+def bump_corpus_version(db_path):
+    """递增语料版本号"""
+    with get_db_connection(db_path) as conn:
+        _bump_corpus_version(conn.cursor())
+        conn.commit()
+
+
+# ==================== 向量集合 ====================
+
+# 当前提供检索的向量集合（chunks.collection 与向量存储的集合名一致）
+ACTIVE_COLLECTION_SQL = "(SELECT value FROM meta WHERE key = 'active_collection')"
+
+
+def get_meta(db_path, key):
+    """读取 meta 键值，不存在时返回 None"""
+    with get_db_connection(db_path) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+
+def set_meta(db_path, key, value):
+    """写入 meta 键值，value 为 None 时删除"""
+    with get_db_connection(db_path) as conn:
+        if value is None:
+            conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+        conn.commit()
+
+
+def claim_periodic_task(db_path, name, interval):
+    """
+    多进程间认领周期任务：距上次执行已超过 interval 秒时记录本次执行时间
+
+    Returns:
+        bool: 是否由当前调用方执行
+    """
+    now = time.time()
+    with get_db_connection(db_path) as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            WHERE CAST(meta.value AS REAL) <= ?
+            """,
+            (f"last_run:{name}", now, now - interval),
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def get_active_collection(db_path):
+    """获取当前向量集合名"""
+    return get_meta(db_path, "active_collection")
+
+
+def get_collection_settings(db_path, collection):
+    """
+    获取向量集合登记的 Embedding 设置
+
+    Returns:
+        dict | None: {"model", "dimension"}，未登记时返回 None
+    """
+    value = get_meta(db_path, f"collection:{collection}")
+    return json.loads(value) if value else None
+
+
+def set_collection_settings(db_path, collection, settings):
+    """登记向量集合的 Embedding 设置，settings 为 None 时删除"""
+    set_meta(
+        db_path,
+        f"collection:{collection}",
+        json.dumps(settings) if settings is not None else None,
+    )
+
+
+def init_active_collection(db_path, collection, settings):
+    """
+    首次启动时登记默认向量集合及其 Embedding 设置，
+    并将旧数据中未归属集合的文本块归入当前集合
+
+    Returns:
+        str: 当前向量集合名
+    """
+    with transaction(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('active_collection', ?)",
+            (collection,),
+        )
+        active = cursor.execute(
+            "SELECT value FROM meta WHERE key = 'active_collection'"
+        ).fetchone()["value"]
+        cursor.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+            (f"collection:{active}", json.dumps(settings)),
+        )
+        cursor.execute(
+            "UPDATE chunks SET collection = ? WHERE collection IS NULL", (active,)
+        )
+        return active
+
+
+def switch_active_collection(db_path, collection):
+    """
+    原子切换当前向量集合并递增语料版本号
+
+    Returns:
+        str: 切换前的集合名
+    """
+    with transaction(db_path) as conn:
+        cursor = conn.cursor()
+        previous = get_active_collection(db_path)
+        cursor.execute(
+            "UPDATE meta SET value = ? WHERE key = 'active_collection'", (collection,)
+        )
+        _bump_corpus_version(cursor)
+        return previous
+
+
+def delete_collection_chunks(db_path, collection, batch_size=5000):
+    """
+    分批删除向量集合的所有文本块
+
+    Returns:
+        int: 删除的文本块数
+    """
+    deleted = 0
+    while True:
+        with get_db_connection(db_path) as conn:
+            cursor = conn.execute(
+                "DELETE FROM chunks WHERE id IN "
+                "(SELECT id FROM chunks WHERE collection = ? LIMIT ?)",
+                (collection, batch_size),
+            )
+            conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return deleted
+
+
+# ==================== 重建索引检查点 ====================
+
+
+def get_published_posts(db_path):
+    """获取所有已发布文章的 ID、标题和正文（按 ID 排序）"""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, title, content FROM posts WHERE status = 'published' ORDER BY id"
+        )
+        return cursor.fetchall()
+
+
+def get_reindex_checkpoints(db_path, collection):
+    """
+    获取向量集合的重建检查点
+
+    Returns:
+        dict: {post_id: 建索引时的文章内容哈希}
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT post_id, content_hash FROM reindex_checkpoints WHERE collection = ?",
+            (collection,),
+        )
+        return {row["post_id"]: row["content_hash"] for row in cursor.fetchall()}
+
+
+def save_reindex_checkpoint(db_path, collection, post_id, content_hash, chunk_count):
+    """记录文章已在向量集合中完成索引"""
+    with get_db_connection(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO reindex_checkpoints (collection, post_id, content_hash, chunk_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(collection, post_id) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                chunk_count = excluded.chunk_count,
+                indexed_at = CURRENT_TIMESTAMP
+            """,
+            (collection, post_id, content_hash, chunk_count),
+        )
+        conn.commit()
+
+
+def delete_reindex_checkpoint(db_path, collection, post_id):
+    """删除单篇文章的检查点"""
+    with get_db_connection(db_path) as conn:
+        conn.execute(
+            "DELETE FROM reindex_checkpoints WHERE collection = ? AND post_id = ?",
+            (collection, post_id),
+        )
+        conn.commit()
+
+
+def clear_reindex_checkpoints(db_path, collection):
+    """删除向量集合的全部检查点"""
+    with get_db_connection(db_path) as conn:
+        conn.execute(
+            "DELETE FROM reindex_checkpoints WHERE collection = ?", (collection,)
+        )
         conn.commit()
 
 
 # ==================== Chunk 相关操作 ====================
 
 
+def compute_chunk_hash(chunk_text):
+    """计算文本块内容哈希，用于增量更新时比对内容是否变化"""
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+
+
 def create_chunks(db_path, post_id, chunks):
-    """为文章创建文本块"""
+    """为文章创建文本块，返回新建的 chunk ID 列表"""
+    return insert_chunks(db_path, post_id, list(enumerate(chunks)))
+
+
+def insert_chunks(db_path, post_id, indexed_chunks, collection=None):
+    """
+    插入指定位置的文本块
+
+    indexed_chunks 为 (chunk_index, chunk_text) 列表，返回新建的 chunk ID 列表；
+    collection 为文本块所属的向量集合，默认为当前集合
+    """
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        for idx, chunk_text in enumerate(chunks):
+        chunk_ids = []
+        for idx, chunk_text in indexed_chunks:
+            cursor.execute(
+                "INSERT INTO chunks (post_id, chunk_text, chunk_index, content_hash, collection) "
+                f"VALUES (?, ?, ?, ?, COALESCE(?, {ACTIVE_COLLECTION_SQL}))",
+                (post_id, chunk_text, idx, compute_chunk_hash(chunk_text), collection),
+            )
+            chunk_ids.append(cursor.lastrowid)
             cursor.execute(
-                "INSERT INTO chunks (post_id, chunk_text, chunk_index) VALUES (?, ?, ?)",
-                (post_id, chunk_text, idx),
+                "INSERT INTO chunks_fts (rowid, terms) VALUES (?, ?)",
+                (cursor.lastrowid, " ".join(tokenize_for_search(chunk_text))),
             )
         conn.commit()
+        return chunk_ids
 
 
-def get_chunks_by_post(db_path, post_id):
-    """获取文章的所有文本块"""
+def update_chunks(db_path, updates):
+    """
+    批量更新文本块的位置和内容哈希（内容本身不变）
+
+    updates 为 (chunk_id, chunk_index, content_hash) 列表
+    """
+    with get_db_connection(db_path) as conn:
+        conn.executemany(
+            "UPDATE chunks SET chunk_index = ?, content_hash = ? WHERE id = ?",
+            [(idx, content_hash, chunk_id) for chunk_id, idx, content_hash in updates],
+        )
+        conn.commit()
+
+
+def delete_chunks(db_path, chunk_ids):
+    """按 ID 批量删除文本块"""
+    with get_db_connection(db_path) as conn:
+        conn.executemany(
+            "DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in chunk_ids]
+        )
+        conn.commit()
+
+
+def get_chunks_by_post(db_path, post_id, collection=None):
+    """获取文章在指定向量集合（默认为当前集合）中的所有文本块"""
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT * FROM chunks WHERE post_id = ? ORDER BY chunk_index", (post_id,)
+            "SELECT * FROM chunks WHERE post_id = ? "
+            f"AND collection = COALESCE(?, {ACTIVE_COLLECTION_SQL}) ORDER BY chunk_index",
+            (post_id, collection),
         )
         return cursor.fetchall()
 
 
-def delete_chunks_by_post(db_path, post_id):
-    """删除文章的所有文本块"""
+def delete_chunks_by_post(db_path, post_id, collection=None):
+    """删除文章在指定向量集合（默认为当前集合）中的所有文本块"""
     with get_db_connection(db_path) as conn:
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM chunks WHERE post_id = ?", (post_id,))
+        cursor.execute(
+            "DELETE FROM chunks WHERE post_id = ? "
+            f"AND collection = COALESCE(?, {ACTIVE_COLLECTION_SQL})",
+            (post_id, collection),
+        )
         conn.commit()
 
 
@@ -178,6 +623,147 @@ def get_chunk_by_id(db_path, chunk_id):
         return cursor.fetchone()
 
 
+def get_index_entries(db_path, collection=None):
+    """
+    一次读取向量集合中所有文本块的 ID、文章 ID、内容哈希及文章状态（一致性检查用）
+
+    文章已不存在时 status 为 None
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT c.id, c.post_id, c.content_hash, p.status
+            FROM chunks c
+            LEFT JOIN posts p ON p.id = c.post_id
+            WHERE c.collection = COALESCE(?, {ACTIVE_COLLECTION_SQL})
+            """,
+            (collection,),
+        )
+        return cursor.fetchall()
+
+
+def get_chunks_with_titles(db_path, chunk_ids, batch_size=500):
+    """按 ID 批量读取文本块及其文章标题（重新生成向量用）"""
+    rows = []
+    with get_db_connection(db_path) as conn:
+        for i in range(0, len(chunk_ids), batch_size):
+            batch = chunk_ids[i : i + batch_size]
+            rows.extend(
+                conn.execute(
+                    "SELECT c.id, c.post_id, c.chunk_text, c.chunk_index, c.content_hash, "
+                    "p.title FROM chunks c JOIN posts p ON p.id = c.post_id "
+                    f"WHERE c.id IN ({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+            )
+    return rows
+
+
+def get_existing_chunk_ids(db_path, chunk_ids, collection=None, batch_size=500):
+    """返回 chunk_ids 中在向量集合（默认为当前集合）里仍有文本块行的 ID"""
+    existing = set()
+    with get_db_connection(db_path) as conn:
+        for i in range(0, len(chunk_ids), batch_size):
+            batch = chunk_ids[i : i + batch_size]
+            existing.update(
+                row["id"]
+                for row in conn.execute(
+                    f"SELECT id FROM chunks WHERE id IN ({', '.join('?' * len(batch))}) "
+                    f"AND collection = COALESCE(?, {ACTIVE_COLLECTION_SQL})",
+                    [*batch, collection],
+                )
+            )
+    return existing
+
+
+def get_unindexed_posts(db_path, collection=None):
+    """获取在向量集合中没有任何文本块的已发布文章 ID"""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT id FROM posts p
+            WHERE status = 'published' AND NOT EXISTS (
+                SELECT 1 FROM chunks c
+                WHERE c.post_id = p.id
+                  AND c.collection = COALESCE(?, {ACTIVE_COLLECTION_SQL})
+            )
+            ORDER BY id
+            """,
+            (collection,),
+        )
+        return [row["id"] for row in cursor.fetchall()]
+
+
+# ==================== 全文检索 ====================
+
+
+# 英文/数字标识符（保留 . _ - 连接的整体，如 text-embedding-v4、ERR_CONN.RESET）
+_IDENTIFIER_PATTERN = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+# 中日韩字符连续片段
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+
+
+def tokenize_for_search(text):
+    """
+    将文本切分为全文检索词
+
+    - 英文/数字标识符保留整体，同时拆出各组成部分
+    - 中日韩文本按字符二元组（bigram）切分，单字片段保留单字
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    terms = []
+
+    for match in _IDENTIFIER_PATTERN.finditer(text):
+        identifier = match.group()
+        terms.append(identifier)
+        parts = re.split(r"[._-]", identifier)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+
+    for match in _CJK_PATTERN.finditer(text):
+        run = match.group()
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+
+    return terms
+
+
+def search_chunks_fts(db_path, query, limit=10):
+    """
+    按 BM25 在已发布文章的文本块中做全文检索
+
+    Returns:
+        list: 文本块记录（含文章标题和 score，score 越小越相关）
+    """
+    terms = list(dict.fromkeys(tokenize_for_search(query)))
+    if not terms:
+        return []
+
+    match_expr = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT c.id, c.post_id, c.chunk_text, c.chunk_index, c.content_hash,
+                   p.title, bm25(chunks_fts) AS score
+            FROM chunks_fts
+            JOIN chunks c ON c.id = chunks_fts.rowid
+            JOIN posts p ON p.id = c.post_id
+            WHERE chunks_fts MATCH ? AND p.status = 'published'
+              AND c.collection = {ACTIVE_COLLECTION_SQL}
+            ORDER BY score
+            LIMIT ?
+            """,
+            (match_expr, limit),
+        )
+        return cursor.fetchall()
+
+
 # ==================== Visit 相关操作 ====================
 
 
@@ -192,23 +778,54 @@ def log_visit(db_path, ip, path):
         thirty_minutes_ago = now - timedelta(minutes=30)
         thirty_minutes_ago_str = thirty_minutes_ago.strftime("%Y-%m-%d %H:%M:%S")
 
-        # 检查该IP在半小时内是否已经访问过
+        # 该IP在半小时内没有访问记录时才插入（单条语句，并发写入也不会重复）
         cursor.execute(
             """
-            SELECT COUNT(*) as count FROM visits
-            WHERE ip = ? AND visited_at > ?
+            INSERT INTO visits (ip, path, visited_at)
+            SELECT ?, ?, ?
+            WHERE NOT EXISTS (
+                SELECT 1 FROM visits WHERE ip = ? AND visited_at > ?
+            )
             """,
-            (ip, thirty_minutes_ago_str),
+            (ip, path, now_str, ip, thirty_minutes_ago_str),
+        )
+        conn.commit()
+
+
+def log_visits(db_path, visits):
+    """
+    批量写入访问记录（后台写入线程使用）
+
+    仍按半小时规则在数据库侧去重，兜底多进程部署或重启后内存去重状态丢失的情况
+
+    Args:
+        db_path: 数据库路径
+        visits: (ip, path, visited_at) 元组列表，visited_at 格式为 %Y-%m-%d %H:%M:%S
+    """
+    if not visits:
+        return
+
+    rows = []
+    for ip, path, visited_at in visits:
+        window_start = datetime.strptime(visited_at, "%Y-%m-%d %H:%M:%S") - timedelta(
+            minutes=30
+        )
+        rows.append(
+            (ip, path, visited_at, ip, window_start.strftime("%Y-%m-%d %H:%M:%S"))
         )
-        result = cursor.fetchone()
 
-        # 如果半小时内没有访问记录，则插入新记录
-        if result["count"] == 0:
-            cursor.execute(
-                "INSERT INTO visits (ip, path, visited_at) VALUES (?, ?, ?)",
-                (ip, path, now_str)
+    with get_db_connection(db_path) as conn:
+        conn.executemany(
+            """
+            INSERT INTO visits (ip, path, visited_at)
+            SELECT ?, ?, ?
+            WHERE NOT EXISTS (
+                SELECT 1 FROM visits WHERE ip = ? AND visited_at > ?
             )
-            conn.commit()
+            """,
+            rows,
+        )
+        conn.commit()
 
 
 def get_visits(db_path, limit=100):
@@ -219,3 +836,246 @@ def get_visits(db_path, limit=100):
             "SELECT * FROM visits ORDER BY visited_at DESC LIMIT ?", (limit,)
         )
         return cursor.fetchall()
+
+
+def get_visit_rollups(db_path, granularity, start_bucket, end_bucket, path="*"):
+    """
+    读取访问汇总（只查询汇总表，耗时与时间桶数量成正比）
+
+    Args:
+        db_path: 数据库路径
+        granularity: hour 或 day
+        start_bucket: 起始时间桶（含）
+        end_bucket: 结束时间桶（含）
+        path: 路径，'*' 表示全站
+
+    Returns:
+        List[Row]: bucket、views、unique_ips，按时间升序
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT bucket, views, unique_ips FROM visit_rollups
+            WHERE granularity = ? AND path = ? AND bucket >= ? AND bucket <= ?
+            ORDER BY bucket
+            """,
+            (granularity, path, start_bucket, end_bucket),
+        )
+        return cursor.fetchall()
+
+
+def get_top_paths(db_path, granularity, start_bucket, end_bucket, limit=10):
+    """获取时间范围内访问量最高的路径"""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT path, SUM(views) AS views FROM visit_rollups
+            WHERE granularity = ? AND path != '*' AND bucket >= ? AND bucket <= ?
+            GROUP BY path ORDER BY views DESC LIMIT ?
+            """,
+            (granularity, start_bucket, end_bucket, limit),
+        )
+        return cursor.fetchall()
+
+
+def compact_visits(db_path, older_than_days=90, batch_size=5000):
+    """
+    删除早于保留期的原始访问记录（汇总表中的数据保留）
+
+    分批删除，避免长时间持有写锁
+
+    Returns:
+        int: 删除的记录数
+    """
+    # 独立 IP 统计依赖当天的原始记录，保留期不能短于 2 天
+    cutoff = datetime.now() - timedelta(days=max(older_than_days, 2))
+    cutoff_str = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    deleted = 0
+
+    with get_db_connection(db_path) as conn:
+        while True:
+            cursor = conn.execute(
+                """
+                DELETE FROM visits WHERE id IN (
+                    SELECT id FROM visits WHERE visited_at < ? LIMIT ?
+                )
+                """,
+                (cutoff_str, batch_size),
+            )
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+
+
+# ==================== 索引任务相关操作 ====================
+
+
+def _now_str():
+    """与 SQLite CURRENT_TIMESTAMP 一致的时间格式"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def enqueue_index_job(db_path, post_id):
+    """
+    为文章提交索引任务，已有待执行任务时合并为一个
+
+    Returns:
+        int: 任务 ID
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO index_jobs (post_id, status, run_after)
+            VALUES (?, 'pending', ?)
+            ON CONFLICT(post_id) WHERE status = 'pending'
+            DO UPDATE SET attempts = 0, last_error = NULL,
+                run_after = excluded.run_after, updated_at = ?
+            """,
+            (post_id, time.time(), _now_str()),
+        )
+        row = cursor.execute(
+            "SELECT id FROM index_jobs WHERE post_id = ? AND status = 'pending'",
+            (post_id,),
+        ).fetchone()
+        conn.commit()
+        return row["id"]
+
+
+def claim_index_job(db_path, lease_seconds):
+    """
+    领取一个到期的待执行任务
+
+    同一篇文章不会同时运行两个任务；租约过期的 running 任务
+    （进程崩溃遗留）会重新变为可领取
+
+    Returns:
+        sqlite3.Row | None: 领取到的任务
+    """
+    now = time.time()
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+
+        # 回收租约过期的任务；若该文章已有新的待执行任务，旧任务直接作废
+        cursor.execute(
+            """
+            UPDATE index_jobs SET status = 'superseded', updated_at = ?
+            WHERE status = 'running' AND locked_until < ?
+              AND post_id IN (SELECT post_id FROM index_jobs WHERE status = 'pending')
+            """,
+            (_now_str(), now),
+        )
+        cursor.execute(
+            """
+            UPDATE index_jobs SET status = 'pending', updated_at = ?
+            WHERE status = 'running' AND locked_until < ?
+            """,
+            (_now_str(), now),
+        )
+
+        row = cursor.execute(
+            """
+            SELECT * FROM index_jobs
+            WHERE status = 'pending' AND run_after <= ?
+              AND post_id NOT IN (SELECT post_id FROM index_jobs WHERE status = 'running')
+            ORDER BY run_after LIMIT 1
+            """,
+            (now,),
+        ).fetchone()
+
+        if row is not None:
+            cursor.execute(
+                """
+                UPDATE index_jobs
+                SET status = 'running', attempts = attempts + 1,
+                    locked_until = ?, updated_at = ?
+                WHERE id = ? AND status = 'pending'
+                """,
+                (now + lease_seconds, _now_str(), row["id"]),
+            )
+            if cursor.rowcount != 1:
+                row = None
+
+        conn.commit()
+        return row
+
+
+def finish_index_job(db_path, job_id):
+    """标记任务完成"""
+    with get_db_connection(db_path) as conn:
+        conn.execute(
+            "UPDATE index_jobs SET status = 'done', last_error = NULL, updated_at = ? "
+            "WHERE id = ?",
+            (_now_str(), job_id),
+        )
+        conn.commit()
+
+
+def fail_index_job(db_path, job_id, error, retry_at=None):
+    """
+    记录任务失败
+
+    retry_at 不为空时重新排队等待重试，否则标记为 failed；
+    若重试期间该文章已有新的待执行任务，则当前任务作废
+    """
+    with get_db_connection(db_path) as conn:
+        status = "failed"
+        if retry_at is not None:
+            try:
+                conn.execute(
+                    "UPDATE index_jobs SET status = 'pending', last_error = ?, "
+                    "run_after = ?, locked_until = NULL, updated_at = ? WHERE id = ?",
+                    (error, retry_at, _now_str(), job_id),
+                )
+                conn.commit()
+                return
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                status = "superseded"
+
+        conn.execute(
+            "UPDATE index_jobs SET status = ?, last_error = ?, updated_at = ? "
+            "WHERE id = ?",
+            (status, error, _now_str(), job_id),
+        )
+        conn.commit()
+
+
+def get_index_jobs(db_path, status=None, limit=100):
+    """获取索引任务列表"""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        if status:
+            cursor.execute(
+                "SELECT * FROM index_jobs WHERE status = ? ORDER BY id DESC LIMIT ?",
+                (status, limit),
+            )
+        else:
+            cursor.execute("SELECT * FROM index_jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return cursor.fetchall()
+
+
+def count_index_jobs(db_path):
+    """按状态统计索引任务数量"""
+    with get_db_connection(db_path) as conn:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) AS count FROM index_jobs GROUP BY status"
+        ).fetchall()
+        return {row["status"]: row["count"] for row in rows}
+
+
+def prune_index_jobs(db_path, older_than_days=7):
+    """清理已结束的历史任务"""
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    with get_db_connection(db_path) as conn:
+        conn.execute(
+            "DELETE FROM index_jobs WHERE status IN ('done', 'superseded') "
+            "AND updated_at < ?",
+            (cutoff,),
+        )
+        conn.commit()
@@ -0,0 +1,100 @@
+from markdown.treeprocessors import Treeprocessor
+from markdown.extensions import Extension
+from markdown.extensions.toc import slugify_unicode
+from markdown.util import AMP_SUBSTITUTE
+import html, json, re, markdown
+
+
+# 允许出现在链接和图片地址中的协议（以及不带协议的相对地址），其余（如 javascript:）一律移除
+SAFE_URL_SCHEMES = {"http", "https", "mailto"}
+_SCHEME_RE = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]*):")
+# 浏览器解析地址时忽略的 ASCII 控制字符与空白（如 java&#x09;script:）
+_IGNORED_URL_CHARS_RE = re.compile(r"[\x00-\x20\x7f]+")
+
+
+def _is_safe_url(url: str) -> bool:
+    """
+    按浏览器的解析方式判断地址协议是否安全
+
+    Python-Markdown 原样保留地址中的字符实体，浏览器会先解码再解析协议，
+    因此先解码实体（&#106;、&colon; 等）并去掉控制字符与空白再匹配
+    """
+    normalized = html.unescape((url or "").replace(AMP_SUBSTITUTE, "&"))
+    normalized = _IGNORED_URL_CHARS_RE.sub("", normalized)
+    match = _SCHEME_RE.match(normalized)
+    return match is None or match.group(1).lower() in SAFE_URL_SCHEMES
+
+
+class _SafeUrlTreeprocessor(Treeprocessor):
+    """移除不安全协议的 href / src"""
+
+    def run(self, root):
+        for element in root.iter():
+            for attr in ("href", "src"):
+                if attr in element.attrib and not _is_safe_url(element.attrib[attr]):
+                    del element.attrib[attr]
+
+
+class SafeMarkdownExtension(Extension):
+    """
+    安全渲染扩展
+
+    注销原始 HTML 的块级与行内处理器（文中的 HTML 标签会被转义输出），
+    并过滤不安全的链接地址
+    """
+
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister("html_block")
+        md.inlinePatterns.deregister("html")
+        md.treeprocessors.register(_SafeUrlTreeprocessor(md), "safe_url", 0)
+
+
+def _create_renderer():
+    return markdown.Markdown(
+        extensions=[
+            SafeMarkdownExtension(),
+            "fenced_code",
+            "tables",
+            "sane_lists",
+            "nl2br",
+            "codehilite",
+            "toc",
+        ],
+        extension_configs={
+            # 未安装 Pygments 时 codehilite 退化为带 language-* class 的普通代码块
+            "codehilite": {"css_class": "highlight", "guess_lang": False},
+            # 保留中文标题作为锚点 ID
+            "toc": {"toc_depth": "2-4", "slugify": slugify_unicode},
+        },
+        output_format="html",
+    )
+
+
+def _simplify_toc(tokens: list) -> list:
+    return [
+        {
+            "level": token["level"],
+            "id": token["id"],
+            "name": token["name"],
+            "children": _simplify_toc(token["children"]),
+        }
+        for token in tokens
+    ]
+
+
+def render_markdown(content: str):
+    """
+    将 Markdown 渲染为安全的 HTML，并生成标题目录
+
+    Args:
+        content: Markdown 文本
+
+    Returns:
+        tuple: (HTML 字符串, 目录 JSON 字符串)，目录为嵌套的
+            {level, id, name, children} 列表
+    """
+    # Markdown 实例不是线程安全的，每次渲染单独创建
+    md = _create_renderer()
+    html = md.convert(content)
+    toc = _simplify_toc(getattr(md, "toc_tokens", []))
+    return html, json.dumps(toc, ensure_ascii=False)
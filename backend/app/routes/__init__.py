@@ -1,4 +1,5 @@
 from app.routes.api import api_bp
 from app.routes.admin import admin_bp
+from app.routes.metrics import metrics_bp
 
-__all__ = ["api_bp", "admin_bp"]
+__all__ = ["api_bp", "admin_bp", "metrics_bp"]
@@ -11,13 +11,20 @@ from flask import (
 from app.models import (
     create_post,
     get_visits,
+    get_visit_rollups,
+    get_top_paths,
+    get_index_jobs,
+    count_index_jobs,
 )
-from app.services.embedding_service import (
-    update_post_embeddings,
-    delete_post_embeddings,
-)
+from app.services.embedding_service import delete_post_embeddings
+from app.services.index_queue import index_queue
+from app.services.import_service import import_service, read_sources
+from app.services.response_cache import response_cache
+from app.services.visit_buffer import visit_buffer
 from app.utils.auth import verify_ip, verify_credentials
-from app.models import get_all_posts, get_post, update_post, delete_post
+from app.utils.pagination import parse_page_args, format_cursor
+from app.models import get_posts_page, get_post, update_post, delete_post
+from datetime import datetime, timedelta
 from functools import wraps
 import traceback
 
@@ -85,9 +92,18 @@ def dashboard():
 @admin_bp.route("/posts", methods=["GET"])
 @require_admin
 def list_posts():
-    """获取所有文章（包括草稿）"""
+    """获取文章列表（包括草稿），支持 ?after=<created_at,id>&limit= 分页"""
     db_path = current_app.config["DATABASE_PATH"]
-    posts = get_all_posts(db_path)
+    try:
+        after, limit = parse_page_args(
+            request.args,
+            current_app.config.get("POSTS_PAGE_SIZE", 20),
+            current_app.config.get("POSTS_MAX_PAGE_SIZE", 100),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    posts, next_cursor = get_posts_page(db_path, after=after, limit=limit)
     return jsonify(
         {
             "posts": [
@@ -99,7 +115,8 @@ def list_posts():
                     "updated_at": p["updated_at"],
                 }
                 for p in posts
-            ]
+            ],
+            "next_cursor": format_cursor(next_cursor),
         }
     )
 
@@ -119,12 +136,14 @@ def create_post_admin():
             return jsonify({"error": "标题和内容不能为空"}), 400
 
         post_id = create_post(db_path, title, content, status)
+        response_cache.invalidate()
 
-        # 如果是已发布状态，更新向量
+        # 如果是已发布状态，提交后台索引任务
+        response = {"message": "文章创建成功", "post_id": post_id}
         if status == "published":
-            update_post_embeddings(post_id, title, content)
+            response["index_job_id"] = index_queue.enqueue(post_id)
 
-        return jsonify({"message": "文章创建成功", "post_id": post_id}), 201
+        return jsonify(response), 201
 
     except Exception as e:
         traceback.print_exc()
@@ -171,16 +190,16 @@ def update_post_admin(post_id):
 
         # 更新文章
         update_post(db_path, post_id, title=title, content=content, status=status)
+        response_cache.invalidate()
 
-        # 如果状态变为 published 或内容发生变化，更新向量
+        # 如果状态为 published，提交后台索引任务（任务执行时读取最新内容）
         new_status = status if status is not None else old_post["status"]
-        new_content = content if content is not None else old_post["content"]
-        new_title = title if title is not None else old_post["title"]
 
+        response = {"message": "文章更新成功"}
         if new_status == "published":
-            update_post_embeddings(post_id, new_title, new_content)
+            response["index_job_id"] = index_queue.enqueue(post_id)
 
-        return jsonify({"message": "文章更新成功"})
+        return jsonify(response)
 
     except Exception as e:
         traceback.print_exc()
@@ -198,6 +217,7 @@ def delete_post_admin(post_id):
 
         # 删除文章（级联删除 chunks）
         delete_post(db_path, post_id)
+        response_cache.invalidate()
 
         return jsonify({"message": "文章删除成功"})
 
@@ -206,11 +226,56 @@ def delete_post_admin(post_id):
         return jsonify({"error": str(e)}), 500
 
 
+@admin_bp.route("/import", methods=["POST"])
+@require_admin
+def import_posts():
+    """
+    批量导入 Markdown 文章
+
+    以 multipart 上传 file（zip 压缩包或单个 .md 文件），
+    可选表单字段 skip_existing=false 表示不跳过同名文章。
+    导入在后台执行，通过 GET /admin/import/<job_id> 查询进度。
+    """
+    upload = request.files.get("file")
+    if upload is None:
+        return jsonify({"error": "请上传 zip 压缩包或 Markdown 文件"}), 400
+
+    max_bytes = current_app.config.get("IMPORT_MAX_BYTES", 50 * 1024 * 1024)
+    try:
+        if upload.filename.lower().endswith((".md", ".markdown")):
+            data = upload.read(max_bytes + 1)
+            if len(data) > max_bytes:
+                raise ValueError("导入内容超过大小限制")
+            files = [(upload.filename, data.decode("utf-8-sig", errors="replace"))]
+        else:
+            files = read_sources(upload.stream, max_bytes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not files:
+        return jsonify({"error": "没有找到 Markdown 文件"}), 400
+
+    skip_existing = request.form.get("skip_existing", "true").lower() != "false"
+    job = import_service.start(files, skip_existing)
+    return jsonify(job.to_dict()), 202
+
+
+@admin_bp.route("/import/<job_id>", methods=["GET"])
+@require_admin
+def import_status(job_id):
+    """查询导入任务进度"""
+    job = import_service.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "导入任务不存在"}), 404
+    return jsonify(job.to_dict())
+
+
 @admin_bp.route("/visits", methods=["GET"])
 @require_admin
 def list_visits():
-    """获取访问记录"""
+    """获取访问记录（先写入缓冲区中尚未落库的记录）"""
     db_path = current_app.config["DATABASE_PATH"]
+    visit_buffer.flush()
     visits = get_visits(db_path, limit=200)
     return jsonify(
         {
@@ -222,6 +287,121 @@ def list_visits():
                     "path": v["path"],
                 }
                 for v in visits
-            ]
+            ],
+            "buffer": visit_buffer.stats(),
+        }
+    )
+
+
+# 访问统计时间粒度：(桶格式, 桶长度, 默认时间范围)
+STATS_GRANULARITIES = {
+    "hour": ("%Y-%m-%d %H:00:00", timedelta(hours=1), timedelta(hours=47)),
+    "day": ("%Y-%m-%d", timedelta(days=1), timedelta(days=29)),
+}
+# 单次查询最多返回的时间桶数
+STATS_MAX_BUCKETS = 2000
+
+
+@admin_bp.route("/visits/stats", methods=["GET"])
+@require_admin
+def visit_stats():
+    """
+    访问统计（只查询汇总表）
+
+    查询参数：
+        from / to: 起止时间（YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS，均包含）
+        granularity: hour 或 day，默认 day
+    """
+    db_path = current_app.config["DATABASE_PATH"]
+    granularity = request.args.get("granularity", "day")
+    if granularity not in STATS_GRANULARITIES:
+        return jsonify({"error": "granularity 只能是 hour 或 day"}), 400
+    bucket_format, step, default_span = STATS_GRANULARITIES[granularity]
+
+    try:
+        end = (
+            datetime.fromisoformat(request.args["to"])
+            if request.args.get("to")
+            else datetime.now()
+        )
+        start = (
+            datetime.fromisoformat(request.args["from"])
+            if request.args.get("from")
+            else end - default_span
+        )
+    except ValueError:
+        return jsonify({"error": "from / to 时间格式不正确"}), 400
+
+    # 对齐到桶起点
+    start = datetime.strptime(start.strftime(bucket_format), bucket_format)
+    end = datetime.strptime(end.strftime(bucket_format), bucket_format)
+    if start > end:
+        return jsonify({"error": "from 不能晚于 to"}), 400
+    if (end - start) / step >= STATS_MAX_BUCKETS:
+        return jsonify({"error": "时间范围过大，请缩小范围或改用按天统计"}), 400
+
+    start_bucket = start.strftime(bucket_format)
+    end_bucket = end.strftime(bucket_format)
+    rows = {
+        r["bucket"]: r
+        for r in get_visit_rollups(db_path, granularity, start_bucket, end_bucket)
+    }
+
+    # 没有访问的时间桶补零
+    series = []
+    current = start
+    while current <= end:
+        bucket = current.strftime(bucket_format)
+        row = rows.get(bucket)
+        series.append(
+            {
+                "bucket": bucket,
+                "views": row["views"] if row else 0,
+                "unique_ips": row["unique_ips"] if row else 0,
+            }
+        )
+        current += step
+
+    top_paths = get_top_paths(db_path, granularity, start_bucket, end_bucket)
+
+    return jsonify(
+        {
+            "granularity": granularity,
+            "from": start_bucket,
+            "to": end_bucket,
+            "total_views": sum(item["views"] for item in series),
+            "series": series,
+            "top_paths": [{"path": p["path"], "views": p["views"]} for p in top_paths],
+        }
+    )
+
+
+@admin_bp.route("/index-jobs", methods=["GET"])
+@require_admin
+def list_index_jobs():
+    """获取索引队列状态和任务列表"""
+    db_path = current_app.config["DATABASE_PATH"]
+    status = request.args.get("status")
+    limit = request.args.get("limit", 100, type=int)
+
+    counts = count_index_jobs(db_path)
+    jobs = get_index_jobs(db_path, status=status, limit=limit)
+
+    return jsonify(
+        {
+            "queue_depth": counts.get("pending", 0),
+            "counts": counts,
+            "jobs": [
+                {
+                    "id": j["id"],
+                    "post_id": j["post_id"],
+                    "status": j["status"],
+                    "attempts": j["attempts"],
+                    "last_error": j["last_error"],
+                    "created_at": j["created_at"],
+                    "updated_at": j["updated_at"],
+                }
+                for j in jobs
+            ],
         }
     )
@@ -1,37 +1,109 @@
-from flask import Blueprint, jsonify, current_app, request
-from app.models import create_post, get_post, get_all_posts, log_visit
-from app.services.embedding_service import update_post_embeddings
-from app.services.rag_service import rag_query
-import traceback
+from flask import (
+    Blueprint,
+    Response,
+    jsonify,
+    current_app,
+    request,
+    stream_with_context,
+)
+from app.models import create_post, get_post, get_posts_page
+from app.services.index_queue import index_queue
+from app.services.response_cache import response_cache
+from app.services.rag_service import rag_query, rag_query_stream
+from app.services.visit_buffer import visit_buffer
+from app.utils.pagination import parse_page_args, format_cursor
+from datetime import datetime, timezone
+import json, traceback
 
 api_bp = Blueprint("api", __name__)
 
 
+def _parse_timestamp(value):
+    """解析数据库中的时间字符串，无时区时按 UTC 处理（文章时间统一以 UTC 写入）"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _cached_json(build):
+    """
+    带条件请求和进程内缓存的 JSON 响应
+
+    ETag 由语料版本生成，客户端 If-None-Match 命中时直接返回 304，不读取数据库；
+    否则从响应缓存读取或调用 build() 生成，再按 If-Modified-Since 判断是否返回 304。
+
+    Args:
+        build: 返回 (响应数据, 状态码, Last-Modified) 的函数，只缓存 200 响应
+    """
+    version = response_cache.version()
+    etag = f"v{version}"
+
+    # If-None-Match: * 只在资源存在时才能返回 304，交给下方 make_conditional 判断
+    if not request.if_none_match.star_tag and request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    key = request.full_path
+    cached = response_cache.get(key, version)
+    if cached is None:
+        payload, status, last_modified = build()
+        if status != 200:
+            return jsonify(payload), status
+
+        body = current_app.json.response(payload).get_data()
+        response_cache.set(key, version, body, last_modified)
+    else:
+        body, last_modified = cached
+
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # 允许缓存但每次使用前需要重新验证
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @api_bp.route("/posts", methods=["POST", "GET"])
 def posts():
     """获取文章列表或创建新文章"""
     db_path = current_app.config["DATABASE_PATH"]
 
     if request.method == "GET":
-        posts = get_all_posts(db_path, status="published")
-        return jsonify(
-            {
+        # keyset 分页：?after=<created_at,id>&limit=，只读取摘要而非全文
+        try:
+            after, limit = parse_page_args(
+                request.args,
+                current_app.config.get("POSTS_PAGE_SIZE", 20),
+                current_app.config.get("POSTS_MAX_PAGE_SIZE", 100),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        def build():
+            posts, next_cursor = get_posts_page(
+                db_path, status="published", after=after, limit=limit
+            )
+            payload = {
                 "posts": [
                     {
                         "id": p["id"],
                         "title": p["title"],
-                        "content": (
-                            p["content"][:200] + "..."
-                            if len(p["content"]) > 200
-                            else p["content"]
-                        ),
+                        "content": p["excerpt"],
                         "created_at": p["created_at"],
                         "updated_at": p["updated_at"],
                     }
                     for p in posts
-                ]
+                ],
+                "next_cursor": format_cursor(next_cursor),
             }
-        )
+            last_modified = max(
+                (_parse_timestamp(p["updated_at"]) for p in posts), default=None
+            )
+            return payload, 200, last_modified
+
+        return _cached_json(build)
 
     elif request.method == "POST":
         data = request.get_json()
@@ -45,37 +117,54 @@ def posts():
         try:
             # 创建文章
             post_id = create_post(db_path, title, content, status)
+            response_cache.invalidate()
 
-            # 如果是已发布状态，生成向量
+            # 如果是已发布状态，提交后台索引任务
+            response = {"message": "文章创建成功", "post_id": post_id}
             if status == "published":
-                update_post_embeddings(post_id, title, content)
+                response["index_job_id"] = index_queue.enqueue(post_id)
 
-            return jsonify({"message": "文章创建成功", "post_id": post_id}), 201
+            return jsonify(response), 201
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
 
 @api_bp.route("/posts/<int:post_id>", methods=["GET"])
 def get_post_detail(post_id):
-    """获取文章详情"""
+    """
+    获取文章详情
+
+    ?format=html 时返回发布时预渲染的 HTML（content_html）和标题目录（toc），
+    不返回 Markdown 原文，客户端无需再解析和高亮
+    """
     db_path = current_app.config["DATABASE_PATH"]
-    post = get_post(db_path, post_id)
+    output_format = request.args.get("format", "markdown")
+    if output_format not in ("markdown", "html"):
+        return jsonify({"error": "format 只能是 markdown 或 html"}), 400
+
+    def build():
+        post = get_post(db_path, post_id)
 
-    if not post:
-        return jsonify({"error": "文章不存在"}), 404
+        if not post:
+            return {"error": "文章不存在"}, 404, None
 
-    if post["status"] != "published":
-        return jsonify({"error": "文章未发布"}), 403
+        if post["status"] != "published":
+            return {"error": "文章未发布"}, 403, None
 
-    return jsonify(
-        {
+        payload = {
             "id": post["id"],
             "title": post["title"],
-            "content": post["content"],
             "created_at": post["created_at"],
             "updated_at": post["updated_at"],
         }
-    )
+        if output_format == "html":
+            payload["content_html"] = post["content_html"]
+            payload["toc"] = json.loads(post["toc"] or "[]")
+        else:
+            payload["content"] = post["content"]
+        return payload, 200, _parse_timestamp(post["updated_at"])
+
+    return _cached_json(build)
 
 
 @api_bp.route("/rag/query", methods=["POST"])
@@ -96,6 +185,26 @@ def rag_query_endpoint():
         return jsonify({"error": f"问答服务暂时不可用: {str(e)}"}), 500
 
 
+@api_bp.route("/rag/query/stream", methods=["POST"])
+def rag_query_stream_endpoint():
+    """RAG 流式问答接口（Server-Sent Events）"""
+    data = request.get_json(silent=True) or {}
+    question = data.get("question")
+
+    if not question:
+        return jsonify({"error": "问题不能为空"}), 400
+
+    def event_stream():
+        for event, payload in rag_query_stream(question):
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @api_bp.route("/visitor/track", methods=["POST"])
 def track_visitor():
     """访客追踪接口，供前端在路由变化时调用"""
@@ -121,7 +230,7 @@ def track_visitor():
         if not should_log:
             return jsonify({"tracked": False, "reason": "路径不在追踪列表中"}), 200
 
-    db_path = current_app.config["DATABASE_PATH"]
-    log_visit(db_path, request.remote_addr, path)
+    # 只在内存中去重并写入缓冲区，由后台线程批量落库
+    tracked = visit_buffer.record(request.remote_addr, path)
 
-    return jsonify({"tracked": True}), 201
+    return jsonify({"tracked": tracked}), 201
@@ -0,0 +1,86 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.models import count_index_jobs, get_corpus_version
+from app.services.answer_cache import answer_cache
+from app.services.embedding_cache import embedding_cache
+from app.services.rerank_cache import rerank_cache
+from app.services.response_cache import response_cache
+from app.services.visit_buffer import visit_buffer
+from app.utils.auth import verify_ip
+from app.utils.metrics import registry
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def collect_service_metrics():
+    """导出各缓存、队列自行维护的统计（每次抓取时读取）"""
+    caches = {
+        "embedding": embedding_cache.stats(),
+        "rerank": rerank_cache.stats(),
+        "answer": answer_cache.stats(),
+        "response": response_cache.stats(),
+    }
+    lookups = []
+    sizes = []
+    for name, stats in caches.items():
+        for key, result in (("hits", "hit"), ("misses", "miss")):
+            if key in stats:
+                lookups.append(({"cache": name, "result": result}, stats[key]))
+        if "size" in stats:
+            sizes.append(({"cache": name}, stats["size"]))
+    lookups.append(
+        (
+            {"cache": "embedding_persistent", "result": "hit"},
+            caches["embedding"].get("persistent_hits", 0),
+        )
+    )
+
+    buffer = visit_buffer.stats()
+    db_path = current_app.config["DATABASE_PATH"]
+    jobs = count_index_jobs(db_path)
+
+    return [
+        ("cache_lookups_total", "counter", "缓存查询次数（按结果）", lookups),
+        ("cache_entries", "gauge", "缓存条目数", sizes),
+        (
+            "index_jobs",
+            "gauge",
+            "后台索引任务数（按状态）",
+            [({"status": status}, count) for status, count in jobs.items()],
+        ),
+        (
+            "visit_buffer_pending",
+            "gauge",
+            "访客记录缓冲区中待写入的条数",
+            [({}, buffer["pending"])],
+        ),
+        (
+            "visit_buffer_events_total",
+            "counter",
+            "访客记录缓冲区事件次数",
+            [
+                ({"event": event}, buffer[event])
+                for event in ("accepted", "deduplicated", "dropped", "flushed")
+            ],
+        ),
+        (
+            "corpus_version",
+            "gauge",
+            "语料版本号（文章或索引变化时递增）",
+            [({}, get_corpus_version(db_path))],
+        ),
+    ]
+
+
+registry.register_collector(collect_service_metrics)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """以 Prometheus 文本格式导出指标（仅限管理 IP 白名单）"""
+    if not verify_ip(request.remote_addr, current_app.config["ADMIN_IP_WHITELIST"]):
+        return jsonify({"error": "访问被拒绝：IP 不在白名单中"}), 403
+
+    return Response(registry.render(), content_type=CONTENT_TYPE)
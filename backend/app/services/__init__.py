@@ -1,15 +1,45 @@
 from .embedding_service import (
     generate_embedding,
+    generate_embeddings,
+    generate_query_embedding,
     update_post_embeddings,
     delete_post_embeddings,
 )
-from .rag_service import rag_query
+from .rag_service import rag_query, rag_query_stream
+from .vector_store import vector_store, get_vector_store
 from .chroma_service import chroma_service
+from .numpy_store import numpy_store
+from .embedding_cache import embedding_cache
+from .answer_cache import answer_cache
+from .http_client import http_client
+from .rerank_cache import rerank_cache
+from .index_queue import index_queue
+from .visit_buffer import visit_buffer
+from .response_cache import response_cache
+from .import_service import import_service
+from .reindex_service import reindex_service
+from .index_reconciler import index_reconciler
 
 __all__ = [
     "generate_embedding",
+    "generate_embeddings",
+    "generate_query_embedding",
     "update_post_embeddings",
     "delete_post_embeddings",
     "rag_query",
+    "rag_query_stream",
+    "vector_store",
+    "get_vector_store",
     "chroma_service",
+    "numpy_store",
+    "embedding_cache",
+    "answer_cache",
+    "http_client",
+    "rerank_cache",
+    "index_queue",
+    "visit_buffer",
+    "response_cache",
+    "import_service",
+    "reindex_service",
+    "index_reconciler",
 ]
@@ -0,0 +1,133 @@
+from flask import current_app
+import numpy as np
+import threading, time
+
+
+class AnswerCache:
+    """
+    语义回答缓存
+
+    保存历史问题的向量和回答；新问题与某个已缓存问题的余弦距离
+    不超过 ANSWER_CACHE_MAX_DISTANCE 时直接返回缓存的回答。
+    所有条目都标记语料版本，版本变化（文章增删改、重新索引）后整体失效。
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.version = None
+        self._questions = []
+        self._answers = []
+        self._created_at = []
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _reset(self, version):
+        self.version = version
+        self._questions = []
+        self._answers = []
+        self._created_at = []
+        self._matrix = None
+
+    def get(self, embedding: list, corpus_version: int):
+        """
+        查找语义相近的已缓存问题
+
+        Args:
+            embedding: 问题向量
+            corpus_version: 当前语料版本
+
+        Returns:
+            dict | None: 命中时返回 {"question", "answer", "distance"}
+        """
+        config = current_app.config
+        if not config.get("ANSWER_CACHE_ENABLED", True):
+            return None
+
+        max_distance = config.get("ANSWER_CACHE_MAX_DISTANCE", 0.1)
+        ttl = config.get("ANSWER_CACHE_TTL", 24 * 3600)
+
+        with self._lock:
+            if self.version != corpus_version:
+                self._reset(corpus_version)
+
+            if self._matrix is None:
+                self.misses += 1
+                return None
+
+            similarities = self._matrix @ self._normalize(embedding)
+            best = int(np.argmax(similarities))
+            distance = float(1.0 - similarities[best])
+
+            if distance > max_distance or self._created_at[best] < time.time() - ttl:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return {
+                "question": self._questions[best],
+                "answer": self._answers[best],
+                "distance": distance,
+            }
+
+    def set(self, question: str, embedding: list, answer: str, corpus_version: int):
+        """
+        缓存问题的回答，超出 ANSWER_CACHE_SIZE 时淘汰最早的条目
+
+        Args:
+            question: 用户问题
+            embedding: 问题向量
+            answer: 生成的回答
+            corpus_version: 生成回答时的语料版本
+        """
+        config = current_app.config
+        if not config.get("ANSWER_CACHE_ENABLED", True):
+            return
+
+        maxsize = config.get("ANSWER_CACHE_SIZE", 512)
+        vector = self._normalize(embedding)[np.newaxis, :]
+
+        with self._lock:
+            if self.version != corpus_version:
+                # 生成期间语料已更新，回答可能已过时，不写入
+                if self.version is not None and corpus_version < self.version:
+                    return
+                self._reset(corpus_version)
+
+            self._questions.append(question)
+            self._answers.append(answer)
+            self._created_at.append(time.time())
+            self._matrix = (
+                vector if self._matrix is None else np.vstack([self._matrix, vector])
+            )
+
+            overflow = len(self._answers) - maxsize
+            if overflow > 0:
+                del self._questions[:overflow]
+                del self._answers[:overflow]
+                del self._created_at[:overflow]
+                self._matrix = self._matrix[overflow:]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._reset(None)
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        return {
+            "size": len(self._answers),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# 全局单例
+answer_cache = AnswerCache()
@@ -1,16 +1,21 @@
+from app.services.vector_store import VectorStore
 from flask import current_app
-import chromadb, os
+import os
 
 
-class ChromaService:
+class ChromaService(VectorStore):
     """ChromaDB 向量数据库服务"""
 
-    def __init__(self):
+    def __init__(self, collection_name: str = None):
         self.client = None
         self.collection = None
+        self.collection_name = collection_name
 
     def init_client(self):
         """初始化 ChromaDB 客户端"""
+        # 延迟导入：选用其他向量存储后端时不必承担 chromadb 的导入开销
+        import chromadb
+
         persist_directory = current_app.config.get("CHROMADB_PATH", "./chromadb_data")
 
         # 确保目录存在
@@ -18,69 +23,69 @@ class ChromaService:
 
         self.client = chromadb.PersistentClient(path=persist_directory)
 
-        # 获取或创建 collection
-        collection_name = current_app.config.get("CHROMADB_COLLECTION", "blog_chunks")
+        # 获取或创建 collection（未指定集合名时使用默认集合）
+        if self.collection_name is None:
+            self.collection_name = current_app.config.get(
+                "CHROMADB_COLLECTION", "blog_chunks"
+            )
         self.collection = self.client.get_or_create_collection(
-            name=collection_name, metadata={"hnsw:space": "cosine"}
+            name=self.collection_name, metadata={"hnsw:space": "cosine"}
         )
 
-    def add_embedding(
-        self,
-        chunk_id: int,
-        embedding: list,
-        post_id: int,
-        title: str,
-        chunk_text: str,
-        chunk_index: int,
-    ):
+    def add_embeddings(self, items: list):
         """
-        添加向量到 ChromaDB
-
-        Args:
-            chunk_id: 文本块 ID
-            embedding: 1024 维向量
-            post_id: 文章 ID
-            title: 文章标题
-            chunk_text: 文本块内容
-            chunk_index: 文本块索引
+        批量添加向量到 ChromaDB，所有条目在一次 collection.add 中写入
         """
+        if not items:
+            return
+
         if self.collection is None:
             self.init_client()
 
-        # 构造文档 ID
-        doc_id = f"chunk_{chunk_id}"
-
-        # 添加到 collection
         self.collection.add(
-            ids=[doc_id],
-            embeddings=[embedding],
-            metadatas=[
-                {
-                    "chunk_id": chunk_id,
-                    "post_id": post_id,
-                    "title": title,
-                    "chunk_text": chunk_text,
-                    "chunk_index": chunk_index,
-                }
-            ],
-            documents=[chunk_text],
+            ids=[f"chunk_{item['chunk_id']}" for item in items],
+            embeddings=[item["embedding"] for item in items],
+            metadatas=[self.build_metadata(item) for item in items],
+            documents=[item["chunk_text"] for item in items],
         )
 
-    def search(self, embedding: list, top_k: int = 10):
+    def update_metadatas(self, items: list):
         """
-        在 ChromaDB 中搜索相似向量
+        批量更新已有向量的元数据（不改动向量本身）
+        """
+        if not items:
+            return
+
+        if self.collection is None:
+            self.init_client()
+
+        self.collection.update(
+            ids=[f"chunk_{item['chunk_id']}" for item in items],
+            metadatas=[self.build_metadata(item) for item in items],
+        )
+
+    def delete_embeddings(self, chunk_ids: list):
+        """
+        按 chunk ID 批量删除向量
+        """
+        if not chunk_ids:
+            return
+
+        if self.collection is None:
+            self.init_client()
 
-        Args:
-            embedding: 查询向量（1024 维）
-            top_k: 返回前 K 个结果
+        self.collection.delete(ids=[f"chunk_{chunk_id}" for chunk_id in chunk_ids])
 
-        Returns:
-            List[dict]: 搜索结果列表
+    def search(self, embedding: list, top_k: int = 10, where: dict = None):
+        """
+        在 ChromaDB 中搜索相似向量
         """
         if self.collection is None:
             self.init_client()
 
-        results = self.collection.query(query_embeddings=[embedding], n_results=top_k)
+        results = self.collection.query(
+            query_embeddings=[embedding], n_results=top_k, where=where or None
+        )
 
         # 格式化结果
         formatted_results = []
@@ -112,9 +117,6 @@ class ChromaService:
     def delete_post_embeddings(self, post_id: int):
         """
         删除文章的所有向量
-
-        Args:
-            post_id: 文章 ID
         """
         if self.collection is None:
             self.init_client()
@@ -125,6 +127,34 @@ class ChromaService:
         if results["ids"]:
             self.collection.delete(ids=results["ids"])
 
+    def get_all_metadatas(self, batch_size: int = 5000) -> dict:
+        """
+        分页读取全部向量的元数据（不读取向量本身）
+        """
+        if self.collection is None:
+            self.init_client()
+
+        metadatas = {}
+        offset = 0
+        while True:
+            results = self.collection.get(
+                include=["metadatas"], limit=batch_size, offset=offset
+            )
+            metadatas.update(zip(results["ids"], results["metadatas"]))
+            if len(results["ids"]) < batch_size:
+                return metadatas
+            offset += batch_size
+
+    def drop_collection(self):
+        """
+        删除整个 collection
+        """
+        if self.collection is None:
+            self.init_client()
+
+        self.client.delete_collection(self.collection_name)
+        self.collection = None
+
 
 # 全局单例
 chroma_service = ChromaService()
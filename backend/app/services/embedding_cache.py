@@ -0,0 +1,144 @@
+from app.models import get_db_connection
+from app.utils.ttl_cache import TTLCache
+from flask import current_app
+from array import array
+import hashlib, re, threading, time, traceback, unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """规范化查询文本：全角转半角、合并空白"""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """
+    查询向量两级缓存
+
+    1. 进程内 LRU（容量上限 + TTL）
+    2. SQLite 持久层，向量以 float32 二进制存储，重启后仍可用且多个 worker 共享
+    """
+
+    # 每写入多少条持久缓存清理一次过期数据
+    PRUNE_EVERY = 500
+
+    def __init__(self):
+        self.memory = None
+        self.persistent_hits = 0
+        self._db_path = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def init_cache(self):
+        """按应用配置初始化缓存"""
+        config = current_app.config
+        with self._lock:
+            if self.memory is not None:
+                return
+
+            self.memory = TTLCache(
+                maxsize=config.get("EMBEDDING_CACHE_SIZE", 2048),
+                ttl=config.get("EMBEDDING_CACHE_TTL", 7 * 24 * 3600),
+            )
+            self._db_path = config.get("EMBEDDING_CACHE_DB_PATH") or config.get(
+                "DATABASE_PATH"
+            )
+
+            if self._db_path:
+                with get_db_connection(self._db_path) as conn:
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS embedding_cache (
+                            cache_key TEXT PRIMARY KEY,
+                            model TEXT NOT NULL,
+                            embedding BLOB NOT NULL,
+                            created_at REAL NOT NULL
+                        )
+                    """
+                    )
+                    conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """缓存键：模型名 + 规范化文本"""
+        raw = f"{model}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, model: str):
+        """
+        读取缓存向量，依次查询内存层和持久层
+
+        Returns:
+            list | None: 命中时返回向量
+        """
+        if self.memory is None:
+            self.init_cache()
+
+        key = self.make_key(text, model)
+        embedding = self.memory.get(key)
+        if embedding is not None or not self._db_path:
+            return embedding
+
+        try:
+            with get_db_connection(self._db_path) as conn:
+                row = conn.execute(
+                    "SELECT embedding, created_at FROM embedding_cache WHERE cache_key = ?",
+                    (key,),
+                ).fetchone()
+        except Exception:
+            traceback.print_exc()
+            return None
+
+        if row is None or row["created_at"] < time.time() - self.memory.ttl:
+            return None
+
+        vector = array("f")
+        vector.frombytes(row["embedding"])
+        embedding = vector.tolist()
+
+        self.persistent_hits += 1
+        self.memory.set(key, embedding)
+        return embedding
+
+    def set(self, text: str, model: str, embedding: list):
+        """写入两级缓存"""
+        if self.memory is None:
+            self.init_cache()
+
+        key = self.make_key(text, model)
+        self.memory.set(key, embedding)
+
+        if not self._db_path:
+            return
+
+        try:
+            with get_db_connection(self._db_path) as conn:
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO embedding_cache "
+                    "(cache_key, model, embedding, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model, array("f", embedding).tobytes(), now),
+                )
+
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    conn.execute(
+                        "DELETE FROM embedding_cache WHERE created_at < ?",
+                        (now - self.memory.ttl,),
+                    )
+                conn.commit()
+        except Exception:
+            traceback.print_exc()
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        if self.memory is None:
+            return {"size": 0, "hits": 0, "misses": 0, "persistent_hits": 0}
+
+        stats = self.memory.stats()
+        stats["persistent_hits"] = self.persistent_hits
+        return stats
+
+
+# 全局单例
+embedding_cache = EmbeddingCache()
@@ -1,86 +1,292 @@
-from app.models import delete_chunks_by_post, create_chunks, get_chunks_by_post
-from app.utils.markdown_splitter import split_markdown
-from app.services.chroma_service import chroma_service
+from app.database import transaction
+from app.models import (
+    bump_corpus_version,
+    compute_chunk_hash,
+    delete_chunks,
+    get_chunks_by_post,
+    insert_chunks,
+    update_chunks,
+)
+from app.utils.markdown_splitter import split_markdown, split_options
+from app.utils.metrics import UPSTREAM_ERRORS, span
+from app.services.vector_store import (
+    get_active_collection,
+    get_collection_settings,
+    get_vector_store,
+    vector_store,
+)
+from app.services.embedding_cache import embedding_cache
+from app.services.rerank_cache import rerank_cache
+from app.services.http_client import http_client, dashscope_headers
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
-import dashscope, traceback
+import traceback
 
 
-def generate_embedding(text: str) -> list:
+def generate_embedding(text: str, model: str = None, dimension: int = None) -> list:
     """
     调用通义千问 Text-Embedding-v4 API 生成向量
 
-    参考官方示例：使用 dashscope.TextEmbedding.call()
+    通过共享连接池调用 DashScope HTTP 接口
 
     Args:
         text: 输入文本
+        model: Embedding 模型名称，默认为 EMBEDDING_MODEL
+        dimension: 向量维度，默认为 EMBEDDING_DIMENSION
 
     Returns:
         list: 1024 维向量
     """
     try:
-        resp = dashscope.TextEmbedding.call(
-            model=current_app.config["EMBEDDING_MODEL"], input=text
-        )
+        return _embed_batch(
+            model or current_app.config["EMBEDDING_MODEL"], [text], dimension
+        )[0]
+
+    except Exception as e:
+        traceback.print_exc()
+        raise Exception(f"生成向量时出错: {str(e)}")
+
+
+def generate_query_embedding(text: str) -> list:
+    """
+    生成查询向量，优先读取两级缓存
+
+    使用当前向量集合建立时的模型与维度，重建索引期间查询仍与旧集合一致
+
+    Args:
+        text: 查询文本
+
+    Returns:
+        list: 1024 维向量
+    """
+    settings = get_collection_settings()
+    model, dimension = settings["model"], settings["dimension"]
+    cache_model = f"{model}@{dimension}"
+
+    embedding = embedding_cache.get(text, cache_model)
+    if embedding is not None:
+        return embedding
+
+    embedding = generate_embedding(text, model, dimension)
+    embedding_cache.set(text, cache_model, embedding)
+    return embedding
+
+
+def _embed_batch(model: str, texts: list, dimension: int = None) -> list:
+    """
+    对一批文本调用一次 Embedding API
+
+    Args:
+        model: Embedding 模型名称
+        texts: 文本列表（不超过模型单次上限）
+        dimension: 向量维度，默认为 EMBEDDING_DIMENSION
+
+    Returns:
+        list: 与 texts 顺序一致的向量列表
+    """
+    url = f"{current_app.config['DASHSCOPE_BASE_URL']}/services/embeddings/text-embedding/text-embedding"
+    payload = {
+        "model": model,
+        "input": {"texts": texts},
+        "parameters": {
+            "dimension": dimension or current_app.config["EMBEDDING_DIMENSION"]
+        },
+    }
+
+    try:
+        # Embedding 是纯函数调用，可安全重试
+        with span("dashscope", "embedding"):
+            resp = http_client.post_json(
+                url, payload, headers=dashscope_headers(), idempotent=True
+            )
+    except Exception as e:
+        UPSTREAM_ERRORS.inc(service="embedding")
+        raise Exception(f"Embedding API 调用失败: {str(e)}")
+
+    # 返回结果按 text_index 对齐输入顺序
+    embeddings = sorted(resp["output"]["embeddings"], key=lambda e: e["text_index"])
+    return [e["embedding"] for e in embeddings]
 
-        if resp.status_code == 200:
-            embedding = resp["output"]["embeddings"][0]["embedding"]
-            return embedding
+
+def generate_embeddings(
+    texts: list, model: str = None, dimension: int = None, max_concurrency: int = None
+) -> list:
+    """
+    批量生成向量
+
+    按 EMBEDDING_BATCH_SIZE 将文本分批，多个批次最多以
+    EMBEDDING_MAX_CONCURRENCY 的并发同时请求
+
+    Args:
+        texts: 输入文本列表
+        model: Embedding 模型名称，默认为 EMBEDDING_MODEL
+        dimension: 向量维度，默认为 EMBEDDING_DIMENSION
+        max_concurrency: 并发请求数上限，默认为 EMBEDDING_MAX_CONCURRENCY
+
+    Returns:
+        list: 与 texts 顺序一致的向量列表
+    """
+    if not texts:
+        return []
+
+    model = model or current_app.config["EMBEDDING_MODEL"]
+    batch_size = current_app.config.get("EMBEDDING_BATCH_SIZE", 10)
+    if max_concurrency is None:
+        max_concurrency = current_app.config.get("EMBEDDING_MAX_CONCURRENCY", 4)
+
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    app = current_app._get_current_object()
+
+    def embed_in_context(batch):
+        with app.app_context():
+            return _embed_batch(model, batch, dimension)
+
+    try:
+        if len(batches) == 1 or max_concurrency <= 1:
+            results = [_embed_batch(model, batch, dimension) for batch in batches]
         else:
-            raise Exception(f"Embedding API 调用失败: {resp.message}")
+            workers = min(max_concurrency, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(embed_in_context, batches))
+
+        return [embedding for batch in results for embedding in batch]
 
     except Exception as e:
         traceback.print_exc()
-        raise Exception(f"生成向量时出错: {str(e)}")
+        raise Exception(f"批量生成向量时出错: {str(e)}")
 
 
 def update_post_embeddings(post_id: int, title: str, content: str):
     """
-    更新文章的向量表示
+    增量更新文章的向量表示
 
-    1. 删除旧的 chunks 和向量
-    2. 分割 Markdown 内容
-    3. 生成新的 chunks 和向量
-    4. 存入 ChromaDB
+    1. 分割 Markdown 内容，计算每个 chunk 的内容哈希
+    2. 与已存储 chunks 的哈希比对：内容未变的 chunk 复用原向量，
+       仅位置变化的只更新 chunk_index
+    3. 只为新增/变化的 chunk 批量生成向量（先生成向量再改库，
+       API 失败时旧索引保持不变）
+    4. 写入新增 chunk，删除不再存在的 chunk
+    所有读写都针对调用开始时的当前向量集合，并使用该集合的 Embedding 设置
     """
+    with span("index", "total"):
+        _update_post_embeddings(post_id, title, content)
+
+
+def _update_post_embeddings(post_id: int, title: str, content: str):
     db_path = current_app.config["DATABASE_PATH"]
 
     try:
-        # 1. 删除旧的 chunks 和向量
-        delete_chunks_by_post(db_path, post_id)
-        chroma_service.delete_post_embeddings(post_id)
-
-        # 2. 分割 Markdown 内容
-        chunks = split_markdown(content, title)
-
-        if not chunks:
-            return
-
-        # 3. 创建 chunks 记录
-        create_chunks(db_path, post_id, chunks)
-
-        # 4. 获取创建的 chunks（带 ID）
-        chunk_records = get_chunks_by_post(db_path, post_id)
-
-        # 5. 为每个 chunk 生成向量并存入 ChromaDB
-        for chunk_record in chunk_records:
-            chunk_id = chunk_record["id"]
-            chunk_text = chunk_record["chunk_text"]
-            chunk_index = chunk_record["chunk_index"]
-
-            # 生成向量
-            embedding = generate_embedding(chunk_text)
-
-            # 存入 ChromaDB
-            chroma_service.add_embedding(
-                chunk_id=chunk_id,
-                embedding=embedding,
-                post_id=post_id,
-                title=title,
-                chunk_text=chunk_text,
-                chunk_index=chunk_index,
+        collection = get_active_collection(refresh=True)
+        store = get_vector_store(collection)
+        settings = get_collection_settings(collection)
+
+        # 1. 分割 Markdown 内容
+        with span("index", "split"):
+            chunks = split_markdown(content, title, **split_options(current_app.config))
+
+        # 2. 按内容哈希索引已有 chunks（相同内容可能出现多次）
+        reusable = {}
+        for record in get_chunks_by_post(db_path, post_id, collection):
+            content_hash = record["content_hash"] or compute_chunk_hash(
+                record["chunk_text"]
+            )
+            reusable.setdefault(content_hash, []).append(record)
+
+        new_chunks = []
+        moved_chunks = []
+        for idx, chunk_text in enumerate(chunks):
+            content_hash = compute_chunk_hash(chunk_text)
+            if reusable.get(content_hash):
+                record = reusable[content_hash].pop(0)
+                # 位置变化或旧数据缺少哈希时，只需更新元数据
+                if record["chunk_index"] != idx or not record["content_hash"]:
+                    moved_chunks.append(
+                        {
+                            "chunk_id": record["id"],
+                            "post_id": post_id,
+                            "title": title,
+                            "chunk_text": chunk_text,
+                            "chunk_index": idx,
+                            "content_hash": content_hash,
+                        }
+                    )
+            else:
+                new_chunks.append((idx, chunk_text, content_hash))
+
+        stale_ids = [r["id"] for records in reusable.values() for r in records]
+
+        # 3. 只为新增/变化的 chunk 生成向量
+        with span("index", "embedding"):
+            embeddings = generate_embeddings(
+                [text for _, text, _ in new_chunks],
+                settings["model"],
+                settings["dimension"],
             )
 
-        print(f"文章 {post_id} 的向量更新成功，共 {len(chunks)} 个 chunk")
+        # 4-7. 写入 chunk 与向量（计入 write 阶段）
+        with span("index", "write"):
+            # 4. 写入新增 chunk 及其向量；向量存储不参与 SQLite 事务，
+            #    写入失败时删除已写入的向量并回滚新增的 chunk，重试时重新生成
+            if new_chunks:
+                with transaction(db_path):
+                    chunk_ids = insert_chunks(
+                        db_path,
+                        post_id,
+                        [(idx, text) for idx, text, _ in new_chunks],
+                        collection,
+                    )
+                    try:
+                        store.add_embeddings(
+                            [
+                                {
+                                    "chunk_id": chunk_id,
+                                    "embedding": embedding,
+                                    "post_id": post_id,
+                                    "title": title,
+                                    "chunk_text": text,
+                                    "chunk_index": idx,
+                                    "content_hash": content_hash,
+                                }
+                                for chunk_id, embedding, (
+                                    idx,
+                                    text,
+                                    content_hash,
+                                ) in zip(chunk_ids, embeddings, new_chunks)
+                            ]
+                        )
+                    except Exception:
+                        try:
+                            store.delete_embeddings(chunk_ids)
+                        except Exception:
+                            traceback.print_exc()
+                        raise
+
+            # 5. 删除不再存在的 chunk
+            if stale_ids:
+                delete_chunks(db_path, stale_ids)
+                store.delete_embeddings(stale_ids)
+                rerank_cache.invalidate_chunks(stale_ids)
+
+            # 6. 更新复用 chunk 的位置
+            if moved_chunks:
+                update_chunks(
+                    db_path,
+                    [
+                        (c["chunk_id"], c["chunk_index"], c["content_hash"])
+                        for c in moved_chunks
+                    ],
+                )
+                store.update_metadatas(moved_chunks)
+
+            # 7. 索引内容变化，使语义回答缓存失效
+            if new_chunks or stale_ids:
+                bump_corpus_version(db_path)
+
+        print(
+            f"文章 {post_id} 的向量更新成功，共 {len(chunks)} 个 chunk"
+            f"（新增 {len(new_chunks)}，删除 {len(stale_ids)}，"
+            f"复用 {len(chunks) - len(new_chunks)}）"
+        )
 
     except Exception as e:
         traceback.print_exc()
@@ -91,8 +297,13 @@ def delete_post_embeddings(post_id: int):
     """
     删除文章的向量表示
     """
+    db_path = current_app.config["DATABASE_PATH"]
+
     try:
-        chroma_service.delete_post_embeddings(post_id)
+        chunk_ids = [record["id"] for record in get_chunks_by_post(db_path, post_id)]
+        vector_store.delete_post_embeddings(post_id)
+        rerank_cache.invalidate_chunks(chunk_ids)
+        bump_corpus_version(db_path)
         print(f"文章 {post_id} 的向量删除成功")
     except Exception as e:
         traceback.print_exc()
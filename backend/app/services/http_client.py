@@ -0,0 +1,183 @@
+from requests.adapters import HTTPAdapter
+from flask import current_app
+import json, requests, threading, time
+
+
+# 可安全重试的状态码（限流或网关错误，请求未被上游处理）
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    共享的 HTTP 连接池
+
+    - 进程内复用同一个 requests.Session，保持 keep-alive，避免每次请求重新握手
+    - 每个主机的连接数有上限（pool_block，超出时等待空闲连接）
+    - 连接/读取超时可配置
+    - 仅对幂等请求重试限流、网关错误和超时；非幂等请求只重试建连失败
+    """
+
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            self.init_session()
+        return self._session
+
+    def init_session(self):
+        """按应用配置创建连接池"""
+        config = current_app.config
+        with self._lock:
+            if self._session is not None:
+                return
+
+            adapter = HTTPAdapter(
+                pool_connections=config.get("HTTP_POOL_CONNECTIONS", 4),
+                pool_maxsize=config.get("HTTP_POOL_MAXSIZE", 10),
+                pool_block=True,
+                max_retries=0,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+
+    def close(self):
+        """关闭连接池"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        idempotent: bool = False,
+        read_timeout: float = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        发送 HTTP 请求
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            idempotent: 请求是否幂等（决定超时和 5xx 是否重试）
+            read_timeout: 读取超时，默认 HTTP_READ_TIMEOUT
+            **kwargs: 透传给 requests 的参数
+
+        Returns:
+            requests.Response: 响应对象
+        """
+        config = current_app.config
+        timeout = (
+            config.get("HTTP_CONNECT_TIMEOUT", 3.05),
+            read_timeout or config.get("HTTP_READ_TIMEOUT", 30),
+        )
+        max_retries = config.get("HTTP_MAX_RETRIES", 2)
+        backoff = config.get("HTTP_RETRY_BACKOFF", 0.5)
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectTimeout:
+                # 建连失败，请求一定没有发出，任何请求都可以重试
+                if attempt >= max_retries:
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not idempotent or attempt >= max_retries:
+                    raise
+            else:
+                if (
+                    not idempotent
+                    or response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= max_retries
+                ):
+                    return response
+                response.close()
+
+            time.sleep(backoff * (2**attempt))
+            attempt += 1
+
+    def post_json(self, url: str, payload: dict, headers: dict = None, **kwargs) -> dict:
+        """
+        POST JSON 并解析 JSON 响应，非 200 时抛出异常
+
+        Args:
+            url: 请求地址
+            payload: 请求体
+            headers: 额外请求头
+            **kwargs: 透传给 request 的参数（idempotent、read_timeout 等）
+
+        Returns:
+            dict: 响应 JSON
+        """
+        response = self.request("POST", url, json=payload, headers=headers, **kwargs)
+
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {_error_message(response)}")
+
+        return response.json()
+
+    def stream_sse(self, url: str, payload: dict, headers: dict = None, **kwargs):
+        """
+        POST JSON 并以 Server-Sent Events 读取响应
+
+        Args:
+            url: 请求地址
+            payload: 请求体
+            headers: 额外请求头
+            **kwargs: 透传给 request 的参数
+
+        Yields:
+            dict: 每个事件 data 字段解析后的 JSON
+        """
+        headers = {**(headers or {}), "Accept": "text/event-stream"}
+        response = self.request(
+            "POST", url, json=payload, headers=headers, stream=True, **kwargs
+        )
+
+        with response:
+            if response.status_code != 200:
+                raise Exception(
+                    f"HTTP {response.status_code}: {_error_message(response)}"
+                )
+
+            # 按 UTF-8 解码，避免无 charset 的 text/event-stream 被当作 latin-1
+            for raw_line in response.iter_lines():
+                line = raw_line.decode("utf-8")
+                if line.startswith("data:"):
+                    data = line[5:].strip()
+                    if data and data != "[DONE]":
+                        yield json.loads(data)
+
+
+def _error_message(response: requests.Response) -> str:
+    """从错误响应中提取错误信息"""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text
+
+    error = body.get("error") if isinstance(body, dict) else None
+    if isinstance(error, dict):
+        return error.get("message", str(error))
+    return (body.get("message") if isinstance(body, dict) else None) or str(body)
+
+
+def dashscope_headers() -> dict:
+    """DashScope API 鉴权请求头"""
+    return {
+        "Authorization": f"Bearer {current_app.config['DASHSCOPE_API_KEY']}",
+        "Content-Type": "application/json",
+    }
+
+
+# 全局单例
+http_client = HttpClient()
@@ -0,0 +1,407 @@
+from app.database import transaction
+from app.models import bump_corpus_version, create_post, get_post_titles, insert_chunks
+from app.rendering import render_markdown
+from app.services.embedding_service import generate_embeddings
+from app.services.index_queue import index_queue
+from app.services.response_cache import response_cache
+from app.services.vector_store import (
+    get_active_collection,
+    get_collection_settings,
+    get_vector_store,
+)
+from app.utils.markdown_splitter import split_markdown_task, split_options
+from concurrent.futures import ProcessPoolExecutor
+from dateutil import parser as date_parser
+from datetime import timezone
+from flask import current_app
+import multiprocessing, os, threading, time, traceback, uuid, zipfile
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+
+
+def parse_front_matter(text: str):
+    """
+    解析 Markdown 开头的 front-matter（--- 包围的 key: value 行）
+
+    Returns:
+        tuple: (元数据 dict，键为小写；正文)
+    """
+    text = text.replace("\r\n", "\n")
+    if not text.startswith("---\n"):
+        return {}, text
+
+    end = text.find("\n---", 4)
+    if end == -1:
+        return {}, text
+
+    meta = {}
+    for line in text[4:end].split("\n"):
+        key, sep, value = line.partition(":")
+        if sep and key.strip():
+            meta[key.strip().lower()] = value.strip().strip("\"'")
+
+    body = text[end + 4 :]
+    return meta, body.split("\n", 1)[1] if "\n" in body else ""
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    # 与 CURRENT_TIMESTAMP 一致存为 UTC，不带时区的日期按服务器本地时间换算
+    parsed = date_parser.parse(value)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_document(name: str, text: str) -> dict:
+    """
+    将 Markdown 文件解析为文章字段
+
+    标题依次取 front-matter 的 title、正文开头的一级标题、文件名；
+    状态取 status（或 draft: true），日期取 date/created_at 与 updated/updated_at
+
+    Raises:
+        ValueError: 正文为空或字段格式不正确
+    """
+    meta, body = parse_front_matter(text)
+    body = body.strip("\n")
+
+    title = meta.get("title")
+    if not title and body.startswith("# "):
+        first_line, _, body = body.partition("\n")
+        title = first_line[2:].strip()
+        body = body.strip("\n")
+    if not title:
+        title = os.path.splitext(os.path.basename(name))[0]
+
+    if not body.strip():
+        raise ValueError("正文为空")
+
+    status = meta.get("status", "published").lower()
+    if meta.get("draft", "").lower() == "true":
+        status = "draft"
+    if status not in ("published", "draft"):
+        raise ValueError(f"未知的文章状态: {status}")
+
+    try:
+        created_at = _parse_date(meta.get("date") or meta.get("created_at"))
+        updated_at = _parse_date(meta.get("updated") or meta.get("updated_at"))
+    except (ValueError, OverflowError):
+        raise ValueError("日期格式不正确")
+
+    return {
+        "name": name,
+        "title": title,
+        "content": body,
+        "status": status,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+
+def read_sources(source, max_bytes: int = 50 * 1024 * 1024) -> list:
+    """
+    读取 Markdown 文件
+
+    Args:
+        source: 目录路径、zip 文件路径或文件对象、单个 .md 文件路径
+        max_bytes: 解压后总大小上限
+
+    Returns:
+        list: (文件名, 文本) 列表，按文件名排序
+    """
+    files = []
+
+    if isinstance(source, str) and os.path.isdir(source):
+        for root, dirs, names in os.walk(source):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for filename in names:
+                if filename.lower().endswith(MARKDOWN_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    with open(path, "rb") as f:
+                        files.append((os.path.relpath(path, source), f.read()))
+
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            entries = [
+                info
+                for info in archive.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(MARKDOWN_EXTENSIONS)
+                and not info.filename.startswith("__MACOSX/")
+                and not os.path.basename(info.filename).startswith(".")
+            ]
+            if sum(info.file_size for info in entries) > max_bytes:
+                raise ValueError("压缩包解压后超过大小限制")
+            files = [(info.filename, archive.read(info)) for info in entries]
+
+    elif isinstance(source, str) and source.lower().endswith(MARKDOWN_EXTENSIONS):
+        with open(source, "rb") as f:
+            files.append((os.path.basename(source), f.read()))
+
+    else:
+        raise ValueError("只支持目录、zip 压缩包或 Markdown 文件")
+
+    if sum(len(data) for _, data in files) > max_bytes:
+        raise ValueError("导入内容超过大小限制")
+
+    return sorted(
+        (name, data.decode("utf-8-sig", errors="replace")) for name, data in files
+    )
+
+
+class ImportJob:
+    """一次导入任务的进度与结果"""
+
+    def __init__(self, total_files: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = "running"
+        self.stage = "parse"
+        self.total_files = total_files
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self.post_ids = []
+        self.chunks_total = 0
+        self.chunks_indexed = 0
+        self.deferred_posts = 0
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "total_files": self.total_files,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "chunks_total": self.chunks_total,
+            "chunks_indexed": self.chunks_indexed,
+            "deferred_posts": self.deferred_posts,
+            "elapsed_seconds": round(elapsed, 2),
+        }
+
+
+class ImportService:
+    """
+    批量导入 Markdown 文章
+
+    1. 解析 front-matter，在一个事务中写入所有文章
+    2. 已发布文章在进程池中并行分割
+    3. 按 IMPORT_INDEX_GROUP_SIZE 个 chunk 一组，调用 generate_embeddings
+       （按 provider 批大小分批、限制并发）生成向量后写入 chunks 和向量存储
+    某一组向量生成失败时，该组文章转交后台索引队列重试，不影响其他文章
+    """
+
+    # 内存中保留的历史任务数
+    MAX_JOBS = 20
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get_job(self, job_id: str):
+        """获取导入任务，不存在时返回 None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _register(self, job: ImportJob):
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.MAX_JOBS:
+                self._jobs.pop(next(iter(self._jobs)))
+
+    def start(self, files: list, skip_existing: bool = True) -> ImportJob:
+        """在后台线程中执行导入，立即返回任务（供管理接口使用）"""
+        job = ImportJob(len(files))
+        self._register(job)
+        app = current_app._get_current_object()
+
+        def run_in_context():
+            with app.app_context():
+                self.run(files, skip_existing, job=job)
+
+        threading.Thread(
+            target=run_in_context, name=f"import-{job.id}", daemon=True
+        ).start()
+        return job
+
+    def run(self, files: list, skip_existing: bool = True, job=None, progress=None):
+        """
+        在当前线程执行导入
+
+        Args:
+            files: read_sources 返回的 (文件名, 文本) 列表
+            skip_existing: 是否跳过标题已存在的文章
+            job: 已创建的任务（后台执行时传入）
+            progress: 进度回调，每个阶段/分组完成后以 ImportJob 调用
+
+        Returns:
+            ImportJob: 导入结果
+        """
+        if job is None:
+            job = ImportJob(len(files))
+            self._register(job)
+        notify = progress or (lambda _: None)
+
+        try:
+            self._run(files, skip_existing, job, notify)
+            job.status = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.status = "failed"
+            job.errors.append({"name": None, "error": f"导入文章时出错: {str(e)}"})
+        finally:
+            job.stage = "finished"
+            job.finished_at = time.time()
+            notify(job)
+
+        return job
+
+    def _run(self, files, skip_existing, job, notify):
+        config = current_app.config
+        db_path = config["DATABASE_PATH"]
+
+        # 1. 解析文件
+        documents = []
+        existing_titles = get_post_titles(db_path) if skip_existing else set()
+        for name, text in files:
+            try:
+                document = parse_document(name, text)
+            except ValueError as e:
+                job.errors.append({"name": name, "error": str(e)})
+                continue
+            if document["title"] in existing_titles:
+                job.skipped += 1
+                continue
+            existing_titles.add(document["title"])
+            documents.append(document)
+        notify(job)
+
+        # 2. 先渲染 HTML（代码高亮较慢，不能在持有写锁时进行），再在一个事务中写入
+        job.stage = "insert"
+        for document in documents:
+            document["rendered"] = render_markdown(document["content"])
+        with transaction(db_path):
+            for document in documents:
+                document["post_id"] = create_post(
+                    db_path,
+                    document["title"],
+                    document["content"],
+                    document["status"],
+                    document["created_at"],
+                    document["updated_at"],
+                    document["rendered"],
+                )
+        response_cache.invalidate()
+        job.imported = len(documents)
+        job.post_ids = [d["post_id"] for d in documents]
+        notify(job)
+
+        # 3. 并行分割已发布文章
+        job.stage = "split"
+        published = [d for d in documents if d["status"] == "published"]
+        for document, chunks in zip(published, self._split_all(published)):
+            document["chunks"] = chunks
+        job.chunks_total = sum(len(d["chunks"]) for d in published)
+        notify(job)
+
+        # 4. 分组生成向量并写入当前向量集合
+        job.stage = "index"
+        collection = get_active_collection(refresh=True)
+        group_size = config.get("IMPORT_INDEX_GROUP_SIZE", 200)
+        group = []
+        for document in published:
+            group.append(document)
+            if sum(len(d["chunks"]) for d in group) >= group_size:
+                self._index_group(db_path, collection, group, job)
+                notify(job)
+                group = []
+        if group:
+            self._index_group(db_path, collection, group, job)
+            notify(job)
+
+        if published:
+            bump_corpus_version(db_path)
+
+    def _split_all(self, documents: list) -> list:
+        options = split_options(current_app.config)
+        tasks = [(d["content"], d["title"], options) for d in documents]
+        workers = current_app.config.get("IMPORT_SPLIT_WORKERS") or os.cpu_count() or 1
+
+        # 文章较少时进程池启动开销大于收益
+        if workers <= 1 or len(tasks) < current_app.config.get(
+            "IMPORT_PARALLEL_MIN_POSTS", 20
+        ):
+            return [split_markdown_task(task) for task in tasks]
+
+        # 不能使用 fork：当前进程已有索引、访客写入、导入等线程和连接池，
+        # fork 出的子进程可能卡在 fork 时被其他线程持有的锁上。
+        # forkserver / spawn 从新解释器启动，子进程只导入分割函数所在模块
+        # （run.py 在子进程中被重新导入时不会创建应用）
+        start_method = (
+            "forkserver"
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(start_method)
+        ) as executor:
+            return list(
+                executor.map(
+                    split_markdown_task,
+                    tasks,
+                    chunksize=max(1, len(tasks) // (workers * 4)),
+                )
+            )
+
+    def _index_group(self, db_path: str, collection: str, group: list, job: ImportJob):
+        texts = [text for d in group for text in d["chunks"]]
+        settings = get_collection_settings(collection)
+
+        try:
+            # 先生成向量再写库；写入向量存储失败时事务回滚，不留下没有向量的 chunk
+            embeddings = iter(
+                generate_embeddings(texts, settings["model"], settings["dimension"])
+            )
+
+            items = []
+            with transaction(db_path):
+                for d in group:
+                    chunk_ids = insert_chunks(
+                        db_path,
+                        d["post_id"],
+                        list(enumerate(d["chunks"])),
+                        collection,
+                    )
+                    for chunk_id, (idx, text) in zip(chunk_ids, enumerate(d["chunks"])):
+                        items.append(
+                            {
+                                "chunk_id": chunk_id,
+                                "embedding": next(embeddings),
+                                "post_id": d["post_id"],
+                                "title": d["title"],
+                                "chunk_text": text,
+                                "chunk_index": idx,
+                            }
+                        )
+                get_vector_store(collection).add_embeddings(items)
+            job.chunks_indexed += len(texts)
+
+        except Exception as e:
+            traceback.print_exc()
+            job.errors.append(
+                {
+                    "name": None,
+                    "error": f"{len(group)} 篇文章的向量生成失败，已转入后台索引队列: {str(e)}",
+                }
+            )
+            for d in group:
+                index_queue.enqueue(d["post_id"])
+            job.deferred_posts += len(group)
+
+
+# 全局单例
+import_service = ImportService()
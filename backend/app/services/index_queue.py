@@ -0,0 +1,130 @@
+from app.models import (
+    claim_index_job,
+    enqueue_index_job,
+    fail_index_job,
+    finish_index_job,
+    get_post,
+    prune_index_jobs,
+)
+from app.services.embedding_service import update_post_embeddings
+from flask import current_app
+import threading, time, traceback
+
+
+class IndexQueue:
+    """
+    后台索引任务队列
+
+    任务持久化在 SQLite 的 index_jobs 表中，重启后继续执行；
+    同一篇文章的待执行任务会合并，失败后按指数退避重试。
+    由固定数量的后台线程消费，管理后台保存文章时只需入队即可返回。
+    """
+
+    # 历史任务清理间隔（秒）
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self):
+        self.app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._last_prune = 0
+
+    def init_app(self, app):
+        """绑定应用并按 INDEX_WORKER_COUNT 启动后台线程"""
+        self.app = app
+        worker_count = app.config.get("INDEX_WORKER_COUNT", 2)
+
+        if self._threads or worker_count <= 0:
+            return
+
+        for i in range(worker_count):
+            thread = threading.Thread(
+                target=self._worker_loop, name=f"index-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def enqueue(self, post_id: int) -> int:
+        """
+        提交文章索引任务
+
+        未启动后台线程（INDEX_WORKER_COUNT = 0）时在当前线程同步执行
+
+        Returns:
+            int: 任务 ID
+        """
+        db_path = current_app.config["DATABASE_PATH"]
+        job_id = enqueue_index_job(db_path, post_id)
+
+        if self._threads:
+            self._wakeup.set()
+        else:
+            self.run_pending()
+
+        return job_id
+
+    def run_pending(self):
+        """在当前线程执行所有已到期的任务"""
+        while self._run_next():
+            pass
+
+    def stop(self):
+        """通知后台线程退出"""
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        poll_interval = self.app.config.get("INDEX_POLL_INTERVAL", 2)
+
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self._maybe_prune()
+                    ran = self._run_next()
+            except Exception:
+                traceback.print_exc()
+                ran = False
+
+            if not ran:
+                self._wakeup.wait(poll_interval)
+                self._wakeup.clear()
+
+    def _maybe_prune(self):
+        if time.time() - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = time.time()
+        prune_index_jobs(current_app.config["DATABASE_PATH"])
+
+    def _run_next(self) -> bool:
+        """领取并执行一个任务，没有可执行任务时返回 False"""
+        config = current_app.config
+        db_path = config["DATABASE_PATH"]
+
+        job = claim_index_job(db_path, config.get("INDEX_JOB_TIMEOUT", 600))
+        if job is None:
+            return False
+
+        try:
+            post = get_post(db_path, job["post_id"])
+
+            # 文章已删除或转为草稿时无需索引
+            if post is not None and post["status"] == "published":
+                update_post_embeddings(post["id"], post["title"], post["content"])
+
+            finish_index_job(db_path, job["id"])
+
+        except Exception as e:
+            traceback.print_exc()
+            attempts = job["attempts"] + 1
+            retry_at = None
+            if attempts < config.get("INDEX_JOB_MAX_ATTEMPTS", 5):
+                backoff = config.get("INDEX_RETRY_BACKOFF", 10)
+                retry_at = time.time() + backoff * (2 ** (attempts - 1))
+            fail_index_job(db_path, job["id"], str(e), retry_at)
+
+        return True
+
+
+# 全局单例
+index_queue = IndexQueue()
@@ -0,0 +1,240 @@
+from app.models import (
+    bump_corpus_version,
+    claim_periodic_task,
+    delete_chunks,
+    get_chunks_with_titles,
+    get_existing_chunk_ids,
+    get_index_entries,
+    get_unindexed_posts,
+)
+from app.services.embedding_service import generate_embeddings
+from app.services.index_queue import index_queue
+from app.services.rerank_cache import rerank_cache
+from app.services.vector_store import (
+    get_active_collection,
+    get_collection_settings,
+    get_vector_store,
+)
+from flask import current_app
+import threading, time, traceback
+
+
+class IndexReconciler:
+    """
+    chunks 表与向量存储的一致性检查与修复
+
+    一次读取当前集合的全部向量元数据和全部 chunk 行（连同文章状态），
+    按 ID 集合与内容哈希比对，得到：
+    - orphan_chunks：所属文章已不存在的 chunk（外键未生效时删除文章留下）
+    - unpublished_chunks：所属文章已转为草稿的 chunk 及其向量
+    - orphan_vectors：没有对应 chunk 行的向量
+    - missing_vectors：有 chunk 行但没有向量（更新中途失败）
+    - stale_vectors：向量元数据的内容哈希或文章 ID 与 chunk 行不一致
+    - unindexed_posts：没有任何 chunk 的已发布文章
+    修复时按 RECONCILE_BATCH_SIZE 分批删除，缺失/过期的向量分批重新生成，
+    未索引的文章提交到后台索引队列。
+
+    检查与正常写入并发进行：先读向量元数据、后读 chunk 行，两次读取之间新写入的
+    chunk 只会被判为 missing_vectors（多生成一次向量）；orphan_vectors 在删除前
+    还会对照 chunks 表重新确认，正在写入的向量不会被删除。但更新文章时先删后写的
+    窗口内仍可能误判 chunk 与向量，自动修复默认关闭；设置 RECONCILE_INTERVAL 后
+    由后台线程定期修复，多个进程通过 meta 表认领，每个周期只执行一次。
+    """
+
+    # 检查是否到期的间隔（秒）
+    POLL_INTERVAL = 300
+
+    def __init__(self):
+        self.app = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.last_report = None
+
+    def init_app(self, app):
+        """绑定应用，RECONCILE_INTERVAL > 0 时启动定期修复线程"""
+        self.app = app
+
+        if self._thread is not None or app.config.get("RECONCILE_INTERVAL", 0) <= 0:
+            return
+
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._schedule_loop, name="index-reconciler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """通知后台线程退出"""
+        self._stopping.set()
+
+    def check(self, repair: bool = False) -> dict:
+        """
+        检查当前向量集合的一致性
+
+        Args:
+            repair: 是否修复发现的问题
+
+        Returns:
+            dict: 检查报告，各类问题为 chunk ID（或文章 ID）列表
+        """
+        with self._lock:
+            try:
+                report = self._check(repair)
+            except Exception as e:
+                traceback.print_exc()
+                raise Exception(f"检查索引一致性时出错: {str(e)}")
+
+        self.last_report = report
+        return report
+
+    def _check(self, repair: bool) -> dict:
+        config = current_app.config
+        db_path = config["DATABASE_PATH"]
+        started_at = time.time()
+
+        collection = get_active_collection(refresh=True)
+        store = get_vector_store(collection)
+
+        # 先读向量再读 chunk 行：chunk 先于向量写入，反过来读会把两次读取之间
+        # 新写入的 chunk 和向量误判为没有 chunk 行的向量
+        vectors = {}
+        for vector_id, metadata in store.get_all_metadatas().items():
+            chunk_id = metadata.get("chunk_id") if metadata else None
+            if chunk_id is None and vector_id.startswith("chunk_"):
+                chunk_id = vector_id[len("chunk_") :]
+            vectors[int(chunk_id)] = metadata or {}
+        rows = get_index_entries(db_path, collection)
+
+        orphan_chunks = []
+        unpublished_chunks = []
+        missing_vectors = []
+        stale_vectors = []
+        chunk_ids = set()
+
+        for row in rows:
+            chunk_ids.add(row["id"])
+            if row["status"] is None:
+                orphan_chunks.append(row["id"])
+            elif row["status"] != "published":
+                unpublished_chunks.append(row["id"])
+            elif row["id"] not in vectors:
+                missing_vectors.append(row["id"])
+            else:
+                metadata = vectors[row["id"]]
+                if metadata.get("post_id") != row["post_id"] or (
+                    row["content_hash"]
+                    and metadata.get("content_hash") != row["content_hash"]
+                ):
+                    stale_vectors.append(row["id"])
+
+        report = {
+            "collection": collection,
+            "chunks": len(rows),
+            "vectors": len(vectors),
+            "orphan_chunks": orphan_chunks,
+            "unpublished_chunks": unpublished_chunks,
+            "orphan_vectors": sorted(set(vectors) - chunk_ids),
+            "missing_vectors": missing_vectors,
+            "stale_vectors": stale_vectors,
+            "unindexed_posts": get_unindexed_posts(db_path, collection),
+            "repaired": False,
+        }
+
+        if repair:
+            self._repair(db_path, collection, store, report)
+            report["repaired"] = True
+
+        report["elapsed_seconds"] = round(time.time() - started_at, 3)
+        return report
+
+    def _repair(self, db_path, collection, store, report):
+        batch_size = current_app.config.get("RECONCILE_BATCH_SIZE", 500)
+
+        # 1. 删除孤立/草稿文章的 chunk 行及向量，以及没有 chunk 行的向量
+        #    （删除前重新确认，跳过检查之后才写入 chunk 行的）
+        removed_chunks = report["orphan_chunks"] + report["unpublished_chunks"]
+        recreated = get_existing_chunk_ids(
+            db_path, report["orphan_vectors"], collection
+        )
+        removed_vectors = removed_chunks + [
+            chunk_id
+            for chunk_id in report["orphan_vectors"]
+            if chunk_id not in recreated
+        ]
+        for i in range(0, len(removed_chunks), batch_size):
+            delete_chunks(db_path, removed_chunks[i : i + batch_size])
+        for i in range(0, len(removed_vectors), batch_size):
+            store.delete_embeddings(removed_vectors[i : i + batch_size])
+
+        # 2. 为缺失和过期的向量分批重新生成（过期的先删除，Chroma 的 add 不覆盖已有 ID）
+        settings = get_collection_settings(collection)
+        stale = set(report["stale_vectors"])
+        reembed_ids = report["missing_vectors"] + report["stale_vectors"]
+        for i in range(0, len(reembed_ids), batch_size):
+            rows = get_chunks_with_titles(db_path, reembed_ids[i : i + batch_size])
+            embeddings = generate_embeddings(
+                [row["chunk_text"] for row in rows],
+                settings["model"],
+                settings["dimension"],
+            )
+            store.delete_embeddings([row["id"] for row in rows if row["id"] in stale])
+            store.add_embeddings(
+                [
+                    {
+                        "chunk_id": row["id"],
+                        "embedding": embedding,
+                        "post_id": row["post_id"],
+                        "title": row["title"],
+                        "chunk_text": row["chunk_text"],
+                        "chunk_index": row["chunk_index"],
+                        "content_hash": row["content_hash"],
+                    }
+                    for row, embedding in zip(rows, embeddings)
+                ]
+            )
+
+        # 3. 没有任何 chunk 的已发布文章交给后台索引队列
+        for post_id in report["unindexed_posts"]:
+            index_queue.enqueue(post_id)
+
+        if removed_vectors or reembed_ids:
+            rerank_cache.invalidate_chunks(removed_vectors + report["stale_vectors"])
+            bump_corpus_version(db_path)
+
+    def _schedule_loop(self):
+        interval = self.app.config.get("RECONCILE_INTERVAL", 0)
+
+        while not self._stopping.wait(min(self.POLL_INTERVAL, interval)):
+            try:
+                with self.app.app_context():
+                    db_path = self.app.config["DATABASE_PATH"]
+                    if not claim_periodic_task(db_path, "reconcile_index", interval):
+                        continue
+                    report = self.check(repair=True)
+                    print(f"索引一致性检查完成：{summarize_report(report)}")
+            except Exception:
+                traceback.print_exc()
+
+
+def summarize_report(report: dict) -> str:
+    """检查报告的单行摘要"""
+    counts = ", ".join(
+        f"{key} {len(report[key])}"
+        for key in (
+            "orphan_chunks",
+            "unpublished_chunks",
+            "orphan_vectors",
+            "missing_vectors",
+            "stale_vectors",
+            "unindexed_posts",
+        )
+    )
+    return (
+        f"集合 {report['collection']}：chunks {report['chunks']}，"
+        f"向量 {report['vectors']}；{counts}"
+    )
+
+
+# 全局单例
+index_reconciler = IndexReconciler()
@@ -0,0 +1,443 @@
+from app.services.vector_store import VectorStore
+from contextlib import contextmanager
+from flask import current_app
+import numpy as np
+import base64, json, os, re, threading, time, uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只做进程内加锁
+    fcntl = None
+
+
+# 集合目录下属于某个集合的文件（drop_collection 与旧版本清理共用）
+FILE_PATTERN = r"\.(json|json\.tmp|lock|[0-9a-f]{32}\.(f32|log))"
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    基于 NumPy 的进程内向量存储
+
+    适合数千条量级的小语料：所有向量归一化后存成 float32 矩阵，基线矩阵以
+    内存映射方式加载（多个 worker 共享页缓存），检索时矩阵乘法得到全部余弦
+    相似度，支持按元数据（如 post_id）过滤。
+
+    目录 NUMPY_STORE_PATH 下每个集合包含：
+    - {collection}.json：当前版本的基线元数据（ID、元数据列表、矩阵与日志文件名）
+    - {collection}.{version}.f32：基线向量矩阵
+    - {collection}.{version}.log：基线之后的追加日志（每行一次写入：
+      添加向量、删除向量或更新元数据）
+    写入只向日志追加一行，读者按上次读到的位置增量回放，写入代价与本次
+    变更量成正比；日志累计的变更行数超过基线的 NUMPY_STORE_COMPACT_RATIO
+    （且不少于 NUMPY_STORE_COMPACT_MIN_ROWS）时合并为新版本基线，
+    总写入量随语料规模线性增长。
+    新版本基线写好后原子替换 json，读者不会看到半写状态；被替换的旧版本
+    文件保留 NUMPY_STORE_GRACE_PERIOD 秒（其他进程可能刚读完旧 json、
+    尚未映射矩阵），之后在下次合并或启动时清理。
+    """
+
+    def __init__(self, collection_name: str = None):
+        self.directory = None
+        self.collection_name = collection_name
+        self._lock = threading.RLock()
+        self._loaded_stamp = None
+        self._reset()
+
+    def _reset(self):
+        self.dimension = None
+        self._vectors_file = None
+        self._log_file = None
+        self._log_offset = 0
+        self._log_rows = 0
+        self._base = np.zeros((0, 0), dtype=np.float32)
+        self._extra = np.zeros((0, 0), dtype=np.float32)
+        self._ids = []
+        self._metadatas = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._post_ids = np.zeros(0, dtype=np.int64)
+        self._positions = {}
+
+    def init_store(self):
+        """按应用配置初始化存储目录，并清理过期的旧版本文件"""
+        config = current_app.config
+        self.directory = config.get("NUMPY_STORE_PATH", "./vector_data")
+        if self.collection_name is None:
+            self.collection_name = config.get("CHROMADB_COLLECTION", "blog_chunks")
+        self.compact_ratio = config.get("NUMPY_STORE_COMPACT_RATIO", 0.5)
+        self.compact_min_rows = config.get("NUMPY_STORE_COMPACT_MIN_ROWS", 1024)
+        self.grace_period = config.get("NUMPY_STORE_GRACE_PERIOD", 600)
+        os.makedirs(self.directory, exist_ok=True)
+        self._refresh()
+        self._sweep()
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, f"{self.collection_name}.json")
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _refresh(self):
+        """json 有更新时重新加载，日志有新内容时增量回放（其他进程写入后生效）"""
+        # json 每次通过 os.replace 整体替换，inode 变化即可识别新版本
+        try:
+            stat = os.stat(self._meta_path)
+            stamp = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+
+        with self._lock:
+            if stamp != self._loaded_stamp:
+                self._load_base(stamp)
+            if self._log_file:
+                self._replay_log()
+
+    def _load_base(self, stamp):
+        self._reset()
+        if stamp is not None:
+            with open(self._meta_path, encoding="utf-8") as f:
+                state = json.load(f)
+
+            self.dimension = state["dimension"]
+            self._vectors_file = state["vectors_file"]
+            self._log_file = state.get("log_file")
+            self._ids = state["ids"]
+            self._metadatas = state["metadatas"]
+
+            if self._ids:
+                self._base = np.memmap(
+                    self._path(self._vectors_file),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(len(self._ids), self.dimension),
+                )
+            self._alive = np.ones(len(self._ids), dtype=bool)
+            self._post_ids = np.array(
+                [m["post_id"] for m in self._metadatas], dtype=np.int64
+            )
+            self._positions = {doc_id: i for i, doc_id in enumerate(self._ids)}
+
+        self._loaded_stamp = stamp
+
+    def _replay_log(self):
+        """回放日志中上次读到的位置之后的完整行（写入中的半行留待下次）"""
+        try:
+            with open(self._path(self._log_file), "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return
+
+        # 在副本上回放后整体替换，检索线程持有的旧引用保持一致
+        ids, metadatas = list(self._ids), list(self._metadatas)
+        positions = dict(self._positions)
+        alive, post_ids = [self._alive], [self._post_ids]
+        extra = [self._extra] if len(self._extra) else []
+        dead = []
+
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            op = record["op"]
+            self._log_rows += len(record["ids"])
+
+            if op == "add":
+                dimension = record["dimension"]
+                if self.dimension is None:
+                    self.dimension = dimension
+                vectors = np.frombuffer(
+                    base64.b64decode(record["vectors"]), dtype=np.float32
+                ).reshape(len(record["ids"]), dimension)
+                for doc_id, metadata in zip(record["ids"], record["metadatas"]):
+                    previous = positions.get(doc_id)
+                    if previous is not None:
+                        dead.append(previous)
+                    positions[doc_id] = len(ids)
+                    ids.append(doc_id)
+                    metadatas.append(metadata)
+                extra.append(vectors)
+                alive.append(np.ones(len(record["ids"]), dtype=bool))
+                post_ids.append(
+                    np.array([m["post_id"] for m in record["metadatas"]], np.int64)
+                )
+            elif op == "delete":
+                for doc_id in record["ids"]:
+                    position = positions.pop(doc_id, None)
+                    if position is not None:
+                        dead.append(position)
+            elif op == "update":
+                for doc_id, metadata in zip(record["ids"], record["metadatas"]):
+                    position = positions.get(doc_id)
+                    if position is not None:
+                        metadatas[position] = metadata
+
+        alive = np.concatenate(alive)
+        alive[dead] = False
+        self._ids, self._metadatas, self._positions = ids, metadatas, positions
+        self._alive = alive
+        self._post_ids = np.concatenate(post_ids)
+        if extra:
+            self._extra = np.vstack(extra)
+        self._log_offset += end
+
+    def _ensure_ready(self):
+        if self.directory is None:
+            self.init_store()
+        else:
+            self._refresh()
+
+    @contextmanager
+    def _write_lock(self):
+        """进程内 + 跨进程写锁，写入前重新加载最新状态"""
+        if self.directory is None:
+            self.init_store()
+
+        with self._lock:
+            lock_path = self._path(f"{self.collection_name}.lock")
+            with open(lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, record: dict):
+        """向日志追加一行并回放，变更累计较多时合并为新版本基线（需持有写锁）"""
+        if self._log_file is None:
+            # 新集合：先写入空基线，确定日志文件
+            self._compact()
+
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with open(self._path(self._log_file), "ab") as f:
+            f.write(line)
+        self._refresh()
+
+        if self._log_rows >= max(
+            self.compact_min_rows, len(self._base) * self.compact_ratio
+        ):
+            self._compact()
+
+    def _snapshot(self):
+        """当前有效的 (矩阵, ID 列表, 元数据列表)"""
+        keep = np.flatnonzero(self._alive)
+        parts = [np.asarray(m) for m in (self._base, self._extra) if len(m)]
+        matrix = np.vstack(parts)[keep] if parts else np.zeros((0, 0), np.float32)
+        return (
+            matrix,
+            [self._ids[i] for i in keep],
+            [self._metadatas[i] for i in keep],
+        )
+
+    def _compact(self):
+        """合并基线与日志，写入新版本并原子替换元数据（需持有写锁）"""
+        matrix, ids, metadatas = self._snapshot()
+        obsolete = [f for f in (self._vectors_file, self._log_file) if f]
+
+        version = uuid.uuid4().hex
+        vectors_file = f"{self.collection_name}.{version}.f32"
+        log_file = f"{self.collection_name}.{version}.log"
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(self._path(vectors_file))
+        open(self._path(log_file), "wb").close()
+
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dimension": self.dimension,
+                    "vectors_file": vectors_file,
+                    "log_file": log_file,
+                    "ids": ids,
+                    "metadatas": metadatas,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self._meta_path)
+
+        # 旧版本文件的修改时间记为被替换的时间，宽限期过后才删除
+        for filename in obsolete:
+            try:
+                os.utime(self._path(filename))
+            except OSError:
+                pass
+
+        self._loaded_stamp = None
+        self._refresh()
+        self._sweep()
+
+    def _sweep(self):
+        """删除当前版本以外、超过宽限期的矩阵与日志文件"""
+        current = {self._vectors_file, self._log_file}
+        pattern = re.compile(
+            re.escape(self.collection_name) + r"\.[0-9a-f]{32}\.(f32|log)"
+        )
+        deadline = time.time() - self.grace_period
+        for filename in os.listdir(self.directory):
+            if filename in current or not pattern.fullmatch(filename):
+                continue
+            try:
+                if os.path.getmtime(self._path(filename)) < deadline:
+                    os.remove(self._path(filename))
+            except OSError:
+                # 已被其他进程删除，或 Windows 下仍被映射，下次再试
+                pass
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def add_embeddings(self, items: list):
+        """
+        批量添加向量，ID 已存在时覆盖
+        """
+        if not items:
+            return
+
+        vectors = self._normalize([item["embedding"] for item in items])
+        with self._write_lock():
+            self._append(
+                {
+                    "op": "add",
+                    "ids": [f"chunk_{item['chunk_id']}" for item in items],
+                    "metadatas": [self.build_metadata(item) for item in items],
+                    "dimension": vectors.shape[1],
+                    "vectors": base64.b64encode(
+                        np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+                    ).decode("ascii"),
+                }
+            )
+
+    def update_metadatas(self, items: list):
+        """
+        批量更新已有向量的元数据（不改动向量本身）
+        """
+        if not items:
+            return
+
+        with self._write_lock():
+            ids, metadatas = [], []
+            for item in items:
+                doc_id = f"chunk_{item['chunk_id']}"
+                if doc_id in self._positions:
+                    ids.append(doc_id)
+                    metadatas.append(self.build_metadata(item))
+            if ids:
+                self._append({"op": "update", "ids": ids, "metadatas": metadatas})
+
+    def _delete_ids(self, ids: list):
+        if ids:
+            self._append({"op": "delete", "ids": ids})
+
+    def delete_embeddings(self, chunk_ids: list):
+        """
+        按 chunk ID 批量删除向量
+        """
+        if not chunk_ids:
+            return
+
+        with self._write_lock():
+            self._delete_ids(
+                [
+                    f"chunk_{chunk_id}"
+                    for chunk_id in chunk_ids
+                    if f"chunk_{chunk_id}" in self._positions
+                ]
+            )
+
+    def delete_post_embeddings(self, post_id: int):
+        """
+        删除文章的所有向量
+        """
+        with self._write_lock():
+            positions = np.flatnonzero((self._post_ids == post_id) & self._alive)
+            self._delete_ids([self._ids[i] for i in positions])
+
+    def get_all_metadatas(self) -> dict:
+        """
+        返回全部向量的元数据
+        """
+        self._ensure_ready()
+
+        with self._lock:
+            return {
+                doc_id: self._metadatas[position]
+                for doc_id, position in self._positions.items()
+            }
+
+    def drop_collection(self):
+        """
+        删除集合的元数据、矩阵与日志文件（含尚未清理的旧版本）和锁文件
+        """
+        with self._write_lock():
+            pattern = re.compile(re.escape(self.collection_name) + FILE_PATTERN)
+            for filename in os.listdir(self.directory):
+                if pattern.fullmatch(filename):
+                    try:
+                        os.remove(os.path.join(self.directory, filename))
+                    except OSError:
+                        pass
+
+            self._reset()
+            self._loaded_stamp = None
+
+    def search(self, embedding: list, top_k: int = 10, where: dict = None):
+        """
+        一次矩阵乘法计算全部余弦相似度，取 top-K
+        """
+        self._ensure_ready()
+
+        with self._lock:
+            base, extra = self._base, self._extra
+            ids, metadatas = self._ids, self._metadatas
+            alive, post_ids = self._alive, self._post_ids
+
+        if top_k <= 0 or not alive.any():
+            return []
+
+        mask = alive.copy()
+        if where:
+            for key, value in where.items():
+                if key == "post_id":
+                    mask &= post_ids == value
+                else:
+                    mask &= np.array([m.get(key) == value for m in metadatas])
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+
+        # 基线与日志部分分别计算后拼接，位置与 ids 一一对应
+        query = self._normalize(embedding)
+        scores = np.concatenate([m @ query for m in (base, extra) if len(m)])
+        scores = scores[candidates]
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            position = int(candidates[i])
+            metadata = metadatas[position]
+            results.append(
+                {
+                    "id": ids[position],
+                    "distance": float(1.0 - scores[i]),
+                    "metadata": metadata,
+                    "document": metadata.get("chunk_text"),
+                }
+            )
+
+        return results
+
+
+# 全局单例
+numpy_store = NumpyVectorStore()
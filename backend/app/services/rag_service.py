@@ -1,14 +1,28 @@
-from app.services.embedding_service import generate_embedding
-from app.services.chroma_service import chroma_service
+from app.services.embedding_service import generate_query_embedding
+from app.services.vector_store import vector_store
+from app.services.answer_cache import answer_cache
+from app.services.rerank_cache import rerank_cache
+from app.services.http_client import http_client, dashscope_headers
+from app.models import get_corpus_version, search_chunks_fts
+from app.utils.metrics import (
+    RAG_QUERIES,
+    RETRIEVAL_TOP_K,
+    RERANK_DECISIONS,
+    RERANK_DOCUMENTS,
+    RERANK_FALLBACKS,
+    UPSTREAM_ERRORS,
+    span,
+)
 from flask import current_app
-import dashscope, requests, traceback
+import json, traceback
 
 
 def rerank_results(query: str, candidates: list) -> list:
     """
     调用 Qwen3-Rerank API 对检索结果重排序
 
-    使用 HTTP 请求调用（参考官方 curl 示例）
+    通过共享连接池发送 HTTP 请求（参考官方 curl 示例）；
+    相同查询和候选集合的结果会被缓存
 
     Args:
         query: 用户查询
@@ -20,9 +34,13 @@ def rerank_results(query: str, candidates: list) -> list:
     try:
         api_key = current_app.config["DASHSCOPE_API_KEY"]
         model = current_app.config["RERANK_MODEL"]
-        url = current_app.config.get(
-            "RERANK_API_URL", "https://dashscope.aliyuncs.com/compatible-api/v1/reranks"
-        )
+        url = current_app.config["RERANK_API_URL"]
+
+        # 查询 Rerank 缓存
+        cache_key = rerank_cache.make_key(query, candidates, model)
+        scores = rerank_cache.get(cache_key)
+        if scores is not None:
+            return _apply_rerank_scores(candidates, scores)
 
         # 构造候选文档列表
         documents = [
@@ -30,6 +48,8 @@ def rerank_results(query: str, candidates: list) -> list:
             for c in candidates
         ]
 
+        RERANK_DOCUMENTS.observe(len(documents))
+
         # 调用 Rerank API（参考官方 curl 示例）
         headers = {
             "Authorization": f"Bearer {api_key}",
@@ -42,67 +62,77 @@ def rerank_results(query: str, candidates: list) -> list:
             "top_n": len(documents),
         }
 
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        # Rerank 不改变服务端状态，可安全重试
+        with span("dashscope", "rerank"):
+            response = http_client.request(
+                "POST", url, headers=headers, json=data, idempotent=True
+            )
 
         if response.status_code == 200:
             result = response.json()
 
             # 解析重排序结果
             if "results" in result:
-                reranked_results = result["results"]
-                new_candidates = []
-
-                for item in reranked_results:
-                    index = item["index"]
-                    relevance_score = item.get("relevance_score", 0)
-
-                    if index < len(candidates):
-                        candidate = candidates[index].copy()
-                        candidate["relevance_score"] = relevance_score
-                        new_candidates.append(candidate)
-
-                return new_candidates
+                scores = [
+                    (item["index"], item.get("relevance_score", 0))
+                    for item in result["results"]
+                ]
+                rerank_cache.set(cache_key, scores)
+                return _apply_rerank_scores(candidates, scores)
             else:
                 print(f"Rerank 响应格式异常: {result}")
+                RERANK_FALLBACKS.inc(reason="bad_response")
                 return candidates
         else:
             print(f"Rerank API 调用失败: {response.status_code} - {response.text}")
+            UPSTREAM_ERRORS.inc(service="rerank")
+            RERANK_FALLBACKS.inc(reason="http_error")
             return candidates
 
     except Exception as e:
         print(f"Rerank 过程出错: {str(e)}")
         traceback.print_exc()
+        UPSTREAM_ERRORS.inc(service="rerank")
+        RERANK_FALLBACKS.inc(reason="exception")
         return candidates
 
 
-def generate_answer(question: str, context_chunks: list) -> str:
-    """
-    调用 Qwen Plus 生成最终回答
+def _apply_rerank_scores(candidates: list, scores: list) -> list:
+    """按 Rerank 返回的 (index, relevance_score) 顺序重排候选文档"""
+    new_candidates = []
+
+    for index, relevance_score in scores:
+        if index < len(candidates):
+            candidate = candidates[index].copy()
+            candidate["relevance_score"] = relevance_score
+            new_candidates.append(candidate)
+
+    return new_candidates
 
-    参考官方示例：使用 dashscope.Generation.call()
+
+def build_messages(question: str, context_chunks: list) -> list:
+    """
+    构造发送给 LLM 的对话消息
 
     Args:
         question: 用户问题
         context_chunks: 相关文档块列表
 
     Returns:
-        str: AI 生成的回答
+        list: messages 列表
     """
-    try:
-        # 构造上下文
-        context = ""
-        for i, chunk in enumerate(context_chunks):
-            metadata = chunk.get("metadata", {})
-            title = metadata.get("title", "未知标题")
-            chunk_text = chunk.get("document", metadata.get("chunk_text", ""))
-            post_id = metadata.get("post_id", 0)
-
-            context += (
-                f"\n[文档 {i+1}] (文章ID: {post_id}, 标题: {title})\n{chunk_text}\n"
-            )
+    # 构造上下文
+    context = ""
+    for i, chunk in enumerate(context_chunks):
+        metadata = chunk.get("metadata", {})
+        title = metadata.get("title", "未知标题")
+        chunk_text = chunk.get("document", metadata.get("chunk_text", ""))
+        post_id = metadata.get("post_id", 0)
+
+        context += f"\n[文档 {i+1}] (文章ID: {post_id}, 标题: {title})\n{chunk_text}\n"
 
-        # 构造消息
-        system_prompt = """你是一个个人博客问答助手。请严格基于作者已发布的博客内容回答问题。
+    # 构造消息
+    system_prompt = """你是一个个人博客问答助手。请严格基于作者已发布的博客内容回答问题。
 
 回答要求：
 1. 仅使用提供的博客内容作为依据
@@ -112,7 +142,7 @@ def generate_answer(question: str, context_chunks: list) -> str:
 5. 回答中不要出现文章id，只允许出现文章名字
 6. 回答中不要出现链接"""
 
-        user_message = f"""基于以下博客内容，回答用户的问题：
+    user_message = f"""基于以下博客内容，回答用户的问题：
 
 博客内容：
 {context}
@@ -121,37 +151,316 @@ def generate_answer(question: str, context_chunks: list) -> str:
 
 请给出你的回答："""
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message},
-        ]
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message},
+    ]
 
-        # 调用 Qwen Plus（参考官方示例）
-        response = dashscope.Generation.call(
-            api_key=current_app.config["DASHSCOPE_API_KEY"],
-            model=current_app.config["LLM_MODEL"],
-            messages=messages,
-            result_format="message",
-        )
 
-        if response.status_code == 200:
-            return response["output"]["choices"][0]["message"]["content"]
-        else:
-            raise Exception(f"LLM API 调用失败: {response.message}")
+def _generation_url() -> str:
+    """DashScope 文本生成接口地址"""
+    base_url = current_app.config["DASHSCOPE_BASE_URL"]
+    return f"{base_url}/services/aigc/text-generation/generation"
+
+
+def _generation_payload(question: str, context_chunks: list, stream: bool) -> dict:
+    """构造文本生成请求体"""
+    return {
+        "model": current_app.config["LLM_MODEL"],
+        "input": {"messages": build_messages(question, context_chunks)},
+        "parameters": {"result_format": "message", "incremental_output": stream},
+    }
+
+
+def generate_answer(question: str, context_chunks: list) -> str:
+    """
+    调用 Qwen Plus 生成最终回答
+
+    通过共享连接池调用 DashScope 文本生成 HTTP 接口
+
+    Args:
+        question: 用户问题
+        context_chunks: 相关文档块列表
+
+    Returns:
+        str: AI 生成的回答
+    """
+    try:
+        try:
+            # 生成请求按次计费，不做超时重试
+            with span("dashscope", "generation"):
+                response = http_client.post_json(
+                    _generation_url(),
+                    _generation_payload(question, context_chunks, stream=False),
+                    headers=dashscope_headers(),
+                    read_timeout=current_app.config.get("LLM_READ_TIMEOUT", 120),
+                )
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="generation")
+            raise Exception(f"LLM API 调用失败: {str(e)}")
+
+        return response["output"]["choices"][0]["message"]["content"]
+
+    except Exception as e:
+        traceback.print_exc()
+        raise Exception(f"生成回答时出错: {str(e)}")
+
+
+def generate_answer_stream(question: str, context_chunks: list):
+    """
+    以流式方式调用 Qwen Plus，逐段产出回答
+
+    Args:
+        question: 用户问题
+        context_chunks: 相关文档块列表
+
+    Yields:
+        str: 增量回答片段
+    """
+    try:
+        # 与非流式一样计入 dashscope/generation，耗时包含调用方消费片段的时间
+        with span("dashscope", "generation"):
+            events = http_client.stream_sse(
+                _generation_url(),
+                _generation_payload(question, context_chunks, stream=True),
+                headers={**dashscope_headers(), "X-DashScope-SSE": "enable"},
+                read_timeout=current_app.config.get("LLM_READ_TIMEOUT", 120),
+            )
+
+            for event in events:
+                if "output" not in event:
+                    raise Exception(f"LLM API 调用失败: {event.get('message', event)}")
+
+                content = event["output"]["choices"][0]["message"]["content"]
+                if content:
+                    yield content
 
     except Exception as e:
+        UPSTREAM_ERRORS.inc(service="generation")
         traceback.print_exc()
         raise Exception(f"生成回答时出错: {str(e)}")
 
 
+def search_chunks(question: str, query_embedding: list) -> list:
+    """
+    检索 top-K 候选文档块
+
+    K 由 choose_top_k 按向量距离分布选取；向量检索结果与 FTS5 全文检索结果
+    按倒数排名融合（RRF），弥补向量检索对库名、错误码、配置项等精确标识符
+    召回不足的问题
+    """
+    config = current_app.config
+    with span("rag", "vector_search"):
+        vector_results = vector_store.search(
+            query_embedding, top_k=config.get("RAG_TOP_K", 10)
+        )
+    top_k = choose_top_k(question, vector_results)
+    vector_results = vector_results[:top_k]
+
+    if not config.get("RAG_HYBRID_ENABLED", True):
+        return vector_results
+
+    try:
+        with span("rag", "lexical_search"):
+            lexical_rows = search_chunks_fts(
+                config["DATABASE_PATH"],
+                question,
+                limit=config.get("RAG_LEXICAL_TOP_K", 10),
+            )
+    except Exception as e:
+        print(f"全文检索出错: {str(e)}")
+        traceback.print_exc()
+        return vector_results
+
+    lexical_results = [
+        {
+            "id": f"chunk_{row['id']}",
+            "distance": None,
+            "metadata": {
+                "chunk_id": row["id"],
+                "post_id": row["post_id"],
+                "title": row["title"],
+                "chunk_text": row["chunk_text"],
+                "chunk_index": row["chunk_index"],
+                "content_hash": row["content_hash"],
+            },
+            "document": row["chunk_text"],
+        }
+        for row in lexical_rows
+    ]
+
+    return fuse_results(
+        [vector_results, lexical_results], k=config.get("RAG_RRF_K", 60), limit=top_k
+    )
+
+
+def fuse_results(result_lists: list, k: int = 60, limit: int = 10) -> list:
+    """
+    倒数排名融合（Reciprocal Rank Fusion）
+
+    每个结果的得分为其在各列表中 1 / (k + 排名) 之和
+
+    Args:
+        result_lists: 多路检索结果，每路按相关度降序
+        k: 平滑常数
+        limit: 返回结果数
+
+    Returns:
+        list: 融合后的结果（附带 rrf_score），按得分降序
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            entry = fused.get(result["id"])
+            if entry is None:
+                entry = fused[result["id"]] = {**result, "rrf_score": 0.0}
+            elif entry.get("distance") is None and result.get("distance") is not None:
+                entry["distance"] = result["distance"]
+            entry["rrf_score"] += 1.0 / (k + rank)
+
+    return sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)[:limit]
+
+
+def log_decision(question: str, stage: str, **details):
+    """输出一条检索决策（RAG_DECISION_LOG 开启时），便于离线统计后调整阈值"""
+    if current_app.config.get("RAG_DECISION_LOG", True):
+        record = {"stage": stage, "question": question[:50], **details}
+        print(f"RAG 检索决策: {json.dumps(record, ensure_ascii=False)}")
+
+
+def choose_top_k(question: str, vector_results: list) -> int:
+    """
+    按距离分布选取 K
+
+    只保留与最近结果的余弦距离差不超过 RAG_ADAPTIVE_MAX_SPREAD 的结果，
+    至少保留 RAG_MIN_TOP_K 条；最近结果明显更近时候选更少，
+    Rerank 与生成的输入也随之变小
+
+    Args:
+        question: 用户问题（仅用于日志）
+        vector_results: 按距离升序的向量检索结果
+
+    Returns:
+        int: 保留的结果数
+    """
+    config = current_app.config
+    if not vector_results or not config.get("RAG_ADAPTIVE_TOP_K", True):
+        return len(vector_results)
+
+    best = vector_results[0]["distance"]
+    spread = config.get("RAG_ADAPTIVE_MAX_SPREAD", 0.15)
+    within = sum(1 for r in vector_results if r["distance"] - best <= spread)
+    top_k = min(len(vector_results), max(within, config.get("RAG_MIN_TOP_K", 3)))
+
+    RETRIEVAL_TOP_K.observe(top_k)
+    log_decision(
+        question,
+        "top_k",
+        retrieved=len(vector_results),
+        top_k=top_k,
+        best_distance=round(best, 4),
+        cutoff_distance=round(vector_results[top_k - 1]["distance"], 4),
+    )
+    return top_k
+
+
+def _group_by_post(candidates: list) -> dict:
+    """按文章分组候选文档块，保持各组及组内的原有顺序"""
+    groups = {}
+    for candidate in candidates:
+        post_id = candidate.get("metadata", {}).get("post_id")
+        groups.setdefault(post_id, []).append(candidate)
+    return groups
+
+
+def _post_margin(groups: dict):
+    """最相关与次相关文章的最小向量距离之差，不足两篇带距离的文章时返回 None"""
+    distances = sorted(
+        min(c["distance"] for c in chunks if c.get("distance") is not None)
+        for chunks in groups.values()
+        if any(c.get("distance") is not None for c in chunks)
+    )
+    if len(distances) < 2:
+        return None
+    return distances[1] - distances[0]
+
+
+def _rerank_by_post(question: str, groups: dict) -> list:
+    """
+    只对每篇文章排名最高的 chunk 做 Rerank，按文章得分展开该文章的全部候选
+
+    同一篇文章的多个相邻 chunk 不再重复发送，Rerank 请求体随文章数而非 chunk 数增长
+    """
+    representatives = [chunks[0] for chunks in groups.values()]
+    reranked = rerank_results(question, representatives)
+
+    results = []
+    for representative in reranked:
+        post_id = representative.get("metadata", {}).get("post_id")
+        score = representative.get("relevance_score")
+        for chunk in groups[post_id]:
+            if score is not None:
+                chunk = {**chunk, "relevance_score": score}
+            results.append(chunk)
+    return results
+
+
+def select_top_chunks(question: str, search_results: list) -> list:
+    """
+    对候选文档块重排序，返回 top-N
+
+    以下情况直接按检索顺序取 top-N，不调用 Rerank：
+    - 候选数不超过 N（Rerank 不会改变入选的 chunk）
+    - 候选全部来自同一篇文章
+    - 最相关文章与次相关文章的向量距离差不小于 RAG_RERANK_SKIP_MARGIN
+    """
+    config = current_app.config
+    top_n = config.get("RAG_TOP_N_AFTER_RERANK", 5)
+    skip_margin = config.get("RAG_RERANK_SKIP_MARGIN")
+    groups = _group_by_post(search_results)
+    margin = _post_margin(groups)
+
+    if len(search_results) <= top_n:
+        reason = "few_candidates"
+    elif len(groups) == 1:
+        reason = "single_post"
+    elif skip_margin is not None and margin is not None and margin >= skip_margin:
+        reason = "margin"
+    else:
+        reason = None
+
+    distinct_posts = config.get("RAG_RERANK_DISTINCT_POSTS", True)
+    decision = "skip" if reason else "rerank"
+    if not reason:
+        reason = "distinct_posts" if distinct_posts else "all_chunks"
+    RERANK_DECISIONS.inc(decision=decision, reason=reason)
+    log_decision(
+        question,
+        "rerank",
+        decision=decision,
+        reason=reason,
+        candidates=len(search_results),
+        posts=len(groups),
+        margin=round(margin, 4) if margin is not None else None,
+    )
+
+    if decision == "skip":
+        return search_results[:top_n]
+    if distinct_posts:
+        return _rerank_by_post(question, groups)[:top_n]
+    return rerank_results(question, search_results)[:top_n]
+
+
 def rag_query(question: str) -> str:
     """
     完整的 RAG 问答流程
 
-    1. 对问题生成向量
-    2. 在 ChromaDB 中检索 top-10
-    3. 使用 Rerank 重排序，取 top-5
-    4. 调用 LLM 生成回答
+    1. 对问题生成向量（命中缓存时跳过 API 调用）
+    2. 查询语义回答缓存，命中则直接返回
+    3. 向量检索（按距离分布自适应选取 K），与全文检索结果做 RRF 融合
+    4. 使用 Rerank 重排序（检索结果足够明确时跳过），取 top-5
+    5. 调用 LLM 生成回答并写入回答缓存
+    各阶段耗时计入 stage_duration_seconds{pipeline="rag"}
 
     Args:
         question: 用户问题
@@ -159,26 +468,118 @@ def rag_query(question: str) -> str:
     Returns:
         str: AI 生成的回答
     """
+    with span("rag", "total"):
+        return _rag_query(question)
+
+
+def _rag_query(question: str) -> str:
     try:
         # 1. 生成问题向量
-        query_embedding = generate_embedding(question)
+        with span("rag", "query_embedding"):
+            query_embedding = generate_query_embedding(question)
+
+        # 2. 语义回答缓存
+        with span("rag", "answer_cache"):
+            corpus_version = get_corpus_version(current_app.config["DATABASE_PATH"])
+            cached = answer_cache.get(query_embedding, corpus_version)
+        if cached is not None:
+            RAG_QUERIES.inc(mode="sync", outcome="cached")
+            return cached["answer"]
 
-        # 2. ChromaDB 检索
-        top_k = current_app.config.get("RAG_TOP_K", 10)
-        search_results = chroma_service.search(query_embedding, top_k=top_k)
+        # 3. 向量检索 + 全文检索
+        with span("rag", "retrieval"):
+            search_results = search_chunks(question, query_embedding)
 
         if not search_results:
+            RAG_QUERIES.inc(mode="sync", outcome="empty")
             return "博客中未提及相关内容"
 
-        # 3. Rerank 重排序
-        top_n = current_app.config.get("RAG_TOP_N_AFTER_RERANK", 5)
-        reranked_results = rerank_results(question, search_results)
-        top_chunks = reranked_results[:top_n]
+        # 4. Rerank 重排序
+        with span("rag", "rerank"):
+            top_chunks = select_top_chunks(question, search_results)
 
-        # 4. 生成回答
-        answer = generate_answer(question, top_chunks)
+        # 5. 生成回答
+        with span("rag", "generation"):
+            answer = generate_answer(question, top_chunks)
+        answer_cache.set(question, query_embedding, answer, corpus_version)
+        RAG_QUERIES.inc(mode="sync", outcome="answered")
         return answer
 
     except Exception as e:
         traceback.print_exc()
+        RAG_QUERIES.inc(mode="sync", outcome="error")
         return f"抱歉，问答服务暂时不可用，请稍后再试。错误信息：{str(e)}"
+
+
+def rag_query_stream(question: str):
+    """
+    流式 RAG 问答流程，按阶段产出事件
+
+    事件依次为：
+    - retrieval: 向量检索完成，{"count": 候选数}
+    - rerank: 重排序完成，{"sources": 来源文章标题}
+    - token: 回答片段，{"text": 片段}
+    - done: 回答结束，{"cached": 是否命中回答缓存}
+    - error: 出错，{"message": 错误信息}
+    各阶段耗时与 rag_query 一样计入指标，流式生成阶段包含向客户端发送的时间
+
+    Args:
+        question: 用户问题
+
+    Yields:
+        tuple: (事件名, 事件数据)
+    """
+    with span("rag", "total"):
+        yield from _rag_query_stream(question)
+
+
+def _rag_query_stream(question: str):
+    try:
+        with span("rag", "query_embedding"):
+            query_embedding = generate_query_embedding(question)
+
+        with span("rag", "answer_cache"):
+            corpus_version = get_corpus_version(current_app.config["DATABASE_PATH"])
+            cached = answer_cache.get(query_embedding, corpus_version)
+        if cached is not None:
+            RAG_QUERIES.inc(mode="stream", outcome="cached")
+            yield "token", {"text": cached["answer"]}
+            yield "done", {"cached": True}
+            return
+
+        with span("rag", "retrieval"):
+            search_results = search_chunks(question, query_embedding)
+        yield "retrieval", {"count": len(search_results)}
+
+        if not search_results:
+            RAG_QUERIES.inc(mode="stream", outcome="empty")
+            yield "token", {"text": "博客中未提及相关内容"}
+            yield "done", {"cached": False}
+            return
+
+        with span("rag", "rerank"):
+            top_chunks = select_top_chunks(question, search_results)
+
+        sources = []
+        for chunk in top_chunks:
+            title = chunk.get("metadata", {}).get("title")
+            if title and title not in sources:
+                sources.append(title)
+        yield "rerank", {"sources": sources}
+
+        parts = []
+        with span("rag", "generation_stream"):
+            for text in generate_answer_stream(question, top_chunks):
+                parts.append(text)
+                yield "token", {"text": text}
+
+        answer_cache.set(question, query_embedding, "".join(parts), corpus_version)
+        RAG_QUERIES.inc(mode="stream", outcome="answered")
+        yield "done", {"cached": False}
+
+    except Exception as e:
+        traceback.print_exc()
+        RAG_QUERIES.inc(mode="stream", outcome="error")
+        yield "error", {
+            "message": f"抱歉，问答服务暂时不可用，请稍后再试。错误信息：{str(e)}"
+        }
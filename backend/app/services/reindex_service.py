@@ -0,0 +1,306 @@
+from app.database import transaction
+from app.models import (
+    clear_reindex_checkpoints,
+    compute_chunk_hash,
+    delete_chunks_by_post,
+    delete_collection_chunks,
+    delete_reindex_checkpoint,
+    get_meta,
+    get_published_posts,
+    get_reindex_checkpoints,
+    insert_chunks,
+    save_reindex_checkpoint,
+    set_collection_settings,
+    set_meta,
+    switch_active_collection,
+)
+from app.services.embedding_service import generate_embeddings
+from app.services.index_queue import index_queue
+from app.services.response_cache import response_cache
+from app.services.vector_store import (
+    drop_vector_store,
+    get_active_collection,
+    get_collection_settings,
+    get_vector_store,
+)
+from app.utils.markdown_splitter import split_markdown, split_options
+from datetime import datetime
+from flask import current_app
+import json, time, traceback
+
+# 未完成的重建任务（目标集合、原集合、开始时间）
+REINDEX_STATE_KEY = "reindex_state"
+
+
+def post_fingerprint(post) -> str:
+    """文章内容哈希（标题参与分块，一并计入）"""
+    return compute_chunk_hash(f"{post['title']}\n{post['content']}")
+
+
+class ReindexService:
+    """
+    全量重建向量索引
+
+    1. 新建集合 {CHROMADB_COLLECTION}_{时间戳}，按当前 EMBEDDING_MODEL /
+       EMBEDDING_DIMENSION 生成向量，旧集合在此期间照常提供检索
+    2. 每篇文章的 chunk、向量与检查点（文章内容哈希）在一个事务中写入；
+       中断后再次执行时跳过检查点与内容一致的文章，从中断处继续
+    3. 追平重建期间新增、修改、删除的文章，原子切换 meta.active_collection，
+       等待其他进程感知后删除旧集合
+    Embedding 请求的并发数由 REINDEX_MAX_CONCURRENCY（或 --concurrency）限制
+    """
+
+    def get_state(self, db_path: str):
+        """未完成的重建任务，没有时返回 None"""
+        value = get_meta(db_path, REINDEX_STATE_KEY)
+        return json.loads(value) if value else None
+
+    def run(self, concurrency=None, restart=False, switch=True, progress=None):
+        """
+        在当前线程执行重建
+
+        Args:
+            concurrency: Embedding 并发请求数上限，默认为 REINDEX_MAX_CONCURRENCY
+            restart: 是否放弃未完成的重建，从头开始
+            switch: 完成后是否切换到新集合（否则下次执行时继续并切换）
+            progress: 进度回调，每组文章完成后以结果 dict 调用
+
+        Returns:
+            dict: 重建结果
+        """
+        config = current_app.config
+        db_path = config["DATABASE_PATH"]
+        notify = progress or (lambda _: None)
+        if concurrency is None:
+            concurrency = config.get("REINDEX_MAX_CONCURRENCY", 2)
+
+        try:
+            state, resumed = self._prepare(db_path, restart)
+            target = state["target"]
+            result = {
+                "target": target,
+                "source": state["source"],
+                "resumed": resumed,
+                "total": 0,
+                "done": 0,
+                "indexed": 0,
+                "removed": 0,
+                "chunks": 0,
+                "switched": False,
+                "requeued": 0,
+            }
+
+            # 上次已切换但未清理完（target 已是当前集合）时直接进入清理
+            if target != get_active_collection(refresh=True):
+                # 1. 全量构建，之后追平构建期间的文章变动，直到没有变动
+                for _ in range(max(config.get("REINDEX_CATCHUP_PASSES", 3), 1)):
+                    changed = self._sync(
+                        db_path, target, concurrency, resumed, result, notify
+                    )
+                    resumed = False
+                    if not changed:
+                        break
+
+                if not switch:
+                    return result
+
+                # 2. 原子切换当前集合（同时递增语料版本，使各级缓存失效）
+                switch_active_collection(db_path, target)
+                get_active_collection(refresh=True)
+                response_cache.invalidate()
+                print(f"已切换到向量集合 {target}")
+
+            result["switched"] = True
+
+            # 3. 等待其他进程的集合名缓存过期后删除旧集合
+            time.sleep(config.get("REINDEX_CLEANUP_DELAY", 10))
+            self._drop(db_path, state["source"])
+
+            # 4. 切换前最后一刻的变动交给后台索引队列
+            posts, removed_ids, _ = self._diff(db_path, target)
+            store = get_vector_store(target)
+            for post_id in removed_ids:
+                store.delete_post_embeddings(post_id)
+            for post, _, _ in posts:
+                index_queue.enqueue(post["id"])
+            result["requeued"] = len(posts)
+
+            clear_reindex_checkpoints(db_path, target)
+            set_meta(db_path, REINDEX_STATE_KEY, None)
+            return result
+
+        except Exception as e:
+            traceback.print_exc()
+            raise Exception(f"重建向量索引时出错: {str(e)}")
+
+    def _prepare(self, db_path: str, restart: bool):
+        """
+        读取未完成的重建任务，或登记新的目标集合
+
+        Returns:
+            tuple: (任务状态, 是否为继续执行)
+        """
+        config = current_app.config
+        state = self.get_state(db_path)
+
+        if state is not None and restart:
+            if state["target"] != get_active_collection(refresh=True):
+                self._drop(db_path, state["target"])
+            clear_reindex_checkpoints(db_path, state["target"])
+            set_meta(db_path, REINDEX_STATE_KEY, None)
+            state = None
+
+        if state is not None:
+            return state, True
+
+        target = f"{config['CHROMADB_COLLECTION']}_{datetime.now():%Y%m%d%H%M%S}"
+        set_collection_settings(
+            db_path,
+            target,
+            {
+                "model": config["EMBEDDING_MODEL"],
+                "dimension": config["EMBEDDING_DIMENSION"],
+            },
+        )
+        state = {
+            "target": target,
+            "source": get_active_collection(refresh=True),
+            "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        set_meta(db_path, REINDEX_STATE_KEY, json.dumps(state))
+        return state, False
+
+    def _diff(self, db_path: str, collection: str):
+        """
+        比对已发布文章与集合的检查点
+
+        Returns:
+            tuple: ([(文章, 内容哈希, 是否有旧检查点)] 需要索引的文章,
+                    检查点存在但文章已删除或转为草稿的文章 ID 列表,
+                    已发布文章总数)
+        """
+        checkpoints = get_reindex_checkpoints(db_path, collection)
+        posts = []
+        published_ids = set()
+
+        for post in get_published_posts(db_path):
+            published_ids.add(post["id"])
+            fingerprint = post_fingerprint(post)
+            if checkpoints.get(post["id"]) != fingerprint:
+                posts.append((post, fingerprint, post["id"] in checkpoints))
+
+        removed_ids = [
+            post_id for post_id in checkpoints if post_id not in published_ids
+        ]
+        return posts, removed_ids, len(published_ids)
+
+    def _sync(self, db_path, target, concurrency, resumed, result, notify) -> int:
+        """
+        将目标集合与当前已发布文章对齐
+
+        Args:
+            resumed: 是否为中断后继续执行（中断时可能留下未提交 chunk 的向量，
+                没有检查点的文章也需先清理）
+
+        Returns:
+            int: 本轮索引和移除的文章数
+        """
+        store = get_vector_store(target)
+        settings = get_collection_settings(target)
+        posts, removed_ids, total = self._diff(db_path, target)
+        result["total"] = total
+        result["done"] = total - len(posts)
+
+        # 重建期间删除或转为草稿的文章
+        for post_id in removed_ids:
+            with transaction(db_path):
+                delete_chunks_by_post(db_path, post_id, target)
+                store.delete_post_embeddings(post_id)
+                delete_reindex_checkpoint(db_path, target, post_id)
+            result["removed"] += 1
+
+        # 按 REINDEX_GROUP_SIZE 个 chunk 一组生成向量，逐篇提交
+        group_size = current_app.config.get("REINDEX_GROUP_SIZE", 200)
+        options = split_options(current_app.config)
+        group = []
+        for post, fingerprint, has_checkpoint in posts:
+            chunks = split_markdown(post["content"], post["title"], **options)
+            group.append((post, fingerprint, has_checkpoint or resumed, chunks))
+            if sum(len(entry[3]) for entry in group) >= group_size:
+                self._index_group(db_path, target, store, settings, concurrency, group)
+                self._advance(result, group, notify)
+                group = []
+        if group:
+            self._index_group(db_path, target, store, settings, concurrency, group)
+            self._advance(result, group, notify)
+
+        return len(posts) + len(removed_ids)
+
+    def _advance(self, result: dict, group: list, notify):
+        result["done"] += len(group)
+        result["indexed"] += len(group)
+        result["chunks"] += sum(len(entry[3]) for entry in group)
+        notify(result)
+
+    def _index_group(self, db_path, target, store, settings, concurrency, group):
+        texts = [text for entry in group for text in entry[3]]
+        embeddings = iter(
+            generate_embeddings(
+                texts, settings["model"], settings["dimension"], concurrency
+            )
+        )
+
+        for post, fingerprint, needs_cleanup, chunks in group:
+            post_embeddings = [next(embeddings) for _ in chunks]
+
+            # chunk 与检查点在同一事务中提交；向量存储不参与 SQLite 事务，
+            # 写入向量后出错时先删除本篇已写入的向量再回滚，下次重新索引
+            with transaction(db_path):
+                if needs_cleanup:
+                    delete_chunks_by_post(db_path, post["id"], target)
+                    store.delete_post_embeddings(post["id"])
+
+                chunk_ids = insert_chunks(
+                    db_path, post["id"], list(enumerate(chunks)), target
+                )
+                try:
+                    store.add_embeddings(
+                        [
+                            {
+                                "chunk_id": chunk_id,
+                                "embedding": embedding,
+                                "post_id": post["id"],
+                                "title": post["title"],
+                                "chunk_text": text,
+                                "chunk_index": idx,
+                            }
+                            for chunk_id, embedding, (idx, text) in zip(
+                                chunk_ids, post_embeddings, enumerate(chunks)
+                            )
+                        ]
+                    )
+                    save_reindex_checkpoint(
+                        db_path, target, post["id"], fingerprint, len(chunks)
+                    )
+                except Exception:
+                    try:
+                        store.delete_embeddings(chunk_ids)
+                    except Exception:
+                        # 清理失败时残留的向量由下次重建（needs_cleanup）或索引巡检移除
+                        traceback.print_exc()
+                    raise
+
+    def _drop(self, db_path: str, collection: str):
+        """删除集合的 chunk、向量和登记信息"""
+        deleted = delete_collection_chunks(db_path, collection)
+        try:
+            drop_vector_store(collection)
+        except Exception:
+            # 向量存储中不存在该集合（如尚未写入任何向量）
+            traceback.print_exc()
+        set_collection_settings(db_path, collection, None)
+        print(f"已删除向量集合 {collection}（{deleted} 个 chunk）")
+
+
+# 全局单例
+reindex_service = ReindexService()
@@ -0,0 +1,107 @@
+from app.services.embedding_cache import normalize_text
+from app.utils.ttl_cache import TTLCache
+from flask import current_app
+import threading
+
+
+class RerankCache:
+    """
+    Rerank 结果缓存
+
+    键为 (规范化查询, 有序候选 chunk ID 及内容哈希, Rerank 模型)，
+    值为 Rerank 返回的 (index, relevance_score) 列表。
+    候选内容哈希参与键计算，chunk 内容变化后自然不会命中旧结果；
+    同时维护 chunk ID 到缓存键的反向索引，重新索引时主动失效；
+    条目被淘汰时同步从反向索引中移除，索引大小不超过缓存容量。
+    """
+
+    def __init__(self):
+        self.cache = None
+        self._keys_by_chunk = {}
+        self._lock = threading.Lock()
+
+    def init_cache(self):
+        """按应用配置初始化缓存"""
+        config = current_app.config
+        with self._lock:
+            if self.cache is None:
+                self.cache = TTLCache(
+                    maxsize=config.get("RERANK_CACHE_SIZE", 1024),
+                    ttl=config.get("RERANK_CACHE_TTL", 3600),
+                    on_evict=self._unregister,
+                )
+
+    @staticmethod
+    def _chunk_id(candidate: dict):
+        metadata = candidate.get("metadata") or {}
+        return metadata.get("chunk_id", candidate.get("id"))
+
+    def _unregister(self, key: tuple, value=None):
+        """从反向索引中移除缓存键"""
+        with self._lock:
+            for chunk_id, _ in key[1]:
+                keys = self._keys_by_chunk.get(chunk_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._keys_by_chunk[chunk_id]
+
+    def make_key(self, query: str, candidates: list, model: str) -> tuple:
+        """构造缓存键"""
+        return (
+            normalize_text(query),
+            tuple(
+                (
+                    self._chunk_id(c),
+                    (c.get("metadata") or {}).get("content_hash"),
+                )
+                for c in candidates
+            ),
+            model,
+        )
+
+    def get(self, key: tuple):
+        """读取缓存的 (index, relevance_score) 列表"""
+        if self.cache is None:
+            self.init_cache()
+        return self.cache.get(key)
+
+    def set(self, key: tuple, scores: list):
+        """写入 Rerank 结果，并登记候选 chunk 的反向索引"""
+        if self.cache is None:
+            self.init_cache()
+
+        # 先登记反向索引，写入后立即被淘汰时也能由 _unregister 清理
+        with self._lock:
+            for chunk_id, _ in key[1]:
+                self._keys_by_chunk.setdefault(chunk_id, set()).add(key)
+        self.cache.set(key, scores)
+
+    def invalidate_chunks(self, chunk_ids: list):
+        """使包含任一指定 chunk 的缓存条目失效"""
+        if self.cache is None:
+            return
+
+        with self._lock:
+            keys = set()
+            for chunk_id in chunk_ids:
+                keys |= self._keys_by_chunk.pop(chunk_id, set())
+
+        for key in keys:
+            self.cache.pop(key)
+            self._unregister(key)
+
+    def clear(self):
+        """清空缓存"""
+        if self.cache is not None:
+            self.cache.clear()
+        with self._lock:
+            self._keys_by_chunk.clear()
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        return self.cache.stats() if self.cache is not None else {"size": 0}
+
+
+# 全局单例
+rerank_cache = RerankCache()
@@ -0,0 +1,84 @@
+from app.models import get_corpus_version
+from app.utils.ttl_cache import TTLCache
+from flask import current_app
+import threading, time
+
+
+class ResponseCache:
+    """
+    公开文章接口的进程内响应缓存
+
+    缓存序列化后的 JSON 响应体，条目按语料版本（meta.corpus_version，
+    文章增删改时递增）区分，版本变化后旧条目不再命中。
+    管理后台写入时调用 invalidate() 立即失效；语料版本本身在进程内缓存
+    RESPONSE_CACHE_VERSION_TTL 秒，其他进程写入后最多延迟这么久生效。
+    """
+
+    def __init__(self):
+        self.cache = None
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_cache(self):
+        """按应用配置初始化缓存"""
+        config = current_app.config
+        with self._lock:
+            if self.cache is None:
+                self.cache = TTLCache(
+                    maxsize=config.get("RESPONSE_CACHE_SIZE", 256),
+                    ttl=config.get("RESPONSE_CACHE_TTL", 3600),
+                )
+
+    def version(self) -> int:
+        """当前语料版本（短时间内复用，避免每个请求读库）"""
+        ttl = current_app.config.get("RESPONSE_CACHE_VERSION_TTL", 2)
+        now = time.monotonic()
+
+        with self._lock:
+            if self._version is not None and now - self._version_checked_at < ttl:
+                return self._version
+
+        version = get_corpus_version(current_app.config["DATABASE_PATH"])
+        with self._lock:
+            self._version = version
+            self._version_checked_at = now
+        return version
+
+    def get(self, key: str, version: int):
+        """
+        读取缓存的响应
+
+        Returns:
+            tuple: (响应体 bytes, Last-Modified datetime)，未命中返回 None
+        """
+        if self.cache is None:
+            self.init_cache()
+
+        entry = self.cache.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1], entry[2]
+
+    def set(self, key: str, version: int, body: bytes, last_modified):
+        """写入响应"""
+        if self.cache is None:
+            self.init_cache()
+        self.cache.set(key, (version, body, last_modified))
+
+    def invalidate(self):
+        """清空缓存并在下次请求时重新读取语料版本"""
+        with self._lock:
+            self._version = None
+        if self.cache is not None:
+            self.cache.clear()
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, "version": self._version, **self.cache.stats()}
+
+
+# 全局单例
+response_cache = ResponseCache()
@@ -0,0 +1,238 @@
+from app.models import (
+    compute_chunk_hash,
+    get_active_collection as load_active_collection,
+    get_collection_settings as load_collection_settings,
+)
+from abc import ABC, abstractmethod
+from flask import current_app
+import threading, time
+
+
+class VectorStore(ABC):
+    """
+    向量存储接口
+
+    所有后端以 chunk_{chunk_id} 作为向量 ID，元数据字段见 build_metadata，
+    search 返回 {"id", "distance", "metadata", "document"} 列表，
+    distance 为余弦距离（越小越相似）
+    """
+
+    def add_embedding(
+        self,
+        chunk_id: int,
+        embedding: list,
+        post_id: int,
+        title: str,
+        chunk_text: str,
+        chunk_index: int,
+    ):
+        """
+        添加单个向量
+
+        Args:
+            chunk_id: 文本块 ID
+            embedding: 1024 维向量
+            post_id: 文章 ID
+            title: 文章标题
+            chunk_text: 文本块内容
+            chunk_index: 文本块索引
+        """
+        self.add_embeddings(
+            [
+                {
+                    "chunk_id": chunk_id,
+                    "embedding": embedding,
+                    "post_id": post_id,
+                    "title": title,
+                    "chunk_text": chunk_text,
+                    "chunk_index": chunk_index,
+                }
+            ]
+        )
+
+    @abstractmethod
+    def add_embeddings(self, items: list):
+        """
+        批量添加向量
+
+        Args:
+            items: 条目列表，每项包含 chunk_id、embedding、post_id、
+                title、chunk_text、chunk_index，可选 content_hash
+        """
+
+    @abstractmethod
+    def update_metadatas(self, items: list):
+        """
+        批量更新已有向量的元数据（不改动向量本身）
+
+        Args:
+            items: 条目列表，字段同 add_embeddings，但不需要 embedding
+        """
+
+    @abstractmethod
+    def delete_embeddings(self, chunk_ids: list):
+        """
+        按 chunk ID 批量删除向量
+
+        Args:
+            chunk_ids: 文本块 ID 列表
+        """
+
+    @abstractmethod
+    def delete_post_embeddings(self, post_id: int):
+        """
+        删除文章的所有向量
+
+        Args:
+            post_id: 文章 ID
+        """
+
+    @abstractmethod
+    def get_all_metadatas(self) -> dict:
+        """
+        读取集合中全部向量的元数据（一致性检查用）
+
+        Returns:
+            dict: {向量 ID: 元数据}
+        """
+
+    @abstractmethod
+    def drop_collection(self):
+        """删除整个集合（重建索引切换后清理旧集合）"""
+
+    @abstractmethod
+    def search(self, embedding: list, top_k: int = 10, where: dict = None):
+        """
+        搜索相似向量
+
+        Args:
+            embedding: 查询向量（1024 维）
+            top_k: 返回前 K 个结果
+            where: 元数据等值过滤条件，如 {"post_id": 1}
+
+        Returns:
+            List[dict]: 搜索结果列表
+        """
+
+    @staticmethod
+    def build_metadata(item: dict) -> dict:
+        """构造向量元数据，content_hash 用于增量更新时比对内容"""
+        return {
+            "chunk_id": item["chunk_id"],
+            "post_id": item["post_id"],
+            "title": item["title"],
+            "chunk_text": item["chunk_text"],
+            "chunk_index": item["chunk_index"],
+            "content_hash": item.get("content_hash")
+            or compute_chunk_hash(item["chunk_text"]),
+        }
+
+
+_lock = threading.Lock()
+_active = {"name": None, "checked_at": 0.0}
+_settings = {}
+_stores = {}
+
+
+def get_active_collection(refresh: bool = False) -> str:
+    """
+    当前提供检索的向量集合名（meta.active_collection）
+
+    进程内缓存 ACTIVE_COLLECTION_TTL 秒，其他进程切换集合后最多延迟这么久生效
+
+    Args:
+        refresh: 是否忽略缓存重新读库
+    """
+    config = current_app.config
+    now = time.monotonic()
+
+    with _lock:
+        if (
+            not refresh
+            and _active["name"] is not None
+            and now - _active["checked_at"] < config.get("ACTIVE_COLLECTION_TTL", 5)
+        ):
+            return _active["name"]
+
+    name = load_active_collection(config["DATABASE_PATH"]) or config.get(
+        "CHROMADB_COLLECTION", "blog_chunks"
+    )
+    with _lock:
+        _active["name"] = name
+        _active["checked_at"] = now
+    return name
+
+
+def get_collection_settings(collection: str = None) -> dict:
+    """
+    向量集合的 Embedding 设置（集合建立后不再变化）
+
+    Returns:
+        dict: {"model", "dimension"}，集合未登记时取当前配置
+    """
+    config = current_app.config
+    collection = collection or get_active_collection()
+
+    settings = _settings.get(collection)
+    if settings is None:
+        settings = load_collection_settings(config["DATABASE_PATH"], collection)
+        if settings is None:
+            return {
+                "model": config["EMBEDDING_MODEL"],
+                "dimension": config["EMBEDDING_DIMENSION"],
+            }
+        _settings[collection] = settings
+    return settings
+
+
+def get_vector_store(collection: str = None) -> VectorStore:
+    """
+    按 VECTOR_STORE_BACKEND 配置返回向量存储后端
+
+    Args:
+        collection: 集合名，默认为当前集合
+    """
+    backend = current_app.config.get("VECTOR_STORE_BACKEND", "chroma")
+    collection = collection or get_active_collection()
+    default = current_app.config.get("CHROMADB_COLLECTION", "blog_chunks")
+
+    if backend == "chroma":
+        from app.services.chroma_service import ChromaService, chroma_service
+
+        default_store, store_class = chroma_service, ChromaService
+    elif backend == "numpy":
+        from app.services.numpy_store import NumpyVectorStore, numpy_store
+
+        default_store, store_class = numpy_store, NumpyVectorStore
+    else:
+        raise Exception(f"未知的向量存储后端: {backend}")
+
+    if collection == default:
+        return default_store
+
+    with _lock:
+        store = _stores.get((backend, collection))
+        if store is None:
+            store = _stores[(backend, collection)] = store_class(collection)
+        return store
+
+
+def drop_vector_store(collection: str):
+    """删除向量集合并释放对应的存储实例"""
+    get_vector_store(collection).drop_collection()
+
+    backend = current_app.config.get("VECTOR_STORE_BACKEND", "chroma")
+    with _lock:
+        _stores.pop((backend, collection), None)
+        _settings.pop(collection, None)
+
+
+class VectorStoreProxy:
+    """转发到当前配置后端的代理，供业务代码直接以单例方式使用"""
+
+    def __getattr__(self, name):
+        return getattr(get_vector_store(), name)
+
+
+# 全局单例
+vector_store = VectorStoreProxy()
@@ -0,0 +1,194 @@
+from app.models import compact_visits, log_visits
+from collections import deque
+from datetime import datetime
+import atexit, threading, time, traceback
+
+
+class VisitBuffer:
+    """
+    访客记录后台批量写入（write-behind）
+
+    请求线程只做内存操作：按“同一 IP 半小时内只记一次”的规则在内存中去重，
+    通过去重的访问追加到有界缓冲区，由后台线程定期用 executemany 批量写入。
+    缓冲区已满时直接丢弃并计数，不阻塞请求；进程退出时写入剩余记录。
+    后台线程同时定期清理超出保留期的原始访问记录（汇总表中的数据保留）。
+
+    去重状态按时间窗口分为两代（当前窗口与上一窗口），窗口轮换时整体丢弃
+    更早的一代，内存占用只与最近两个窗口内的独立 IP 数有关。
+    """
+
+    # 原始记录清理间隔（秒）
+    COMPACT_INTERVAL = 3600
+
+    def __init__(self):
+        self.app = None
+        self._last_compact = 0
+        self.window = 30 * 60
+        self.capacity = 10000
+        self.batch_size = 500
+        self._buffer = deque()
+        self._current = {}
+        self._previous = {}
+        self._bucket_start = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+        self.accepted = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        """绑定应用并启动后台写入线程（VISIT_FLUSH_INTERVAL <= 0 时同步写入）"""
+        self.app = app
+        self.window = app.config.get("VISIT_DEDUPE_WINDOW", 30 * 60)
+        self.capacity = app.config.get("VISIT_BUFFER_SIZE", 10000)
+        self.batch_size = app.config.get("VISIT_FLUSH_BATCH", 500)
+
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+
+        if self._thread is not None or app.config.get("VISIT_FLUSH_INTERVAL", 2) <= 0:
+            return
+
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._flush_loop, name="visit-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, ip: str, path: str) -> bool:
+        """
+        记录一次访问（仅内存操作）
+
+        Returns:
+            bool: 是否被接受（半小时内重复访问或缓冲区已满时返回 False）
+        """
+        now = datetime.now()
+        timestamp = now.timestamp()
+
+        with self._lock:
+            self._rotate(timestamp)
+
+            last_seen = self._current.get(ip) or self._previous.get(ip)
+            if last_seen is not None and timestamp - last_seen < self.window:
+                self.deduplicated += 1
+                return False
+
+            if len(self._buffer) >= self.capacity:
+                self.dropped += 1
+                return False
+
+            self._current[ip] = timestamp
+            self._buffer.append((ip, path, now.strftime("%Y-%m-%d %H:%M:%S")))
+            self.accepted += 1
+            pending = len(self._buffer)
+
+        if self._thread is None:
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+
+        return True
+
+    def _rotate(self, timestamp: float):
+        """进入新窗口时把当前一代降为上一代，丢弃更早的记录（调用方持有锁）"""
+        if timestamp - self._bucket_start < self.window:
+            return
+
+        # 超过两个窗口没有访问时，上一代也已全部过期
+        if timestamp - self._bucket_start < 2 * self.window:
+            self._previous = self._current
+        else:
+            self._previous = {}
+        self._current = {}
+        self._bucket_start = timestamp
+
+    def flush(self) -> int:
+        """
+        将缓冲区中的访问记录写入数据库
+
+        Returns:
+            int: 本次写入的记录数
+        """
+        if self.app is None:
+            return 0
+
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+
+            if not batch:
+                return 0
+
+            try:
+                log_visits(self.app.config["DATABASE_PATH"], batch)
+            except Exception:
+                traceback.print_exc()
+                self.failed += 1
+
+                # 写入失败时放回缓冲区等待下次重试，超出容量的部分丢弃
+                with self._lock:
+                    room = max(self.capacity - len(self._buffer), 0)
+                    self._buffer.extendleft(reversed(batch[:room]))
+                    self.dropped += len(batch) - min(room, len(batch))
+                return 0
+
+            self.flushed += len(batch)
+            return len(batch)
+
+    def stop(self):
+        """停止后台线程并写入剩余记录"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _flush_loop(self):
+        interval = self.app.config.get("VISIT_FLUSH_INTERVAL", 2)
+
+        while not self._stopping.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            self.flush()
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if time.time() - self._last_compact < self.COMPACT_INTERVAL:
+            return
+        self._last_compact = time.time()
+
+        try:
+            deleted = compact_visits(
+                self.app.config["DATABASE_PATH"],
+                self.app.config.get("VISIT_RETENTION_DAYS", 90),
+            )
+            if deleted:
+                print(f"已清理 {deleted} 条过期访问记录")
+        except Exception:
+            traceback.print_exc()
+
+    def stats(self) -> dict:
+        """返回缓冲区统计信息"""
+        return {
+            "pending": len(self._buffer),
+            "capacity": self.capacity,
+            "tracked_ips": len(self._current) + len(self._previous),
+            "accepted": self.accepted,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed,
+        }
+
+
+# 全局单例
+visit_buffer = VisitBuffer()
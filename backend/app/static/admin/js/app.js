@@ -1,6 +1,7 @@
 // 全局状态
 let currentTab = 'posts';
 let currentPostId = null;
+let postsCursor = null;
 
 // DOM 元素
 const tabs = document.querySelectorAll('.tab');
@@ -9,6 +10,7 @@ const visitsTab = document.getElementById('visits-tab');
 const logoutBtn = document.getElementById('logout-btn');
 const createPostBtn = document.getElementById('create-post-btn');
 const refreshVisitsBtn = document.getElementById('refresh-visits-btn');
+const morePostsBtn = document.getElementById('posts-more-btn');
 const postModal = document.getElementById('post-modal');
 const modalTitle = document.getElementById('modal-title');
 const modalClose = document.querySelector('.modal-close');
@@ -55,19 +57,30 @@ logoutBtn.addEventListener('click', async () => {
 
 // ============ 文章管理 ============
 
-async function loadPosts() {
+// append 为 true 时按 postsCursor 加载下一页并追加到表格末尾
+async function loadPosts(append = false) {
     const tbody = document.getElementById('posts-tbody');
     const loading = document.getElementById('posts-loading');
     const table = document.getElementById('posts-table');
 
-    loading.style.display = 'block';
-    table.style.display = 'none';
+    if (!append) {
+        postsCursor = null;
+        loading.style.display = 'block';
+        table.style.display = 'none';
+    }
+    morePostsBtn.disabled = true;
 
     try {
-        const response = await fetch('/admin/posts');
+        const query = postsCursor ? `?after=${encodeURIComponent(postsCursor)}` : '';
+        const response = await fetch(`/admin/posts${query}`);
         const data = await response.json();
 
-        tbody.innerHTML = '';
+        if (!append) {
+            tbody.innerHTML = '';
+        }
+        postsCursor = data.next_cursor || null;
+        morePostsBtn.style.display = postsCursor ? 'inline-block' : 'none';
+        morePostsBtn.disabled = false;
 
         if (data.posts && data.posts.length > 0) {
             data.posts.forEach(post => {
@@ -91,7 +104,7 @@ async function loadPosts() {
                 `;
                 tbody.appendChild(row);
             });
-        } else {
+        } else if (!append) {
             tbody.innerHTML = '<tr><td colspan="6" style="text-align: center; color: #9ca3af; padding: 40px;">暂无文章</td></tr>';
         }
 
@@ -104,6 +117,9 @@ async function loadPosts() {
     }
 }
 
+// 加载下一页文章
+morePostsBtn.addEventListener('click', () => loadPosts(true));
+
 // 打开新建文章模态框
 createPostBtn.addEventListener('click', () => {
     currentPostId = null;
@@ -1,5 +1,20 @@
-from .markdown_splitter import split_markdown
+from .markdown_splitter import split_markdown, iter_chunks
 from .auth import verify_ip, verify_credentials
 from .visitor_logger import log_visitor
+from .ttl_cache import TTLCache
+from .pagination import parse_page_args, format_cursor
+from .metrics import MetricsRegistry, registry, span
 
-__all__ = ["split_markdown", "verify_ip", "verify_credentials", "log_visitor"]
+__all__ = [
+    "split_markdown",
+    "iter_chunks",
+    "verify_ip",
+    "verify_credentials",
+    "log_visitor",
+    "TTLCache",
+    "parse_page_args",
+    "format_cursor",
+    "MetricsRegistry",
+    "registry",
+    "span",
+]
@@ -1,97 +1,426 @@
+from functools import lru_cache
 import re
 
+try:
+    import tiktoken
+except ImportError:  # 未安装时使用估算的 token 数
+    tiktoken = None
 
-def split_markdown(content: str, title: str = "") -> list[str]:
+
+# 中日韩字符（与全文检索分词的范围一致）
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_CJK_PATTERN = re.compile(f"[{_CJK_CHARS}]+")
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE_PATTERN = re.compile(r"^\s{0,3}(`{3,}|~{3,})")
+# 句末标点；英文句点后须跟空白，不会切开 URL、版本号和小数
+_SENTENCE_END_PATTERN = re.compile(r"(?<=[。！？!?；;])|(?<=\.)(?=\s)")
+
+# 该级别及以上的标题开始新段落，chunk 不跨段落；更深的标题只更新上下文
+SECTION_LEVEL = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算 token 数（未安装 tiktoken 时使用）
+
+    按常见 BPE 分词器的统计：每个中日韩字符约 1 个 token，英文单词与数字
+    约每 4 个字符 1 个 token（不足 4 个字符按 1 个计），其余非空白字符
+    各 1 个 token；估算值略偏大，保证 chunk 不会超出预算
+    """
+    cjk_chars = sum(map(len, _CJK_PATTERN.findall(text)))
+    words = _WORD_PATTERN.findall(text)
+    word_chars = sum(map(len, words))
+    spaces = text.count(" ") + text.count("\n") + text.count("\t")
+    symbols = len(text) - cjk_chars - word_chars - spaces
+    return cjk_chars + (word_chars + 3 * len(words)) // 4 + symbols
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(tokenizer: str = "cl100k_base"):
+    """
+    返回 token 计数函数
+
+    Args:
+        tokenizer: tiktoken 编码名；为 "estimate"、未安装 tiktoken
+            或编码加载失败时使用 estimate_tokens
+    """
+    if tokenizer == "estimate" or tiktoken is None:
+        return estimate_tokens
+
+    try:
+        encoding = tiktoken.get_encoding(tokenizer)
+    except Exception as e:
+        print(f"加载 tiktoken 编码 {tokenizer} 失败，改用估算: {str(e)}")
+        return estimate_tokens
+
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def split_options(config) -> dict:
+    """从应用配置读取分块参数，作为 split_markdown 的关键字参数"""
+    return {
+        "max_tokens": config.get("CHUNK_MAX_TOKENS", 512),
+        "overlap_tokens": config.get("CHUNK_OVERLAP_TOKENS", 0),
+        "min_tokens": config.get("CHUNK_MIN_TOKENS", 256),
+        "tokenizer": config.get("CHUNK_TOKENIZER", "cl100k_base"),
+    }
+
+
+def split_markdown_task(args) -> list[str]:
+    """进程池任务：分割单篇文章，args 为 (content, title, options)"""
+    content, title, options = args
+    return split_markdown(content, title, **options)
+
+
+def split_markdown(
+    content: str,
+    title: str = "",
+    max_tokens: int = 512,
+    overlap_tokens: int = 0,
+    tokenizer: str = "cl100k_base",
+    min_tokens: int = 0,
+) -> list[str]:
     """
     将 Markdown 内容分割成语义完整的文本块
 
+    见 iter_chunks
+
+    Returns:
+        list: 文本块列表
+    """
+    return list(
+        iter_chunks(content, title, max_tokens, overlap_tokens, tokenizer, min_tokens)
+    )
+
+
+class _Unit:
+    """chunk 的组成单元：一个块（段落、代码块、表格、小标题）或其中的一部分"""
+
+    __slots__ = ("text", "tokens", "joiner", "context", "is_heading")
+
+    def __init__(self, text, tokens, joiner, context, is_heading=False):
+        self.text = text
+        self.tokens = tokens
+        # 与前一单元之间的分隔符（块之间空行，同一块内的行/句子按原样拼接）
+        self.joiner = joiner
+        # 该单元之前生效的标题路径
+        self.context = context
+        self.is_heading = is_heading
+
+
+def iter_chunks(
+    content: str,
+    title: str = "",
+    max_tokens: int = 512,
+    overlap_tokens: int = 0,
+    tokenizer: str = "cl100k_base",
+    min_tokens: int = 0,
+):
+    """
+    单遍扫描 Markdown，逐个生成文本块
+
     规则：
-    1. 按二级标题（##）分割大段落
-    2. 若某段落 > 512 tokens，则按句子边界进一步切分
-    3. 每个 chunk 附加标题上下文（如果有）
+    1. 一级、二级标题开始新段落，chunk 不跨段落（当前 chunk 不足 min_tokens
+       时与下一段落合并）；更深的标题作为正文保留
+    2. 每个 chunk 以文章标题和该 chunk 起始处的各级标题路径开头
+    3. 段落、列表、代码块、表格作为整体装入 chunk，拼接后的 token 数
+       （含标题上下文）不超过 max_tokens
+    4. 单个块超出预算时：普通段落依次按行、按句子切分；代码块和表格
+       按行切分，每一片都补全围栏或表头，不会从中间切开
+    5. 同一段落内相邻 chunk 之间重叠前一个 chunk 末尾不超过
+       overlap_tokens 的单元
+
+    Args:
+        content: Markdown 正文
+        title: 文章标题
+        max_tokens: 每个 chunk 的 token 上限
+        overlap_tokens: 相邻 chunk 的重叠 token 数上限
+        tokenizer: tiktoken 编码名，"estimate" 表示使用估算
+        min_tokens: 段落过短时与下一段落合并的阈值，0 表示每个段落单独成块
+
+    Yields:
+        str: 文本块
     """
-    chunks = []
+    count = get_token_counter(tokenizer)
+    title_line = f"# {title}" if title else ""
+    headings = []  # [(级别, 标题行)]
+
+    current = []
+    current_tokens = 0
+
+    header_tokens = {}
+
+    def header(context):
+        return "\n".join(filter(None, [title_line, *context]))
 
-    # 预处理：统一换行符
-    content = content.replace("\r\n", "\n")
+    def budget_for(unit):
+        """以 unit 开头的 chunk 中正文可用的 token 数"""
+        if unit.context not in header_tokens:
+            header_tokens[unit.context] = count(header(unit.context))
+        # 标题与正文拼接后的 token 数可能略多于两者之和，预留约 2% 的余量
+        return max_tokens - max_tokens // 50 - header_tokens[unit.context]
 
-    # 按二级标题分割
-    # 使用正则表达式匹配 ## 开头的标题
-    pattern = r"\n## (?=[^\n#])"
-    sections = re.split(pattern, "\n" + content)
+    def render(units):
+        parts = [header(units[0].context)]
+        body = units[0].text
+        for unit in units[1:]:
+            body += unit.joiner + unit.text
+        parts.append(body)
+        return "\n".join(filter(None, parts)).strip()
 
-    # 第一个section可能是标题前的内容
-    for section in sections:
-        if not section.strip():
+    def flush(carry_overlap):
+        """输出当前 chunk，返回留给下一个 chunk 的单元"""
+        nonlocal current, current_tokens
+        units, current, current_tokens = current, [], 0
+
+        # 末尾的小标题属于下一个 chunk
+        carry = []
+        while units and units[-1].is_heading:
+            carry.insert(0, units.pop())
+
+        if units:
+            yield render(units)
+
+            if carry_overlap and overlap_tokens > 0 and not carry:
+                budget = overlap_tokens
+                for unit in reversed(units):
+                    if unit.tokens > budget or unit.is_heading:
+                        break
+                    carry.insert(0, unit)
+                    budget -= unit.tokens
+
+        for unit in carry:
+            current.append(unit)
+            current_tokens += unit.tokens
+
+    def fits(unit):
+        """当前 chunk 加入 unit 后是否仍在预算内"""
+        if not current:
+            return True
+        # token 数不可加：各单元之和超出预算时直接拒绝，加上每个拼接处 1 个 token
+        # 仍在预算内时直接通过，其余按拼接后的完整文本（含标题上下文）计数
+        budget = budget_for(current[0])
+        if current_tokens + unit.tokens > budget:
+            return False
+        if current_tokens + unit.tokens + len(current) <= budget:
+            return True
+        return (
+            count(render([*current, unit]))
+            <= budget + header_tokens[current[0].context]
+        )
+
+    def add(unit):
+        """加入一个单元，超出预算时先输出当前 chunk"""
+        nonlocal current_tokens
+        if not fits(unit):
+            yield from flush(carry_overlap=True)
+            # 重叠部分加上新单元超出预算时，从前往后丢弃重叠单元
+            while current and not current[0].is_heading and not fits(unit):
+                current_tokens -= current.pop(0).tokens
+        current.append(unit)
+        current_tokens += unit.tokens
+
+    def add_block(text, kind):
+        """加入一个块，必要时拆分"""
+        context = tuple(line for _, line in headings)
+        unit = _Unit(text, count(text), "\n\n", context)
+        budget = budget_for(unit)
+
+        # 当前 chunk 末尾连续的小标题（其间没有正文）在输出时会随本块进入下一个
+        # chunk，且不会为腾出空间被丢弃：预算扣除这些标题及其上下文
+        leading = []
+        for previous in reversed(current):
+            if not previous.is_heading:
+                break
+            leading.insert(0, previous)
+        if leading:
+            budget = min(
+                budget,
+                budget_for(leading[0])
+                - sum(heading.tokens for heading in leading)
+                - len(leading),
+            )
+        budget = max(budget, 1)
+
+        if unit.tokens <= budget:
+            yield from add(unit)
+            return
+
+        for piece, joiner, tokens in _split_block(text, kind, budget, count):
+            yield from add(_Unit(piece, tokens, joiner, context))
+
+    block = []
+    block_kind = None
+    fence = None
+
+    def end_block():
+        nonlocal block, block_kind
+        if block:
+            text, kind = "\n".join(block), block_kind
+            block, block_kind = [], None
+            if text.strip():
+                yield from add_block(text, kind)
+
+    for line in content.replace("\r\n", "\n").split("\n"):
+        # 代码块内部原样保留，直到遇到匹配的结束围栏
+        if fence is not None:
+            block.append(line)
+            if line.strip().startswith(fence) and not line.strip().strip(fence[0]):
+                fence = None
+                yield from end_block()
             continue
 
-        # 移除开头的换行符
-        section = section.lstrip("\n")
+        match = _FENCE_PATTERN.match(line)
+        if match:
+            yield from end_block()
+            fence = match.group(1)
+            block, block_kind = [line], "code"
+            continue
 
-        # 检查是否以标题开头（第一个section可能没有标题）
-        lines = section.split("\n", 1)
-        if len(lines) == 2 and section.startswith("##"):
-            heading = lines[0].replace("##", "").strip()
-            body = lines[1]
-        else:
-            heading = ""
-            body = section
+        if not line.strip():
+            yield from end_block()
+            continue
 
-        # 构建带上下文的文本
-        if heading:
-            full_text = f"# {title}\n## {heading}\n{body}"
-        else:
-            full_text = f"# {title}\n{body}"
+        match = _HEADING_PATTERN.match(line)
+        if match:
+            yield from end_block()
+            level = len(match.group(1))
+            heading_line = f"{match.group(1)} {match.group(2)}"
 
-        # 简单估算 token 数（中文约 1 字符 = 1 token，英文约 4 字符 = 1 token）
-        # 这里使用字符数/2 作为粗略估算
-        estimated_tokens = len(full_text) // 2
+            if level <= SECTION_LEVEL and (
+                not current or current_tokens >= min_tokens
+            ):
+                yield from flush(carry_overlap=False)
+                current.clear()
+                current_tokens = 0
+            else:
+                context = tuple(line for _, line in headings)
+                yield from add(
+                    _Unit(heading_line, count(heading_line), "\n\n", context, True)
+                )
 
-        if estimated_tokens <= 512:
-            chunks.append(full_text.strip())
-        else:
-            # 如果过长，按句子进一步分割
-            sub_chunks = split_by_sentences(full_text.strip(), max_length=512)
-            chunks.extend(sub_chunks)
-
-    # 如果没有二级标题，整个内容作为一块
-    if not chunks and content.strip():
-        full_text = f"# {title}\n{content}"
-        if len(full_text) // 2 <= 512:
-            chunks.append(full_text.strip())
-        else:
-            chunks = split_by_sentences(full_text.strip(), max_length=512)
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading_line))
+            continue
+
+        is_table = line.lstrip().startswith("|")
+        if block and (block_kind == "table") != is_table:
+            yield from end_block()
+        if not block:
+            block_kind = "table" if is_table else "text"
+        block.append(line)
 
-    return chunks
+    yield from end_block()
+    yield from flush(carry_overlap=False)
 
 
-def split_by_sentences(text: str, max_length: int = 512) -> list[str]:
+def _split_block(text, kind, budget, count):
     """
-    按句子边界分割文本，确保每块不超过指定长度
+    将超出预算的块拆成若干片
+
+    Returns:
+        list: [(片段, 与前一片段的分隔符, token 数)]
     """
-    chunks = []
-    current_chunk = ""
+    lines = text.split("\n")
 
-    # 按句子分割（中文句号、问号、感叹号，英文句号、问号、感叹号）
-    # 使用更细粒度的分割
-    sentences = re.split(r"([。！？.!?])", text)
+    if kind == "code":
+        opening, closing = lines[0], lines[-1]
+        if len(lines) > 1 and _FENCE_PATTERN.match(closing):
+            lines = lines[1:-1]
+        else:
+            # 未闭合的代码块
+            lines, closing = lines[1:], _FENCE_PATTERN.match(opening).group(1)
+        return [
+            (piece, "\n\n", tokens)
+            for piece, tokens in _pack(
+                lines, "\n", budget, count, lambda body: f"{opening}\n{body}\n{closing}"
+            )
+        ]
 
-    # 重新组合句子和标点
-    for i in range(0, len(sentences) - 1, 2):
-        sentence = sentences[i] + sentences[i + 1]
+    if kind == "table":
+        head = lines[:2] if len(lines) > 2 else lines[:1]
+        rows = lines[len(head) :]
+        head_text = "\n".join(head)
+        return [
+            (piece, "\n\n", tokens)
+            for piece, tokens in _pack(
+                rows, "\n", budget, count, lambda body: f"{head_text}\n{body}"
+            )
+        ]
 
-        # 估算 token 数
-        estimated_tokens = (len(current_chunk) + len(sentence)) // 2
+    # 普通段落：先按行（列表项），过长的行再按句子切分
+    pieces = []
+    for line in lines:
+        tokens = count(line)
+        if tokens <= budget:
+            pieces.append((line, "\n", tokens))
+            continue
+        sentences = [s for s in _SENTENCE_END_PATTERN.split(line) if s]
+        for i, (sentence, tokens) in enumerate(_pack(sentences, "", budget, count)):
+            pieces.append((sentence, "\n" if i == 0 else "", tokens))
 
-        if estimated_tokens <= max_length:
-            current_chunk += sentence
-        else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence
+    # 第一片与前一个块之间空一行
+    if pieces:
+        pieces[0] = (pieces[0][0], "\n\n", pieces[0][2])
+    return pieces
+
+
+def _pack(parts, joiner, budget, count, wrap=None):
+    """
+    按顺序把片段合并成不超过预算的若干组，单个片段超出预算时按字符硬切
+
+    token 数按合并（并经 wrap 补全围栏或表头）后的文本计算：分词结果
+    不可加，逐片段相加可能低估（估算按片段向下取整，BPE 会跨换行合并）
+
+    Args:
+        wrap: 每组文本的包装函数（补全代码块围栏、表头），None 表示不包装
+
+    Returns:
+        list: [(合并并包装后的文本, token 数)]
+    """
+    wrap = wrap or (lambda body: body)
+    budget = max(budget, 1)
+    overhead = count(wrap(""))
+    groups = []
+    group, group_tokens = [], 0
+
+    def close():
+        text = wrap(joiner.join(group))
+        groups.append((text, count(text)))
+
+    for part in parts:
+        tokens = count(part)
+        # 各片段之和加上每个拼接处 1 个 token 仍在预算内时不必重新计数
+        if (
+            group
+            and group_tokens + tokens + overhead + len(group) + 2 > budget
+            and count(wrap(joiner.join([*group, part]))) > budget
+        ):
+            close()
+            group, group_tokens = [], 0
+        if not group and count(wrap(part)) > budget:
+            # 单个片段超出预算：按字符硬切，每一片单独成组
+            for piece in _hard_split(part, max(budget - overhead, 1), count):
+                groups.append((wrap(piece), count(wrap(piece))))
+            continue
+        group.append(part)
+        group_tokens += tokens
+
+    if group:
+        close()
+    return groups
 
-    # 添加最后一块
-    if current_chunk:
-        chunks.append(current_chunk.strip())
 
-    return chunks
+def _hard_split(text, budget, count):
+    """最后手段：按 token 比例估算字符数切分"""
+    pieces = []
+    while text:
+        size = max(int(len(text) * budget / max(count(text), 1)), 1)
+        while size > 1 and count(text[:size]) > budget:
+            size = size * 3 // 4
+        pieces.append(text[:size])
+        text = text[size:]
+    return pieces
@@ -0,0 +1,339 @@
+from contextlib import contextmanager
+from flask import g, request
+import math, threading, time
+
+# 默认的耗时分桶（秒），覆盖本地查询（毫秒级）到 LLM 生成（数十秒）
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """带标签的指标，各标签组合的值保存在 _values 中"""
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}"
+            )
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def samples(self):
+        """[(指标名后缀, 标签, 值)]"""
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的数值"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """分桶直方图（累计计数、总和、次数）"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录 with 块的耗时（秒）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            ]
+
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(
+                    (
+                        "_bucket",
+                        key + (("le", _format_value(float(bound))),),
+                        cumulative,
+                    )
+                )
+            samples.append(("_bucket", key + (("le", "+Inf"),), count))
+            samples.append(("_sum", key, total))
+            samples.append(("_count", key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表，按 Prometheus 文本格式（0.0.4）导出
+
+    指标值保存在当前进程中，多进程部署（如 gunicorn 多 worker）时
+    每个 worker 各自统计，抓取到的是处理该次请求的 worker 的数据。
+    collector 在每次导出时调用，用于导出已有模块自行维护的统计（缓存命中数、
+    队列长度等），返回 [(指标名, 类型, 说明, [(标签 dict, 值)])]。
+    """
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        full_name = self._full_name(name)
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(
+                    full_name, documentation, labelnames, **kwargs
+                )
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {full_name} 已注册为 {metric.type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def register_collector(self, collector):
+        """注册导出时调用的采集函数"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """导出全部指标"""
+        lines = []
+
+        def emit(name, type_, documentation, samples):
+            lines.append(f"# HELP {name} {_escape(documentation)}")
+            lines.append(f"# TYPE {name} {type_}")
+            for suffix, labels, value in samples:
+                lines.append(
+                    f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+                )
+
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            emit(metric.name, metric.type, metric.documentation, metric.samples())
+
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"采集指标时出错: {str(e)}")
+                continue
+            for name, type_, documentation, values in families:
+                emit(
+                    self._full_name(name),
+                    type_,
+                    documentation,
+                    [
+                        ("", tuple(sorted(labels.items())), value)
+                        for labels, value in values
+                    ],
+                )
+
+        return "\n".join(lines) + "\n"
+
+
+# ==================== 全局指标 ====================
+
+registry = MetricsRegistry("smartblog")
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求处理耗时（流式响应包含发送时间）",
+    ("method", "endpoint", "status"),
+)
+STAGE_DURATION = registry.histogram(
+    "stage_duration_seconds",
+    "RAG 问答、文章索引各阶段及 DashScope 调用的耗时",
+    ("pipeline", "stage"),
+)
+STAGE_ERRORS = registry.counter(
+    "stage_errors_total", "各阶段抛出异常的次数", ("pipeline", "stage")
+)
+UPSTREAM_ERRORS = registry.counter(
+    "upstream_errors_total", "DashScope 接口调用失败次数", ("service",)
+)
+RERANK_FALLBACKS = registry.counter(
+    "rerank_fallbacks_total", "Rerank 失败后退回检索顺序的次数", ("reason",)
+)
+RAG_QUERIES = registry.counter(
+    "rag_queries_total", "RAG 问答次数（按结果）", ("mode", "outcome")
+)
+RETRIEVAL_TOP_K = registry.histogram(
+    "rag_retrieval_top_k",
+    "自适应检索选取的向量结果数",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50),
+)
+RERANK_DECISIONS = registry.counter(
+    "rag_rerank_decisions_total",
+    "是否调用 Rerank 及原因",
+    ("decision", "reason"),
+)
+RERANK_DOCUMENTS = registry.histogram(
+    "rag_rerank_documents",
+    "每次 Rerank 请求发送的文档数",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50),
+)
+
+
+@contextmanager
+def span(pipeline: str, stage: str):
+    """
+    记录一个阶段的耗时，阶段抛出异常时同时计入 stage_errors_total
+
+    Args:
+        pipeline: 所属流程（rag、index、dashscope）
+        stage: 阶段名
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(pipeline=pipeline, stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(
+            time.perf_counter() - started, pipeline=pipeline, stage=stage
+        )
+
+
+def init_request_metrics(app):
+    """为所有路由记录请求耗时（按路由规则而非实际路径统计，避免标签过多）"""
+
+    def start_timer():
+        g._request_started = time.perf_counter()
+
+    def record_duration(response):
+        started = g.get("_request_started")
+        if started is None:
+            return response
+
+        labels = {
+            "method": request.method,
+            "endpoint": request.url_rule.rule if request.url_rule else "<unmatched>",
+            "status": response.status_code,
+        }
+        observe = lambda: REQUEST_DURATION.observe(
+            time.perf_counter() - started, **labels
+        )
+        # 流式响应在发送完毕后记录
+        if response.is_streamed:
+            response.call_on_close(observe)
+        else:
+            observe()
+        return response
+
+    app.before_request(start_timer)
+    app.after_request(record_duration)
@@ -0,0 +1,40 @@
+def parse_page_args(args, default_limit: int = 20, max_limit: int = 100):
+    """
+    解析 keyset 分页参数 ?after=<created_at,id>&limit=
+
+    Args:
+        args: 请求查询参数（request.args）
+        default_limit: 默认每页数量
+        max_limit: 每页数量上限
+
+    Returns:
+        tuple: ((created_at, id) 或 None, limit)
+
+    Raises:
+        ValueError: 参数格式不正确
+    """
+    try:
+        limit = int(args.get("limit", default_limit))
+    except ValueError:
+        raise ValueError("limit 必须是整数")
+    limit = max(1, min(limit, max_limit))
+
+    after = args.get("after")
+    if not after:
+        return None, limit
+
+    # created_at 本身不含逗号，按最后一个逗号拆分
+    created_at, sep, post_id = after.rpartition(",")
+    if not sep or not created_at:
+        raise ValueError("after 格式应为 <created_at,id>")
+    try:
+        return (created_at, int(post_id)), limit
+    except ValueError:
+        raise ValueError("after 中的 id 必须是整数")
+
+
+def format_cursor(cursor) -> str:
+    """将 (created_at, id) 游标编码为 after 参数，None 原样返回"""
+    if cursor is None:
+        return None
+    return f"{cursor[0]},{cursor[1]}"
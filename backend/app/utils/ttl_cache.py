@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import threading, time
+
+
+class TTLCache:
+    """
+    线程安全的进程内 LRU 缓存，支持容量上限、过期时间和命中统计
+
+    on_evict(key, value) 在条目因过期或超出容量被淘汰时调用（在锁外调用），
+    供维护附加索引的调用方同步清理；pop 与 clear 不触发
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evicted(self, items):
+        if self.on_evict is not None:
+            for key, value in items:
+                self.on_evict(key, value)
+
+    def get(self, key):
+        """读取缓存，未命中或已过期返回 None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = item
+            if expires_at >= time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+            del self._data[key]
+            self.misses += 1
+
+        self._evicted([(key, value)])
+        return None
+
+    def set(self, key, value, ttl: float = None):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                old_key, (old_value, _) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+
+        self._evicted(evicted)
+
+    def pop(self, key):
+        """删除单个条目"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[0] if item else None
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
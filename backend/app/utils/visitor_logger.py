@@ -1,5 +1,5 @@
 from flask import request, current_app
-from app.models import log_visit
+from app.services.visit_buffer import visit_buffer
 
 
 def log_visitor():
@@ -34,5 +34,4 @@ def log_visitor():
     # 只记录非 API、非静态资源的直接请求
     log_visitor_paths = current_app.config.get("LOG_VISITOR_PATHS", [])
     if request.path in log_visitor_paths:
-        db_path = current_app.config["DATABASE_PATH"]
-        log_visit(db_path, request.remote_addr, request.path)
+        visit_buffer.record(request.remote_addr, request.path)
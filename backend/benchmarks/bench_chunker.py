@@ -0,0 +1,165 @@
+"""
+Markdown 分块基准：旧版正则分块 vs 单遍流式分块
+
+构造中英文混排的长文章（多级标题、含句点的代码块、URL 与版本号、表格、
+列表），对比两种实现的：
+- 分块耗时（每篇 p50 / p95 / p99）
+- chunk 数量、小于 --tiny-tokens 的碎片 chunk 数、token 数分布
+- 从中间切开代码块的 chunk 数（围栏数为奇数）
+- 需要生成向量的 token 总量
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_chunker --posts 200 --sections 30
+"""
+
+from app.utils.markdown_splitter import (
+    estimate_tokens,
+    get_token_counter,
+    split_markdown,
+)
+from benchmarks.common import make_post, percentile
+import argparse, json, random, re, time
+
+
+def legacy_split_markdown(content, title=""):
+    """旧版实现（按 ## 正则切分、按 . 切句、len // 2 估算 token），仅用于对比"""
+    chunks = []
+    content = content.replace("\r\n", "\n")
+    sections = re.split(r"\n## (?=[^\n#])", "\n" + content)
+
+    for section in sections:
+        if not section.strip():
+            continue
+        section = section.lstrip("\n")
+        lines = section.split("\n", 1)
+        if len(lines) == 2 and section.startswith("##"):
+            heading, body = lines[0].replace("##", "").strip(), lines[1]
+        else:
+            heading, body = "", section
+
+        full_text = (
+            f"# {title}\n## {heading}\n{body}" if heading else f"# {title}\n{body}"
+        )
+        if len(full_text) // 2 <= 512:
+            chunks.append(full_text.strip())
+        else:
+            chunks.extend(legacy_split_by_sentences(full_text.strip(), 512))
+
+    if not chunks and content.strip():
+        full_text = f"# {title}\n{content}"
+        if len(full_text) // 2 <= 512:
+            chunks.append(full_text.strip())
+        else:
+            chunks = legacy_split_by_sentences(full_text.strip(), 512)
+
+    return chunks
+
+
+def legacy_split_by_sentences(text, max_length=512):
+    chunks = []
+    current_chunk = ""
+    sentences = re.split(r"([。！？.!?])", text)
+    for i in range(0, len(sentences) - 1, 2):
+        sentence = sentences[i] + sentences[i + 1]
+        if (len(current_chunk) + len(sentence)) // 2 <= max_length:
+            current_chunk += sentence
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def broken_fences(chunk):
+    return len(re.findall(r"^\s{0,3}```", chunk, re.M)) % 2 == 1
+
+
+def measure(name, split, posts, count, tiny_tokens):
+    latencies, chunk_tokens, broken = [], [], 0
+    for title, content in posts:
+        start = time.perf_counter()
+        chunks = split(content, title)
+        latencies.append((time.perf_counter() - start) * 1000)
+        for chunk in chunks:
+            chunk_tokens.append(count(chunk))
+            broken += broken_fences(chunk)
+
+    return {
+        "name": name,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "chunks": len(chunk_tokens),
+        "tiny_chunks": sum(1 for t in chunk_tokens if t < tiny_tokens),
+        "broken_fence_chunks": broken,
+        "tokens_total": sum(chunk_tokens),
+        "tokens_p50": percentile(chunk_tokens, 50),
+        "tokens_max": max(chunk_tokens, default=0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown 分块基准")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=30)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--overlap-tokens", type=int, default=0)
+    parser.add_argument("--min-tokens", type=int, default=256)
+    parser.add_argument("--tokenizer", default="cl100k_base")
+    parser.add_argument("--tiny-tokens", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    posts = [(f"文章 {i}", make_post(rng, args.sections)) for i in range(args.posts)]
+    count = get_token_counter(args.tokenizer)
+    print(
+        f"posts={args.posts} 平均 {sum(len(c) for _, c in posts) // args.posts} 字符，"
+        f"计数方式 {'estimate' if count is estimate_tokens else args.tokenizer}"
+    )
+
+    results = [
+        measure("legacy", legacy_split_markdown, posts, count, args.tiny_tokens),
+        measure(
+            "streaming",
+            lambda content, title: split_markdown(
+                content,
+                title,
+                max_tokens=args.max_tokens,
+                overlap_tokens=args.overlap_tokens,
+                tokenizer=args.tokenizer,
+                min_tokens=args.min_tokens,
+            ),
+            posts,
+            count,
+            args.tiny_tokens,
+        ),
+    ]
+
+    header = (
+        f"{'splitter':<11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'chunks':>8}"
+        f"{'tiny':>6}{'broken':>8}{'tokens':>9}{'tok p50':>9}{'tok max':>9}"
+    )
+    print(header)
+    for r in results:
+        print(
+            f"{r['name']:<11}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+            f"{r['chunks']:>8}{r['tiny_chunks']:>6}{r['broken_fence_chunks']:>8}"
+            f"{r['tokens_total']:>9}{r['tokens_p50']:>9.0f}{r['tokens_max']:>9}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"params": vars(args), "results": results},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+
+if __name__ == "__main__":
+    main()
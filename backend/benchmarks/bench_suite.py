@@ -0,0 +1,316 @@
+"""
+热路径综合基准：写入与查询
+
+在临时目录中生成合成语料（文章、chunk、访问记录），DashScope 由
+benchmarks.common.FakeDashScope 替代（确定性结果，可注入延迟），依次测量：
+- split：split_markdown 分块
+- ingest：create_post + update_post_embeddings（分块、生成向量、写入 chunk 与向量）
+- search：向量存储 search（top-K）
+- hybrid_search：向量检索 + FTS5 全文检索 + RRF 融合
+- listing：get_posts_page 逐页读取全部已发布文章
+- get_post / update_post：单篇文章读取与更新（只改标题，不触发重新索引）
+- log_visit：同步写入访问记录（半小时去重）
+- visit_record：访客记录缓冲区（请求线程内的内存操作）
+- rag / rag_stream：端到端 RAG 问答（查询向量、检索、Rerank、生成）
+每个阶段输出吞吐量与 p50 / p95 / p99，结果可保存为 JSON，
+用 python -m benchmarks.compare 对比两次提交的结果。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_suite --posts 200 --visits 100000 --output before.json
+    python -m benchmarks.bench_suite --embedding-latency 0.05 --rerank-latency 0.08 \\
+        --generation-latency 0.5 --jitter 0.02 --stages rag rag_stream
+"""
+
+from benchmarks.common import (
+    FakeDashScope,
+    environment,
+    fake_embedding,
+    make_app,
+    make_corpus,
+    make_questions,
+    random_ip,
+    timed,
+)
+from datetime import datetime, timedelta
+import argparse, contextlib, json, os, random, shutil, sys, tempfile, time
+
+STAGES = [
+    "split",
+    "ingest",
+    "search",
+    "hybrid_search",
+    "listing",
+    "get_post",
+    "update_post",
+    "log_visit",
+    "visit_record",
+    "rag",
+    "rag_stream",
+]
+
+
+def seed_visits(db_path, visits, posts, ip_count, seed):
+    """批量写入历史访问记录（最近 90 天）"""
+    from app.database import get_db_connection
+
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    with get_db_connection(db_path) as conn:
+        batch = []
+        for _ in range(visits):
+            visited_at = now - timedelta(seconds=rng.randrange(90 * 24 * 3600))
+            batch.append(
+                (
+                    random_ip(rng, ip_count),
+                    f"/posts/{rng.randrange(max(posts, 1)) + 1}",
+                    visited_at.strftime("%Y-%m-%d %H:%M:%S"),
+                )
+            )
+            if len(batch) >= 50000:
+                conn.executemany(
+                    "INSERT INTO visits (ip, path, visited_at) VALUES (?, ?, ?)", batch
+                )
+                batch = []
+        if batch:
+            conn.executemany(
+                "INSERT INTO visits (ip, path, visited_at) VALUES (?, ?, ?)", batch
+            )
+        conn.commit()
+
+
+def run(args, data_dir):
+    from app.models import (
+        create_post,
+        get_post,
+        get_posts_page,
+        log_visit,
+        update_post,
+    )
+    from app.services.embedding_service import update_post_embeddings
+    from app.services.rag_service import rag_query, rag_query_stream, search_chunks
+    from app.services.vector_store import get_vector_store
+    from app.services.visit_buffer import visit_buffer
+    from app.utils.markdown_splitter import split_markdown, split_options
+
+    fake = FakeDashScope(
+        latency={
+            "embedding": args.embedding_latency,
+            "rerank": args.rerank_latency,
+            "generation": args.generation_latency,
+        },
+        jitter=args.jitter,
+        seed=args.seed,
+    )
+    app = make_app(
+        data_dir,
+        fake,
+        VECTOR_STORE_BACKEND=args.backend,
+        EMBEDDING_DIMENSION=args.dim,
+        ANSWER_CACHE_ENABLED=args.answer_cache,
+    )
+    stages = args.stages or STAGES
+    corpus = make_corpus(args.posts, args.sections, args.seed)
+    questions = make_questions(args.queries, args.seed + 1)
+    rng = random.Random(args.seed)
+    results = {}
+
+    # 服务内的日志输出被重定向时，结果仍打印到终端
+    out = sys.__stdout__
+
+    def report(name, result):
+        results[name] = result
+        print(
+            f"{name:<14}{result['count']:>7}{result['throughput_per_s']:>11.1f}"
+            f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}",
+            file=out,
+            flush=True,
+        )
+
+    print(
+        f"{'stage':<14}{'count':>7}{'ops/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+        file=out,
+    )
+
+    with app.app_context():
+        db_path = app.config["DATABASE_PATH"]
+        options = split_options(app.config)
+
+        if "split" in stages:
+            report(
+                "split",
+                timed(lambda post: split_markdown(post[1], post[0], **options), corpus),
+            )
+
+        # 后续阶段都依赖已写入的语料，未选择 ingest 时也会写入，只是不计入结果
+        post_ids = []
+
+        def ingest(post):
+            title, content = post
+            post_id = create_post(db_path, title, content)
+            update_post_embeddings(post_id, title, content)
+            post_ids.append(post_id)
+
+        calls_before = dict(fake.calls)
+        result = timed(ingest, corpus)
+        if "ingest" in stages:
+            result["embedding_requests"] = (
+                fake.calls["embedding"] - calls_before["embedding"]
+            )
+            report("ingest", result)
+
+        if args.visits:
+            seed_visits(db_path, args.visits, args.posts, args.ip_count, args.seed)
+
+        store = get_vector_store()
+        query_embeddings = [fake_embedding(q, args.dim) for q in questions]
+        top_k = app.config.get("RAG_TOP_K", 10)
+
+        if "search" in stages:
+            report(
+                "search",
+                timed(
+                    lambda embedding: store.search(embedding, top_k=top_k),
+                    query_embeddings,
+                ),
+            )
+
+        if "hybrid_search" in stages:
+            report(
+                "hybrid_search",
+                timed(
+                    lambda pair: search_chunks(*pair), zip(questions, query_embeddings)
+                ),
+            )
+
+        if "listing" in stages:
+            page_size = app.config.get("POSTS_PAGE_SIZE", 20)
+
+            def walk(_):
+                after = None
+                while True:
+                    _, after = get_posts_page(db_path, "published", after, page_size)
+                    if after is None:
+                        break
+
+            report("listing", timed(walk, range(max(args.queries // 10, 1))))
+
+        sample_ids = (
+            [rng.choice(post_ids) for _ in range(args.queries)] if post_ids else []
+        )
+
+        if "get_post" in stages:
+            report(
+                "get_post",
+                timed(lambda post_id: get_post(db_path, post_id), sample_ids),
+            )
+
+        if "update_post" in stages:
+            report(
+                "update_post",
+                timed(
+                    lambda post_id: update_post(
+                        db_path, post_id, title=f"更新 {post_id}"
+                    ),
+                    sample_ids,
+                ),
+            )
+
+        visitors = [
+            (
+                random_ip(rng, args.ip_count),
+                f"/posts/{rng.randrange(max(args.posts, 1)) + 1}",
+            )
+            for _ in range(args.queries * 5)
+        ]
+
+        if "log_visit" in stages:
+            report(
+                "log_visit", timed(lambda visit: log_visit(db_path, *visit), visitors)
+            )
+
+        if "visit_record" in stages:
+            result = timed(lambda visit: visit_buffer.record(*visit), visitors)
+            started = time.perf_counter()
+            visit_buffer.flush()
+            result["flush_ms"] = (time.perf_counter() - started) * 1000
+            report("visit_record", result)
+
+        if "rag" in stages:
+            report("rag", timed(rag_query, questions))
+
+        if "rag_stream" in stages:
+            # 换一批问题，避免命中 rag 阶段留下的查询向量和 Rerank 缓存
+            stream_questions = [f"{q} (stream)" for q in questions]
+            report(
+                "rag_stream",
+                timed(lambda q: list(rag_query_stream(q)), stream_questions),
+            )
+
+        results["_corpus"] = {
+            "posts": len(post_ids),
+            "vectors": len(store.get_all_metadatas()),
+            "visits": args.visits,
+            "dashscope_calls": dict(fake.calls),
+        }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热路径综合基准")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=8, help="每篇文章的二级标题数")
+    parser.add_argument(
+        "--visits", type=int, default=100000, help="预先写入的访问记录数"
+    )
+    parser.add_argument("--ip-count", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200, help="各查询阶段的请求数")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embedding-latency", type=float, default=0.0)
+    parser.add_argument("--rerank-latency", type=float, default=0.0)
+    parser.add_argument("--generation-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="各接口额外的随机延迟上限"
+    )
+    parser.add_argument("--answer-cache", action="store_true", help="启用语义回答缓存")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="只运行指定阶段")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", help="数据目录（默认使用临时目录并在结束后删除）")
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示服务内的日志输出")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                results = run(args, data_dir)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    corpus = results.pop("_corpus")
+    print(
+        f"语料：{corpus['posts']} 篇文章，{corpus['vectors']} 个向量，"
+        f"{corpus['visits']} 条访问记录；DashScope 调用 {corpus['dashscope_calls']}"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "params": vars(args),
+                    "environment": environment(),
+                    "corpus": corpus,
+                    "results": results,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+
+if __name__ == "__main__":
+    main()
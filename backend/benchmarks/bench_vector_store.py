@@ -0,0 +1,182 @@
+"""
+向量存储后端对比基准：ChromaDB vs NumPy 内存映射矩阵
+
+对比指标：
+- 冷启动：新进程导入后端 + 打开集合 + 首次查询的耗时
+- 查询延迟：p50 / p95 / p99
+- 内存：查询结束后的进程峰值 RSS
+
+每个后端在独立子进程中测量，互不影响导入缓存和内存统计。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_vector_store --chunks 3000 --queries 200
+"""
+
+from flask import Flask
+import argparse, json, os, subprocess, sys, tempfile, time
+
+import numpy as np
+
+BACKENDS = ["chroma", "numpy"]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def peak_rss_mb():
+    """当前进程峰值 RSS（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def make_app(data_dir):
+    app = Flask("bench")
+    app.config.update(
+        CHROMADB_PATH=os.path.join(data_dir, "chroma"),
+        NUMPY_STORE_PATH=os.path.join(data_dir, "numpy"),
+        CHROMADB_COLLECTION="bench_chunks",
+    )
+    return app
+
+
+def get_store(backend):
+    if backend == "chroma":
+        from app.services.chroma_service import chroma_service
+
+        return chroma_service
+
+    from app.services.numpy_store import numpy_store
+
+    return numpy_store
+
+
+def random_vectors(count, dim, seed):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, dim), dtype=np.float32)
+
+
+def build(backend, data_dir, chunks, dim, batch_size=500):
+    """写入合成语料"""
+    app = make_app(data_dir)
+    vectors = random_vectors(chunks, dim, seed=1)
+
+    with app.app_context():
+        store = get_store(backend)
+        started = time.perf_counter()
+        for start in range(0, chunks, batch_size):
+            store.add_embeddings(
+                [
+                    {
+                        "chunk_id": i,
+                        "embedding": vectors[i].tolist(),
+                        "post_id": i // 20,
+                        "title": f"文章 {i // 20}",
+                        "chunk_text": f"合成文本块 {i}",
+                        "chunk_index": i % 20,
+                    }
+                    for i in range(start, min(start + batch_size, chunks))
+                ]
+            )
+        return time.perf_counter() - started
+
+
+def measure(backend, data_dir, dim, queries):
+    """在全新进程中测量冷启动、查询延迟和内存"""
+    process_started = time.perf_counter()
+    app = make_app(data_dir)
+    query_vectors = random_vectors(queries, dim, seed=2)
+
+    with app.app_context():
+        store = get_store(backend)
+        store.search(query_vectors[0].tolist(), top_k=10)
+        cold_start = time.perf_counter() - process_started
+
+        latencies = []
+        for vector in query_vectors:
+            embedding = vector.tolist()
+            started = time.perf_counter()
+            store.search(embedding, top_k=10)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        filtered = []
+        for vector in query_vectors[:50]:
+            embedding = vector.tolist()
+            started = time.perf_counter()
+            store.search(embedding, top_k=10, where={"post_id": 3})
+            filtered.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "backend": backend,
+        "cold_start_ms": cold_start * 1000,
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p95_ms": percentile(latencies, 95),
+        "query_p99_ms": percentile(latencies, 99),
+        "filtered_query_p50_ms": percentile(filtered, 50),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_subprocess(*args):
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.bench_vector_store", *args],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量存储后端对比基准")
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backend", choices=BACKENDS, action="append")
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    parser.add_argument("--worker", choices=["build", "measure"], help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker == "build":
+        seconds = build(args.backend[0], args.data_dir, args.chunks, args.dim)
+        print(json.dumps({"build_s": seconds}))
+        return
+    if args.worker == "measure":
+        print(json.dumps(measure(args.backend[0], args.data_dir, args.dim, args.queries)))
+        return
+
+    results = []
+    for backend in args.backend or BACKENDS:
+        with tempfile.TemporaryDirectory() as data_dir:
+            common = ["--backend", backend, "--data-dir", data_dir, "--dim", str(args.dim)]
+            build_result = run_subprocess(
+                "--worker", "build", "--chunks", str(args.chunks), *common
+            )
+            result = run_subprocess(
+                "--worker", "measure", "--queries", str(args.queries), *common
+            )
+            result.update(build_result)
+            results.append(result)
+
+    print(f"chunks={args.chunks} dim={args.dim} queries={args.queries}")
+    header = f"{'backend':<8}{'build s':>10}{'cold ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'filter p50':>12}{'RSS MB':>9}"
+    print(header)
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+        print(
+            f"{r['backend']:<8}{r['build_s']:>10.2f}{r['cold_start_ms']:>10.0f}"
+            f"{r['query_p50_ms']:>9.2f}{r['query_p95_ms']:>9.2f}{r['query_p99_ms']:>9.2f}"
+            f"{r['filtered_query_p50_ms']:>12.2f}{rss:>9}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
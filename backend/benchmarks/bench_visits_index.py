@@ -0,0 +1,221 @@
+"""
+热点查询索引基准：迁移前后对比
+
+构造大规模 visits（默认 100 万条）、posts、chunks 数据后，分别在执行
+数据库迁移前后测量以下查询的延迟，并打印 SQLite 的查询计划：
+- log_visit：半小时去重 + 插入
+- get_visits：按访问时间倒序取最近记录
+- get_all_posts：已发布文章按创建时间排序 / 全部文章排序
+- 按文章读取与删除文本块（get_chunks_by_post / delete_chunks_by_post 的查询）
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_visits_index --visits 1000000 --queries 200
+"""
+
+from datetime import datetime, timedelta
+from app.database import get_db_connection
+from app.migrations import apply_migrations
+from app.models import get_all_posts, get_visits, init_db, log_visit
+import argparse, json, os, random, tempfile, time
+
+import numpy as np
+
+QUERY_PLANS = {
+    "log_visit": "SELECT 1 FROM visits WHERE ip = '10.0.0.1' AND visited_at > '2024-01-01 00:00:00'",
+    "get_visits": "SELECT * FROM visits ORDER BY visited_at DESC LIMIT 100",
+    "posts_published": "SELECT * FROM posts WHERE status = 'published' ORDER BY created_at DESC",
+    "posts_all": "SELECT * FROM posts ORDER BY created_at DESC",
+    "chunks_by_post": "SELECT * FROM chunks WHERE post_id = 1 ORDER BY chunk_index",
+}
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def random_ip(rng, ip_count):
+    n = rng.randrange(ip_count)
+    return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+def populate(db_path, visits, posts, chunks_per_post, ip_count, seed):
+    """批量写入测试数据（不创建二级索引）"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    start = time.perf_counter()
+
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+
+        batch = []
+        for _ in range(visits):
+            visited_at = now - timedelta(seconds=rng.randrange(90 * 24 * 3600))
+            batch.append(
+                (
+                    random_ip(rng, ip_count),
+                    f"/posts/{rng.randrange(posts) + 1}",
+                    visited_at.strftime("%Y-%m-%d %H:%M:%S"),
+                )
+            )
+            if len(batch) >= 50000:
+                cursor.executemany(
+                    "INSERT INTO visits (ip, path, visited_at) VALUES (?, ?, ?)", batch
+                )
+                batch = []
+        if batch:
+            cursor.executemany(
+                "INSERT INTO visits (ip, path, visited_at) VALUES (?, ?, ?)", batch
+            )
+
+        post_rows = []
+        for post_id in range(1, posts + 1):
+            created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            post_rows.append(
+                (
+                    post_id,
+                    f"文章 {post_id}",
+                    "正文",
+                    created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                    "published" if rng.random() < 0.8 else "draft",
+                )
+            )
+        cursor.executemany(
+            "INSERT INTO posts (id, title, content, created_at, status) VALUES (?, ?, ?, ?, ?)",
+            post_rows,
+        )
+
+        # 文本块按文章交错插入，模拟多次编辑后的真实分布
+        chunk_rows = [
+            (post_id, f"文本块 {post_id}-{index}", index)
+            for index in range(chunks_per_post)
+            for post_id in range(1, posts + 1)
+        ]
+        cursor.executemany(
+            "INSERT INTO chunks (post_id, chunk_text, chunk_index) VALUES (?, ?, ?)",
+            chunk_rows,
+        )
+        conn.commit()
+
+    return time.perf_counter() - start
+
+
+def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def read_chunks(db_path, post_id):
+    """按文章读取文本块（get_chunks_by_post 依赖迁移 7 的 collection 列，迁移前不可用）"""
+    with get_db_connection(db_path) as conn:
+        return conn.execute(
+            "SELECT * FROM chunks WHERE post_id = ? ORDER BY chunk_index", (post_id,)
+        ).fetchall()
+
+
+def delete_chunks_rolled_back(db_path, post_id):
+    """执行 delete_chunks_by_post 的同一条语句后回滚，保持数据不变"""
+    with get_db_connection(db_path) as conn:
+        conn.execute("DELETE FROM chunks WHERE post_id = ?", (post_id,))
+        conn.rollback()
+
+
+def measure(db_path, posts, ip_count, repeat, seed):
+    rng = random.Random(seed)
+    return {
+        "log_visit": timed(
+            lambda: log_visit(db_path, random_ip(rng, ip_count), "/"), repeat
+        ),
+        "get_visits": timed(lambda: get_visits(db_path, 100), repeat),
+        "posts_published": timed(lambda: get_all_posts(db_path, "published"), repeat),
+        "posts_all": timed(lambda: get_all_posts(db_path), repeat),
+        "chunks_by_post": timed(
+            lambda: read_chunks(db_path, rng.randrange(posts) + 1), repeat
+        ),
+        "delete_chunks_by_post": timed(
+            lambda: delete_chunks_rolled_back(db_path, rng.randrange(posts) + 1), repeat
+        ),
+    }
+
+
+def query_plans(db_path):
+    with get_db_connection(db_path) as conn:
+        return {
+            name: " | ".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+            for name, sql in QUERY_PLANS.items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点查询索引基准")
+    parser.add_argument("--visits", type=int, default=1000000)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--chunks-per-post", type=int, default=20)
+    parser.add_argument("--ips", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        db_path = os.path.join(data_dir, "bench.db")
+        init_db(db_path)
+
+        populate_s = populate(
+            db_path, args.visits, args.posts, args.chunks_per_post, args.ips, args.seed
+        )
+        print(
+            f"visits={args.visits} posts={args.posts} "
+            f"chunks={args.posts * args.chunks_per_post} 写入 {populate_s:.1f}s"
+        )
+
+        before = measure(db_path, args.posts, args.ips, args.queries, args.seed)
+        plans_before = query_plans(db_path)
+
+        start = time.perf_counter()
+        apply_migrations(db_path)
+        migrate_s = time.perf_counter() - start
+
+        after = measure(db_path, args.posts, args.ips, args.queries, args.seed + 1)
+        plans_after = query_plans(db_path)
+
+    print(f"迁移耗时 {migrate_s:.1f}s")
+    header = f"{'query':<24}{'before p50':>12}{'before p99':>12}{'after p50':>11}{'after p99':>11}"
+    print(header)
+    for name in before:
+        b, a = before[name], after[name]
+        print(
+            f"{name:<24}{b['p50_ms']:>12.3f}{b['p99_ms']:>12.3f}"
+            f"{a['p50_ms']:>11.3f}{a['p99_ms']:>11.3f}"
+        )
+
+    print("\n查询计划（迁移前 -> 迁移后）")
+    for name in QUERY_PLANS:
+        print(f"{name}:\n  {plans_before[name]}\n  {plans_after[name]}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "params": vars(args),
+                    "migrate_s": migrate_s,
+                    "before": before,
+                    "after": after,
+                    "plans_before": plans_before,
+                    "plans_after": plans_after,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+基准测试公用部分：合成语料、DashScope 替身、应用工厂与统计
+
+DashScope 的 Embedding、Rerank、文本生成接口由 FakeDashScope 在 requests
+传输层替换，返回确定性的结果（同一文本总是得到同一向量），并可按接口注入
+固定延迟、随机抖动与错误率，模拟网络往返与限流；不访问外部网络，也不需要
+API Key。benchmarks.dashscope_server 把同一个替身包装成独立的 HTTP 服务，
+供压测（benchmarks.loadgen）时运行中的应用使用。
+"""
+
+from requests.adapters import BaseAdapter
+import hashlib, io, json, os, random, subprocess, sys, threading, time
+
+import numpy as np
+import requests
+
+CODE_SNIPPETS = [
+    "import os.path\nconfig = load('app.config.yaml')\nprint(config.get('db.url'))",
+    "for i in range(10):\n    total += values[i] * 0.5\nreturn total / 3.14",
+    "$ pip install requests==2.31.0\n$ python -m http.server 8000",
+]
+
+SENTENCES = [
+    "向量检索依赖 text-embedding-v4 生成的 1024 维向量。",
+    "详见 https://help.aliyun.com/zh/model-studio/ 中的说明。",
+    "Python 3.11.4 中的 asyncio.TaskGroup 可以简化并发代码。",
+    "SQLite 的 WAL 模式让读者与写者互不阻塞，适合读多写少的博客。",
+    "The retriever returns top-k candidates, e.g. 10 chunks per query.",
+    "升级到 v2.0.1 之后，配置项 RAG_TOP_K 的默认值改为 10。",
+    "缓存命中率从 35% 提升到 82%，平均延迟下降了 3.5 倍！",
+    "Use numpy.argpartition for O(n) top-k selection instead of a full sort.",
+]
+
+TOPICS = ["SQLite", "ChromaDB", "Flask", "向量检索", "Rerank", "缓存", "分页", "部署"]
+
+
+def make_post(rng, sections):
+    """生成一篇中英文混排的长文章（多级标题、代码块、表格、列表）"""
+    parts = [" ".join(rng.choice(SENTENCES) for _ in range(3))]
+    for s in range(sections):
+        parts.append(f"## 第 {s + 1} 节：配置 v{s}.{rng.randrange(10)}")
+        for sub in range(rng.randrange(1, 4)):
+            if sub:
+                parts.append(f"### {s + 1}.{sub} 细节")
+            parts.append(
+                "".join(rng.choice(SENTENCES) for _ in range(rng.randrange(2, 12)))
+            )
+            kind = rng.random()
+            if kind < 0.35:
+                parts.append(f"```python\n{rng.choice(CODE_SNIPPETS)}\n```")
+            elif kind < 0.5:
+                parts.append(
+                    "| 参数 | 默认值 |\n|---|---|\n| RAG_TOP_K | 10 |\n| TTL | 3600 |"
+                )
+            elif kind < 0.7:
+                parts.append(
+                    "\n".join(f"- 步骤 {i}：{rng.choice(SENTENCES)}" for i in range(4))
+                )
+    return "\n\n".join(parts)
+
+
+def make_corpus(posts, sections, seed=42):
+    """生成 posts 篇文章，返回 [(标题, 正文)]"""
+    rng = random.Random(seed)
+    return [
+        (f"{rng.choice(TOPICS)} 实践笔记 {i}", make_post(rng, sections))
+        for i in range(posts)
+    ]
+
+
+def make_questions(count, seed=43):
+    """生成互不相同的问题（避免命中查询向量缓存）"""
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(TOPICS)} 的 {rng.choice(['配置', '原理', '性能', '坑'])} 是什么？#{i}"
+        for i in range(count)
+    ]
+
+
+def random_ip(rng, ip_count):
+    n = rng.randrange(ip_count)
+    return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+def fake_embedding(text, dimension):
+    """由文本哈希决定的单位向量"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+ANSWER_PIECES = ["根据博客内容，", "这个问题的答案", "见相关文章", "中的说明。"]
+
+
+class FakeDashScope(BaseAdapter):
+    """
+    DashScope 接口替身
+
+    既可以挂载到 http_client.session 上在进程内使用，也由
+    benchmarks.dashscope_server 包装成独立的 HTTP 服务。
+
+    Args:
+        latency: 各接口的固定延迟（秒），键为 embedding / rerank / generation
+        jitter: 在固定延迟上叠加的 [0, jitter) 秒随机抖动
+        error_rate: 请求失败的概率（一半返回 429 限流，一半返回 500）
+        token_interval: 流式生成时相邻两个片段之间的间隔（秒）
+        answer_pieces: 每个回答的片段数
+        seed: 抖动与错误注入的随机种子
+    """
+
+    ENDPOINTS = ("embedding", "rerank", "generation")
+
+    def __init__(
+        self,
+        latency=None,
+        jitter=0.0,
+        error_rate=0.0,
+        token_interval=0.0,
+        answer_pieces=4,
+        seed=0,
+    ):
+        super().__init__()
+        self.latency = {name: 0.0 for name in self.ENDPOINTS}
+        self.latency.update(latency or {})
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_interval = token_interval
+        self.answer_pieces = answer_pieces
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {name: 0 for name in self.ENDPOINTS}
+        self.errors = {name: 0 for name in self.ENDPOINTS}
+
+    @staticmethod
+    def endpoint(url):
+        """按请求地址判断接口，无法识别时返回 None"""
+        if "embedding" in url:
+            return "embedding"
+        if "rerank" in url:
+            return "rerank"
+        if "generation" in url:
+            return "generation"
+        return None
+
+    def _begin(self, endpoint):
+        """计数并等待注入的延迟，返回注入的错误状态码（不出错时为 None）"""
+        with self._lock:
+            self.calls[endpoint] += 1
+            delay = self.latency[endpoint]
+            if self.jitter:
+                delay += self._rng.random() * self.jitter
+            status = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                status = 429 if self._rng.random() < 0.5 else 500
+                self.errors[endpoint] += 1
+        if delay > 0:
+            time.sleep(delay)
+        return status
+
+    def respond(self, url, body, stream=None):
+        """
+        生成响应
+
+        Args:
+            url: 请求地址
+            body: 请求 JSON
+            stream: 生成接口是否以 SSE 返回，默认按 parameters.incremental_output
+
+        Returns:
+            tuple: (状态码, Content-Type, 响应体片段的可迭代对象)
+        """
+        endpoint = self.endpoint(url)
+        if endpoint is None:
+            return (
+                404,
+                "application/json",
+                [b'{"code":"NotFound","message":"unknown api"}'],
+            )
+
+        status = self._begin(endpoint)
+        if status is not None:
+            error = {
+                "code": "Throttling.RateQuota" if status == 429 else "InternalError",
+                "message": "injected error",
+            }
+            return status, "application/json", [json.dumps(error).encode("utf-8")]
+
+        if endpoint == "embedding":
+            dimension = body.get("parameters", {}).get("dimension", 1024)
+            payload = {
+                "output": {
+                    "embeddings": [
+                        {"text_index": i, "embedding": fake_embedding(text, dimension)}
+                        for i, text in enumerate(body["input"]["texts"])
+                    ]
+                }
+            }
+        elif endpoint == "rerank":
+            # 以查询与文档的向量内积作为相关度
+            query = np.array(fake_embedding(body["query"], 32))
+            scores = [
+                float(np.dot(query, fake_embedding(doc, 32)))
+                for doc in body["documents"]
+            ]
+            order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+            payload = {
+                "results": [
+                    {"index": i, "relevance_score": (scores[i] + 1) / 2}
+                    for i in order[: body.get("top_n", len(order))]
+                ]
+            }
+        else:
+            pieces = [
+                ANSWER_PIECES[i % len(ANSWER_PIECES)] for i in range(self.answer_pieces)
+            ]
+            if stream is None:
+                stream = body.get("parameters", {}).get("incremental_output", False)
+            if stream:
+                return 200, "text/event-stream", self._events(pieces)
+            payload = {
+                "output": {"choices": [{"message": {"content": "".join(pieces)}}]}
+            }
+
+        return 200, "application/json", [json.dumps(payload).encode("utf-8")]
+
+    def _events(self, pieces):
+        for i, piece in enumerate(pieces):
+            if i and self.token_interval > 0:
+                time.sleep(self.token_interval)
+            data = json.dumps(
+                {"output": {"choices": [{"message": {"content": piece}}]}}
+            )
+            yield f"id:{i}\nevent:result\ndata:{data}\n\n".encode("utf-8")
+
+    def send(self, request, stream=False, **kwargs):
+        status, content_type, chunks = self.respond(
+            request.url, json.loads(request.body)
+        )
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers["Content-Type"] = content_type
+        response.url = request.url
+        response.request = request
+        response.raw = io.BytesIO(b"".join(chunks))
+        return response
+
+    def close(self):
+        pass
+
+
+def make_app(data_dir, fake=None, **overrides):
+    """
+    创建使用临时数据目录的应用，并把 DashScope 请求交给 fake 处理
+
+    后台线程（索引队列、访客写入、一致性检查）默认关闭，
+    写入都在调用线程中同步完成，便于计时
+    """
+    import config
+    from app import create_app
+
+    settings = {
+        "DATABASE_PATH": os.path.join(data_dir, "blog.db"),
+        "CHROMADB_PATH": os.path.join(data_dir, "chroma"),
+        "NUMPY_STORE_PATH": os.path.join(data_dir, "numpy"),
+        "DASHSCOPE_API_KEY": "benchmark",
+        "INDEX_WORKER_COUNT": 0,
+        "VISIT_FLUSH_INTERVAL": 0,
+        "RECONCILE_INTERVAL": 0,
+        **overrides,
+    }
+    config.config["benchmark"] = type(
+        "BenchmarkConfig", (config.DevelopmentConfig,), settings
+    )
+    app = create_app("benchmark")
+
+    if fake is not None:
+        from app.services.http_client import http_client
+
+        with app.app_context():
+            http_client.session.mount("https://", fake)
+            http_client.session.mount("http://", fake)
+    return app
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def summarize(latencies_ms, elapsed_seconds, **extra):
+    """延迟列表（毫秒）与总耗时 -> 吞吐量与分位数"""
+    return {
+        "count": len(latencies_ms),
+        "throughput_per_s": (
+            len(latencies_ms) / elapsed_seconds if elapsed_seconds else 0.0
+        ),
+        "mean_ms": float(np.mean(latencies_ms)) if latencies_ms else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        **extra,
+    }
+
+
+def timed(fn, items):
+    """对每个 item 调用 fn 并计时，返回 summarize 的结果"""
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def environment():
+    """记录运行环境，便于比较不同提交的结果"""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
@@ -0,0 +1,68 @@
+"""
+对比两次基准结果（bench_suite 等以 --output 保存的 JSON）
+
+用法（在 backend 目录下）：
+    python -m benchmarks.compare before.json after.json
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+
+import argparse, json, sys
+
+METRICS = ["throughput_per_s", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(base, new):
+    return (new - base) / base * 100 if base else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两次基准结果")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="变化超过该百分比时标记（默认 10）",
+    )
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    print(
+        f"base: {base.get('environment', {}).get('commit')}  "
+        f"new: {new.get('environment', {}).get('commit')}"
+    )
+    print(f"{'stage':<14}{'metric':<18}{'base':>11}{'new':>11}{'change':>10}")
+
+    regressions = 0
+    for stage, result in new["results"].items():
+        baseline = base["results"].get(stage)
+        if baseline is None:
+            continue
+        for metric in METRICS:
+            if metric not in result or metric not in baseline:
+                continue
+            delta = change(baseline[metric], result[metric])
+            # 吞吐量下降、延迟上升视为变差
+            worse = -delta if metric == "throughput_per_s" else delta
+            flag = ""
+            if worse > args.threshold:
+                flag = "  变慢"
+                regressions += 1
+            elif worse < -args.threshold:
+                flag = "  变快"
+            print(
+                f"{stage:<14}{metric:<18}{baseline[metric]:>11.2f}{result[metric]:>11.2f}"
+                f"{delta:>+9.1f}%{flag}"
+            )
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+本地 DashScope 替身服务
+
+以独立 HTTP 服务提供 Embedding、Rerank、文本生成（含 SSE 流式）接口，
+响应由 benchmarks.common.FakeDashScope 生成：结果确定，可按接口注入延迟、
+抖动和错误率（429 / 500），用于压测时不消耗真实额度。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.dashscope_server --port 8600 \\
+        --embedding-latency 0.05 --rerank-latency 0.08 --generation-latency 0.3 \\
+        --token-interval 0.02 --jitter 0.02 --error-rate 0.01
+
+然后让应用指向替身：
+    DASHSCOPE_BASE_URL=http://127.0.0.1:8600/api/v1 \\
+    DASHSCOPE_COMPATIBLE_BASE_URL=http://127.0.0.1:8600/compatible-api/v1 \\
+    DASHSCOPE_API_KEY=local python run.py
+"""
+
+from benchmarks.common import FakeDashScope
+from flask import Flask, Response, jsonify, request
+import argparse, json
+
+
+def create_server(fake):
+    """创建转发到 fake 的 Flask 应用"""
+    server = Flask(__name__)
+
+    def handle():
+        body = request.get_json(silent=True)
+        if body is None:
+            return jsonify({"code": "InvalidParameter", "message": "invalid json"}), 400
+
+        # 与真实接口一致：X-DashScope-SSE 或 incremental_output 开启时以 SSE 返回
+        stream = None
+        if request.headers.get("X-DashScope-SSE", "").lower() == "enable":
+            stream = True
+        status, content_type, chunks = fake.respond(request.path, body, stream=stream)
+        return Response(chunks, status=status, content_type=content_type)
+
+    server.add_url_rule(
+        "/api/v1/services/embeddings/text-embedding/text-embedding",
+        "embedding",
+        handle,
+        methods=["POST"],
+    )
+    server.add_url_rule(
+        "/compatible-api/v1/reranks", "rerank", handle, methods=["POST"]
+    )
+    server.add_url_rule(
+        "/api/v1/services/aigc/text-generation/generation",
+        "generation",
+        handle,
+        methods=["POST"],
+    )
+
+    @server.route("/stats", methods=["GET"])
+    def stats():
+        """各接口的调用与注入错误次数"""
+        return jsonify({"calls": fake.calls, "errors": fake.errors})
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 DashScope 替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="秒")
+    parser.add_argument("--rerank-latency", type=float, default=0.0, help="秒")
+    parser.add_argument(
+        "--generation-latency", type=float, default=0.0, help="首个片段前的延迟（秒）"
+    )
+    parser.add_argument(
+        "--token-interval",
+        type=float,
+        default=0.0,
+        help="流式生成相邻片段的间隔（秒）",
+    )
+    parser.add_argument("--answer-pieces", type=int, default=4, help="回答的片段数")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机抖动上限（秒）")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="注入 429 / 500 错误的概率"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeDashScope(
+        latency={
+            "embedding": args.embedding_latency,
+            "rerank": args.rerank_latency,
+            "generation": args.generation_latency,
+        },
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        token_interval=args.token_interval,
+        answer_pieces=args.answer_pieces,
+        seed=args.seed,
+    )
+    print(
+        f"DashScope 替身：http://{args.host}:{args.port}  "
+        f"{json.dumps(vars(args), ensure_ascii=False)}"
+    )
+    create_server(fake).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
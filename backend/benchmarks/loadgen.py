@@ -0,0 +1,342 @@
+"""
+HTTP 压测：对运行中的应用施加混合流量，逐级提高并发并找出饱和点
+
+流量类型（按 --mix 权重随机选择）：
+- read：文章列表（随机翻页）与文章详情（Markdown / HTML）
+- track：访客追踪 POST /api/v1/visitor/track
+- rag：RAG 问答（按 --stream-ratio 选择普通或 SSE 流式接口）
+- admin：管理后台文章列表与索引任务列表（每个工作线程先登录一次）
+每一级并发持续 --duration 秒，输出吞吐量、p50 / p95 / p99 与错误率；
+吞吐量相对上一级的增幅低于 --min-gain 或 p99 超过 --slo-p99-ms 时视为饱和，
+饱和点为此前吞吐量最高的一级。
+
+DashScope 可用 benchmarks.dashscope_server 替代，避免消耗真实额度：
+    python -m benchmarks.dashscope_server --port 8600 --generation-latency 0.3 &
+    DASHSCOPE_BASE_URL=http://127.0.0.1:8600/api/v1 \\
+    DASHSCOPE_COMPATIBLE_BASE_URL=http://127.0.0.1:8600/compatible-api/v1 \\
+    DASHSCOPE_API_KEY=local python run.py &
+    python -m benchmarks.loadgen --mix read=70,track=20,rag=8,admin=2 \\
+        --concurrency 1,2,4,8,16,32 --duration 20 --output load.json
+"""
+
+from benchmarks.common import environment, make_questions, summarize
+import argparse, json, os, random, sys, threading, time
+
+import requests
+
+OPERATIONS = ("read", "track", "rag", "admin")
+# rag_query 出错时仍返回 200，回答以该提示开头
+RAG_ERROR_PREFIX = "抱歉，问答服务暂时不可用"
+
+
+def parse_mix(text):
+    """解析流量权重：read=70,track=20 -> {"read": 70.0, "track": 20.0}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"未知的流量类型: {name}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("流量权重不能全为 0")
+    return mix
+
+
+def discover_posts(session, base_url, timeout):
+    """读取全部已发布文章的 ID 与翻页游标"""
+    post_ids, cursors = [], [None]
+    cursor = None
+    while True:
+        params = {"limit": 100}
+        if cursor:
+            params["after"] = cursor
+        response = session.get(
+            f"{base_url}/api/v1/posts", params=params, timeout=timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        post_ids.extend(p["id"] for p in data["posts"])
+        cursor = data.get("next_cursor")
+        if not cursor:
+            return post_ids, cursors
+        cursors.append(cursor)
+
+
+class Worker(threading.Thread):
+    """一个并发用户：独立的 Session（连接复用、登录状态），循环发送请求直到截止时间"""
+
+    def __init__(self, args, mix, post_ids, cursors, questions, deadline, seed):
+        super().__init__(daemon=True)
+        self.args = args
+        self.base_url = args.base_url.rstrip("/")
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.post_ids = post_ids
+        self.cursors = cursors
+        self.questions = questions
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        # {操作: [(延迟毫秒, 是否成功)]}
+        self.results = {name: [] for name in self.names}
+
+    def request(self, method, path, **kwargs):
+        return self.session.request(
+            method, f"{self.base_url}{path}", timeout=self.args.timeout, **kwargs
+        )
+
+    def login(self):
+        response = self.request(
+            "POST",
+            "/admin/login",
+            json={
+                "username": self.args.admin_user,
+                "password": self.args.admin_password,
+            },
+        )
+        return response.status_code == 200
+
+    def do_read(self):
+        if self.post_ids and self.rng.random() < 0.7:
+            post_id = self.rng.choice(self.post_ids)
+            params = {"format": "html"} if self.rng.random() < 0.5 else {}
+            response = self.request("GET", f"/api/v1/posts/{post_id}", params=params)
+        else:
+            cursor = self.rng.choice(self.cursors)
+            params = {"after": cursor} if cursor else {}
+            response = self.request("GET", "/api/v1/posts", params=params)
+        return response.status_code == 200
+
+    def do_track(self):
+        if self.post_ids and self.rng.random() < 0.7:
+            path = f"/articles/{self.rng.choice(self.post_ids)}"
+        else:
+            path = self.rng.choice(["/", "/articles", "/about"])
+        response = self.request("POST", "/api/v1/visitor/track", json={"path": path})
+        return response.status_code in (200, 201)
+
+    def do_rag(self):
+        question = self.rng.choice(self.questions)
+        if self.rng.random() < self.args.stream_ratio:
+            response = self.request(
+                "POST",
+                "/api/v1/rag/query/stream",
+                json={"question": question},
+                stream=True,
+            )
+            # 读完整个事件流，延迟包含全部生成时间
+            ok = response.status_code == 200
+            for line in response.iter_lines(decode_unicode=True):
+                if line == "event: error":
+                    ok = False
+            return ok
+        response = self.request(
+            "POST", "/api/v1/rag/query", json={"question": question}
+        )
+        if response.status_code != 200:
+            return False
+        answer = response.json().get("answer") or ""
+        return not answer.startswith(RAG_ERROR_PREFIX)
+
+    def do_admin(self):
+        if self.rng.random() < 0.8:
+            response = self.request("GET", "/admin/posts", params={"limit": 20})
+        else:
+            response = self.request("GET", "/admin/index-jobs")
+        if response.status_code == 401 and self.login():
+            return False
+        return response.status_code == 200
+
+    def run(self):
+        if "admin" in self.names:
+            try:
+                self.login()
+            except requests.RequestException:
+                pass
+
+        while time.perf_counter() < self.deadline:
+            name = self.rng.choices(self.names, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(self, f"do_{name}")()
+            except requests.RequestException:
+                ok = False
+            self.results[name].append(((time.perf_counter() - started) * 1000, ok))
+        self.session.close()
+
+
+def run_level(args, mix, post_ids, cursors, questions, concurrency, level_seed):
+    """以 concurrency 个并发用户运行 args.duration 秒"""
+    started = time.perf_counter()
+    deadline = started + args.duration
+    workers = [
+        Worker(args, mix, post_ids, cursors, questions, deadline, level_seed * 1000 + i)
+        for i in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    def stats(samples):
+        errors = sum(1 for _, ok in samples if not ok)
+        return summarize(
+            [latency for latency, _ in samples],
+            elapsed,
+            errors=errors,
+            error_rate=errors / len(samples) if samples else 0.0,
+        )
+
+    operations = {}
+    for name in mix:
+        operations[name] = stats([s for w in workers for s in w.results[name]])
+    overall = stats(
+        [s for w in workers for samples in w.results.values() for s in samples]
+    )
+    return {"concurrency": concurrency, **overall, "operations": operations}
+
+
+def find_saturation(levels, min_gain, slo_p99_ms, max_error_rate):
+    """
+    找出饱和点
+
+    Returns:
+        dict: 饱和前吞吐量最高的一级及饱和原因（未饱和时 reason 为 None）
+    """
+    best, reason = None, None
+    for level in levels:
+        required = best["throughput_per_s"] * (1 + min_gain / 100) if best else 0.0
+        if level["p99_ms"] > slo_p99_ms:
+            reason = (
+                f"并发 {level['concurrency']} 时 p99 {level['p99_ms']:.0f}ms 超过 SLO"
+            )
+        elif level["error_rate"] > max_error_rate:
+            reason = f"并发 {level['concurrency']} 时错误率 {level['error_rate']:.1%}"
+        elif level["throughput_per_s"] < required:
+            reason = f"并发 {level['concurrency']} 时吞吐量增幅低于 {min_gain:g}%"
+        if reason:
+            break
+        best = level
+
+    if best is None:
+        return {"concurrency": None, "throughput_per_s": 0.0, "reason": reason}
+    return {
+        "concurrency": best["concurrency"],
+        "throughput_per_s": best["throughput_per_s"],
+        "p99_ms": best["p99_ms"],
+        "reason": reason,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="混合流量压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("read=70,track=20,rag=8,admin=2"),
+        help="流量权重，如 read=70,track=20,rag=8,admin=2",
+    )
+    parser.add_argument(
+        "--concurrency", default="1,2,4,8,16,32", help="逐级并发数，逗号分隔"
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="每级持续秒数")
+    parser.add_argument(
+        "--stream-ratio", type=float, default=0.5, help="RAG 走流式接口的比例"
+    )
+    parser.add_argument(
+        "--questions",
+        type=int,
+        default=50,
+        help="RAG 问题池大小（越小答案缓存命中越多）",
+    )
+    parser.add_argument("--admin-user", default=os.getenv("ADMIN_USERNAME", "admin"))
+    parser.add_argument("--admin-password", default=os.getenv("ADMIN_PASSWORD", ""))
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="单个请求超时（秒）"
+    )
+    parser.add_argument(
+        "--min-gain", type=float, default=10.0, help="吞吐量增幅低于该百分比视为饱和"
+    )
+    parser.add_argument("--slo-p99-ms", type=float, default=2000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--stop-at-saturation", action="store_true", help="饱和后不再运行更高的并发"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果保存为 JSON")
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip("/")
+
+    levels_to_run = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    session = requests.Session()
+    try:
+        post_ids, cursors = discover_posts(session, args.base_url, args.timeout)
+    except requests.RequestException as e:
+        print(f"无法访问 {args.base_url}: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        session.close()
+    questions = make_questions(args.questions, seed=args.seed)
+    print(f"{args.base_url}：{len(post_ids)} 篇文章，流量权重 {args.mix}")
+
+    print(
+        f"{'concurrency':>11}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'errors':>9}  ops"
+    )
+    levels = []
+    for i, concurrency in enumerate(levels_to_run):
+        level = run_level(
+            args, args.mix, post_ids, cursors, questions, concurrency, args.seed + i
+        )
+        levels.append(level)
+        ops = " ".join(
+            f"{name}={result['throughput_per_s']:.1f}/s"
+            for name, result in level["operations"].items()
+        )
+        print(
+            f"{concurrency:>11}{level['throughput_per_s']:>10.1f}{level['p50_ms']:>10.1f}"
+            f"{level['p95_ms']:>10.1f}{level['p99_ms']:>10.1f}"
+            f"{level['error_rate']:>8.1%}  {ops}"
+        )
+        if (
+            args.stop_at_saturation
+            and find_saturation(
+                levels, args.min_gain, args.slo_p99_ms, args.max_error_rate
+            )["reason"]
+        ):
+            break
+
+    saturation = find_saturation(
+        levels, args.min_gain, args.slo_p99_ms, args.max_error_rate
+    )
+    if saturation["concurrency"] is None:
+        print(f"饱和点：无（{saturation['reason']}）")
+    else:
+        print(
+            f"饱和点：并发 {saturation['concurrency']}，"
+            f"{saturation['throughput_per_s']:.1f} req/s，"
+            f"原因：{saturation['reason'] or '测试范围内未饱和'}"
+        )
+
+    if args.output:
+        options = {k: v for k, v in vars(args).items() if k != "admin_password"}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "environment": environment(),
+                    "options": options,
+                    "levels": levels,
+                    "saturation": saturation,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
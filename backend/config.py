@@ -14,28 +14,140 @@ class Config:
 
     # 数据库配置
     DATABASE_PATH = os.getenv("DATABASE_PATH")
+    # SQLite 连接池与 PRAGMA 配置（WAL、synchronous=NORMAL、foreign_keys 固定开启）
+    SQLITE_POOL_SIZE = 8
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 16 * 1024
+
+    # 文章列表分页配置
+    POSTS_PAGE_SIZE = 20
+    POSTS_MAX_PAGE_SIZE = 100
+
+    # 公开文章接口响应缓存（语料版本在进程内复用的秒数决定跨进程失效延迟）
+    RESPONSE_CACHE_SIZE = 256
+    RESPONSE_CACHE_TTL = 3600
+    RESPONSE_CACHE_VERSION_TTL = 2
 
     # 通义千问 API 配置
     DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
+    # 接口地址可通过环境变量指向本地替身（benchmarks/dashscope_server.py）或代理
+    DASHSCOPE_BASE_URL = os.getenv(
+        "DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/api/v1"
+    )
+    DASHSCOPE_COMPATIBLE_BASE_URL = os.getenv(
+        "DASHSCOPE_COMPATIBLE_BASE_URL",
+        "https://dashscope.aliyuncs.com/compatible-api/v1",
+    )
+
+    # HTTP 连接池配置（Embedding、Rerank、LLM 共用）
+    HTTP_POOL_CONNECTIONS = 4
+    HTTP_POOL_MAXSIZE = 10
+    HTTP_CONNECT_TIMEOUT = 3.05
+    HTTP_READ_TIMEOUT = 30
+    HTTP_MAX_RETRIES = 2
+    HTTP_RETRY_BACKOFF = 0.5
 
     # Text Embedding 配置
     EMBEDDING_MODEL = "text-embedding-v4"
     EMBEDDING_DIMENSION = 1024
+    # 单次请求最多携带的文本条数（text-embedding-v4 上限为 10）
+    EMBEDDING_BATCH_SIZE = 10
+    # 同时发出的 Embedding 批次请求数上限
+    EMBEDDING_MAX_CONCURRENCY = 4
+
+    # 查询向量缓存配置（持久层默认与主库共用一个 SQLite 文件）
+    EMBEDDING_CACHE_SIZE = 2048
+    EMBEDDING_CACHE_TTL = 7 * 24 * 3600
+    EMBEDDING_CACHE_DB_PATH = os.getenv("EMBEDDING_CACHE_DB_PATH")
+
+    # 文章分块配置：每个 chunk 的 token 上限（含标题上下文）、相邻 chunk 的重叠
+    # token 数、不足该 token 数的短段落与下一段落合并、计数用的 tiktoken 编码
+    # （未安装 tiktoken 或设为 "estimate" 时按字符类别估算）。
+    # 修改后需执行 flask reindex 使已有文章按新规则分块
+    CHUNK_MAX_TOKENS = 512
+    CHUNK_OVERLAP_TOKENS = 0
+    CHUNK_MIN_TOKENS = 256
+    CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "cl100k_base")
 
     # Rerank 配置
     RERANK_MODEL = "qwen3-rerank"
-    RERANK_API_URL = "https://dashscope.aliyuncs.com/compatible-api/v1/reranks"
+    RERANK_API_URL = os.getenv(
+        "RERANK_API_URL", f"{DASHSCOPE_COMPATIBLE_BASE_URL}/reranks"
+    )
+    # Rerank 结果缓存（键为查询 + 候选 chunk 集合 + 模型）
+    RERANK_CACHE_SIZE = 1024
+    RERANK_CACHE_TTL = 3600
 
     # LLM 配置
     LLM_MODEL = "qwen-plus"
+    # 生成接口读取超时（流式时为两个片段之间的最长间隔）
+    LLM_READ_TIMEOUT = 120
 
     # RAG 配置
     RAG_TOP_K = 10
     RAG_TOP_N_AFTER_RERANK = 5
-
-    # ChromaDB 配置
+    # 混合检索：向量检索 + FTS5 全文检索，按 RRF 融合后再 Rerank
+    RAG_HYBRID_ENABLED = True
+    RAG_LEXICAL_TOP_K = 10
+    RAG_RRF_K = 60
+    # 自适应 top-K：向量检索最多取 RAG_TOP_K 条，只保留与最近结果的距离差
+    # 不超过 RAG_ADAPTIVE_MAX_SPREAD 的结果（至少 RAG_MIN_TOP_K 条）
+    RAG_ADAPTIVE_TOP_K = True
+    RAG_MIN_TOP_K = 3
+    RAG_ADAPTIVE_MAX_SPREAD = 0.15
+    # 最相关文章与次相关文章的向量距离差不小于该值时跳过 Rerank（None 表示总是 Rerank）
+    RAG_RERANK_SKIP_MARGIN = 0.08
+    # Rerank 只发送每篇文章排名最高的 chunk，再按文章得分展开其余 chunk
+    RAG_RERANK_DISTINCT_POSTS = True
+    # 输出每次检索的 K 值与 Rerank 决策，用于调整上述阈值
+    RAG_DECISION_LOG = True
+
+    # 语义回答缓存配置：与已缓存问题的余弦距离不超过阈值时直接复用回答
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_MAX_DISTANCE = 0.1
+    ANSWER_CACHE_SIZE = 512
+    ANSWER_CACHE_TTL = 24 * 3600
+
+    # 后台索引队列配置（INDEX_WORKER_COUNT = 0 时在请求内同步执行）
+    INDEX_WORKER_COUNT = 2
+    INDEX_POLL_INTERVAL = 2
+    INDEX_JOB_TIMEOUT = 600
+    INDEX_JOB_MAX_ATTEMPTS = 5
+    INDEX_RETRY_BACKOFF = 10
+
+    # 向量存储后端："chroma"（ChromaDB）或 "numpy"（内存映射矩阵，适合小语料）
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+
+    # ChromaDB 配置（集合名同样用于 numpy 后端）
+    # CHROMADB_COLLECTION 为初始集合名，也是重建索引时新集合名的前缀；
+    # 当前提供检索的集合记录在数据库 meta.active_collection 中
     CHROMADB_PATH = os.getenv("CHROMADB_PATH")
     CHROMADB_COLLECTION = "blog_chunks"
+    # 当前集合名在进程内的缓存时间（秒），其他进程切换集合后最多延迟这么久生效
+    ACTIVE_COLLECTION_TTL = 5
+
+    # 全量重建索引（flask reindex）：Embedding 并发请求数上限、
+    # 每组生成向量的 chunk 数、追平重建期间文章变动的最多轮数、
+    # 切换后等待多久再删除旧集合（秒，应大于 ACTIVE_COLLECTION_TTL）
+    REINDEX_MAX_CONCURRENCY = 2
+    REINDEX_GROUP_SIZE = 200
+    REINDEX_CATCHUP_PASSES = 3
+    REINDEX_CLEANUP_DELAY = 10
+
+    # 索引一致性检查（flask reconcile-index）：定期自动修复的间隔（秒，0 表示不启用；
+    # 检查与正常写入并发，可能误判正在更新的文章，需要时再开启，如 24 * 3600）、
+    # 分批删除/重新生成向量的条数
+    RECONCILE_INTERVAL = 0
+    RECONCILE_BATCH_SIZE = 500
+
+    # NumPy 向量存储配置
+    NUMPY_STORE_PATH = os.getenv("NUMPY_STORE_PATH", "./vector_data")
+    # 追加日志累计的变更行数超过基线行数的该比例（且不少于最小行数）时合并为新基线
+    NUMPY_STORE_COMPACT_RATIO = 0.5
+    NUMPY_STORE_COMPACT_MIN_ROWS = 1024
+    # 被替换的旧版本文件保留的秒数（其他进程可能仍在读取）
+    NUMPY_STORE_GRACE_PERIOD = 600
 
     # 管理员配置
     ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
@@ -45,9 +157,26 @@ class Config:
     # 例如: "127.0.0.1,192.168.1.100"
     ADMIN_IP_WHITELIST = os.getenv("ADMIN_IP_WHITELIST", "*").split(",")
 
+    # 批量导入配置：分割进程数（None 表示 CPU 核数）、启用进程池的最少文章数、
+    # 每组生成向量的 chunk 数、导入内容大小上限
+    IMPORT_SPLIT_WORKERS = None
+    IMPORT_PARALLEL_MIN_POSTS = 20
+    IMPORT_INDEX_GROUP_SIZE = 200
+    IMPORT_MAX_BYTES = 50 * 1024 * 1024
+
+    # 监控指标：是否开放 /metrics（Prometheus 文本格式，仅限 ADMIN_IP_WHITELIST 访问）
+    METRICS_ENABLED = True
+
     # 访客日志配置
     LOG_VISITOR_ACCESS = True
     LOG_VISITOR_PATHS = ["/", "/articles", "/about"]
+    # 访客记录后台批量写入：去重窗口（秒）、缓冲区容量、批量大小、写入间隔（秒，0 表示同步写入）
+    VISIT_DEDUPE_WINDOW = 30 * 60
+    VISIT_BUFFER_SIZE = 10000
+    VISIT_FLUSH_BATCH = 500
+    VISIT_FLUSH_INTERVAL = 2
+    # 原始访问记录保留天数（更早的记录只保留在汇总表中）
+    VISIT_RETENTION_DAYS = 90
 
     @staticmethod
     def init_app():
@@ -1,7 +1,10 @@
 from app import create_app
-import os
+import multiprocessing, os
 
-app = create_app(os.getenv("FLASK_ENV", "development"))
+# 导入时使用 forkserver / spawn 子进程分割文章，子进程会重新导入本模块，
+# 此时不应再创建应用（初始化数据库、启动后台线程）
+if multiprocessing.parent_process() is None:
+    app = create_app(os.getenv("FLASK_ENV", "development"))
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,4 @@
+import os, sys
+
+# 以 backend 目录为根导入 app、config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,49 @@
+from app.services.numpy_store import NumpyVectorStore
+from benchmarks.common import FakeDashScope, make_app
+
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path):
+    return make_app(
+        str(tmp_path),
+        FakeDashScope(),
+        VECTOR_STORE_BACKEND="numpy",
+        EMBEDDING_DIMENSION=64,
+    )
+
+
+def test_retry_after_vector_store_failure_writes_vectors(app, monkeypatch):
+    from app.models import create_post, get_chunks_by_post
+    from app.services.embedding_service import update_post_embeddings
+    from app.services.vector_store import get_vector_store
+
+    add_embeddings = NumpyVectorStore.add_embeddings
+    calls = []
+
+    def flaky_add_embeddings(self, items):
+        calls.append(len(items))
+        if len(calls) == 1:
+            raise RuntimeError("vector store down")
+        return add_embeddings(self, items)
+
+    monkeypatch.setattr(NumpyVectorStore, "add_embeddings", flaky_add_embeddings)
+
+    with app.app_context():
+        db_path = app.config["DATABASE_PATH"]
+        content = "## 小节\n\nSQLite 的 WAL 模式让读者与写者互不阻塞。"
+        post_id = create_post(db_path, "SQLite 调优", content)
+
+        with pytest.raises(Exception, match="vector store down"):
+            update_post_embeddings(post_id, "SQLite 调优", content)
+        # 向量写入失败时新增的 chunk 随事务回滚
+        assert get_chunks_by_post(db_path, post_id) == []
+
+        update_post_embeddings(post_id, "SQLite 调优", content)
+
+        chunk_ids = {row["id"] for row in get_chunks_by_post(db_path, post_id)}
+        metadatas = get_vector_store().get_all_metadatas().values()
+        assert len(calls) == 2
+        assert chunk_ids
+        assert chunk_ids == {m["chunk_id"] for m in metadatas}
@@ -0,0 +1,121 @@
+from app.utils.markdown_splitter import estimate_tokens, split_markdown
+import random, re
+
+import pytest
+
+MAX_TOKENS = 512
+
+
+def make_code_block(lines, seed=0):
+    rng = random.Random(seed)
+    body = [f"    if value_{i}: handle{rng.randint(0, 99)}(item)" for i in range(lines)]
+    return "```python\ndef handler(items):\n" + "\n".join(body) + "\n```"
+
+
+def make_table(rows, seed=0):
+    rng = random.Random(seed)
+    lines = ["| 名称 | 版本 | 说明 |", "| --- | --- | --- |"]
+    lines += [
+        f"| pkg{i} | {rng.randint(1, 9)}.{rng.randint(0, 20)} | 依赖 lib{rng.randint(0, 999)} |"
+        for i in range(rows)
+    ]
+    return "\n".join(lines)
+
+
+def make_list(items, seed=0):
+    rng = random.Random(seed)
+    return "\n".join(f"- 第 {i} 项 step{rng.randint(0, 99)} abc" for i in range(items))
+
+
+@pytest.mark.parametrize(
+    "block",
+    [make_code_block(400), make_table(300), make_list(600)],
+    ids=["code", "table", "list"],
+)
+@pytest.mark.parametrize("overlap", [0, 64])
+def test_chunks_fit_token_budget(block, overlap):
+    content = f"## 小节\n\n一段开头的说明文字。\n\n{block}\n\n结尾的说明。"
+    chunks = split_markdown(
+        content,
+        "文章标题",
+        max_tokens=MAX_TOKENS,
+        overlap_tokens=overlap,
+        tokenizer="estimate",
+    )
+
+    assert len(chunks) > 1
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= MAX_TOKENS
+
+
+EMPTY_HEADINGS = (
+    "## 小节\n\n### 子标题 0 连接池与超时配置\n\n### 子标题 1 重试与退避策略\n\n"
+    "#### 更深的子标题 缓存失效\n\n"
+)
+
+
+@pytest.mark.parametrize(
+    "block",
+    [make_code_block(400), make_table(300), make_list(600), "句子很长，" * 400],
+    ids=["code", "table", "list", "paragraph"],
+)
+@pytest.mark.parametrize("max_tokens", [128, MAX_TOKENS])
+@pytest.mark.parametrize("min_tokens", [0, 100])
+def test_empty_headings_before_oversized_block_fit_budget(
+    block, max_tokens, min_tokens
+):
+    # 没有正文的小标题随第一片一起进入下一个 chunk，拆分预算须扣除它们
+    content = "短段落\n\n" + EMPTY_HEADINGS + block
+    chunks = split_markdown(
+        content,
+        "文章标题",
+        max_tokens=max_tokens,
+        overlap_tokens=32,
+        tokenizer="estimate",
+        min_tokens=min_tokens,
+    )
+
+    assert any("### 子标题 1" in chunk for chunk in chunks)
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= max_tokens
+
+
+def test_code_block_pieces_keep_fences():
+    content = "## 代码\n\n" + make_code_block(400) + "\n\n之后的段落"
+    chunks = split_markdown(
+        content, "文章标题", max_tokens=MAX_TOKENS, tokenizer="estimate"
+    )
+
+    code_chunks = [chunk for chunk in chunks if "value_" in chunk]
+    assert len(code_chunks) > 1
+    for chunk in code_chunks:
+        fences = re.findall(r"^```.*$", chunk, re.MULTILINE)
+        assert fences[0] == "```python"
+        assert len(fences) % 2 == 0
+        assert chunk.index("```python") < chunk.index("value_")
+    # 每一行代码恰好出现在一个 chunk 中
+    lines = [line for chunk in code_chunks for line in chunk.split("\n")]
+    assert len([line for line in lines if "value_" in line]) == 400
+
+
+def test_table_pieces_repeat_header():
+    chunks = split_markdown(
+        "## 依赖\n\n" + make_table(300),
+        "文章标题",
+        max_tokens=MAX_TOKENS,
+        tokenizer="estimate",
+    )
+
+    table_chunks = [chunk for chunk in chunks if "| pkg" in chunk]
+    assert len(table_chunks) > 1
+    for chunk in table_chunks:
+        assert "| 名称 | 版本 | 说明 |\n| --- | --- | --- |\n| pkg" in chunk
+
+
+def test_unclosed_code_block_is_closed_in_every_piece():
+    content = "## 代码\n\n" + make_code_block(400)[: -len("\n```")]
+    chunks = split_markdown(
+        content, "文章标题", max_tokens=MAX_TOKENS, tokenizer="estimate"
+    )
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.rstrip().endswith("```")
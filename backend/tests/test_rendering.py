@@ -0,0 +1,53 @@
+from app.rendering import _is_safe_url, render_markdown
+import pytest
+
+
+@pytest.mark.parametrize(
+    "markdown_text",
+    [
+        "[x](javascript:alert(1))",
+        "[x]( JaVaScRiPt:alert(1))",
+        "[x](&#106;avascript:alert(1))",
+        "[x](&#x6A;avascript:alert(1))",
+        "[x](&#106avascript:alert(1))",
+        "[x](java&#x09;script:alert(1))",
+        "[x](java&#10;script:alert(1))",
+        "[x](javascript&colon;alert(1))",
+        "[x](&#x20;javascript:alert(1))",
+        "[x](data:text/html;base64,PHNjcmlwdD4=)",
+        "[x](vbscript:msgbox(1))",
+        "![i](jav&#97;script:alert(1))",
+        '[x][ref]\n\n[ref]: &#106;avascript:alert(1) "t"',
+    ],
+)
+def test_unsafe_urls_are_removed(markdown_text):
+    html, _ = render_markdown(markdown_text)
+    assert "href=" not in html
+    assert "src=" not in html
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://example.com/a?b=1&c=2",
+        "http://example.com",
+        "mailto:me@example.com",
+        "/articles/1",
+        "../images/a.png",
+        "#section",
+        "?page=2",
+        "//example.com/path",
+    ],
+)
+def test_safe_urls_are_kept(url):
+    assert _is_safe_url(url)
+    html, _ = render_markdown(f"[x]({url})")
+    assert "href=" in html
+
+
+def test_raw_html_is_escaped():
+    html, _ = render_markdown(
+        '<script>alert(1)</script>\n\n<a href="javascript:x">y</a>'
+    )
+    assert "<script>" not in html
+    assert "<a " not in html
@@ -11,14 +11,14 @@ const api = axios.create({
 
 // 文章相关 API
 export const articleAPI = {
-    // 获取文章列表
-    getList() {
-        return api.get('/posts')
+    // 获取文章列表（after 为上一页返回的 next_cursor）
+    getList(after = null) {
+        return api.get('/posts', { params: after ? { after } : {} })
     },
 
-    // 获取文章详情
-    getDetail(id) {
-        return api.get(`/posts/${id}`)
+    // 获取文章详情（format 为 html 时返回后端预渲染的 HTML 和目录）
+    getDetail(id, format = 'markdown') {
+        return api.get(`/posts/${id}`, { params: { format } })
     }
 }
 
@@ -27,6 +27,50 @@ export const ragAPI = {
     // 提问
     query(question) {
         return api.post('/rag/query', { question })
+    },
+
+    // 流式提问（Server-Sent Events），每收到一个事件调用一次 onEvent(event, data)
+    async queryStream(question, onEvent) {
+        const response = await fetch(`${API_BASE_URL}/rag/query/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ question })
+        })
+
+        if (!response.ok || !response.body) {
+            throw new Error(`流式问答请求失败: ${response.status}`)
+        }
+
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ''
+
+        while (true) {
+            const { value, done } = await reader.read()
+            if (done) break
+
+            buffer += decoder.decode(value, { stream: true })
+
+            let boundary
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary)
+                buffer = buffer.slice(boundary + 2)
+
+                let event = 'message'
+                let data = ''
+                for (const line of rawEvent.split('\n')) {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim()
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim()
+                    }
+                }
+
+                if (data) {
+                    onEvent(event, JSON.parse(data))
+                }
+            }
+        }
     }
 }
 
@@ -4,8 +4,10 @@ import { articleAPI } from '../services/api'
 export const useArticleStore = defineStore('articles', {
     state: () => ({
         articles: [],
+        nextCursor: null,
         currentArticle: null,
         loading: false,
+        loadingMore: false,
         error: null
     }),
 
@@ -17,6 +19,7 @@ export const useArticleStore = defineStore('articles', {
             try {
                 const response = await articleAPI.getList()
                 this.articles = response.data.posts || []
+                this.nextCursor = response.data.next_cursor || null
             } catch (error) {
                 console.error('获取文章列表失败:', error)
                 this.error = '获取文章列表失败，请稍后重试'
@@ -25,12 +28,28 @@ export const useArticleStore = defineStore('articles', {
             }
         },
 
+        async fetchMoreArticles() {
+            if (!this.nextCursor || this.loadingMore) return
+            this.loadingMore = true
+
+            try {
+                const response = await articleAPI.getList(this.nextCursor)
+                this.articles.push(...(response.data.posts || []))
+                this.nextCursor = response.data.next_cursor || null
+            } catch (error) {
+                console.error('加载更多文章失败:', error)
+                this.error = '加载更多文章失败，请稍后重试'
+            } finally {
+                this.loadingMore = false
+            }
+        },
+
         async fetchArticleDetail(id) {
             this.loading = true
             this.error = null
 
             try {
-                const response = await articleAPI.getDetail(id)
+                const response = await articleAPI.getDetail(id, 'html')
                 this.currentArticle = response.data
             } catch (error) {
                 console.error('获取文章详情失败:', error)